@@ -1,50 +1,91 @@
 # backend/agent_service.py
-from flask import Blueprint, request, jsonify
-from backend.db import get_db
-import random
+from flask import Blueprint, current_app, request, jsonify
+from backend.catalog import get_catalog
+from backend.crop_model import confidence, get_ranker, investment_code
+from backend.economics import plan_economics
+from backend.metrics import span
+from backend.plan_cache import AGENT_CACHE, AREA_STEP_M2, RAINFALL_STEP_MM, SOIL_PH_STEP, quantize
 import os
+import threading
 
 agent_bp = Blueprint("agent", __name__)
 
+@agent_bp.record_once
+def _warm_model(state):
+    # load the crop ranker in the background so the first request doesn't pay for it
+    threading.Thread(target=get_ranker().load, name="crop-ranker-load", daemon=True).start()
+
+# rough size of one cached recommendation, for the cache's byte budget
+AGENT_ENTRY_BYTES = 4096
+
+def _recommend(catalog, rainfall, soil_ph, area, investment):
+    """Ranked primary/intercrop, economics and confidence for one set of inputs."""
+    # 🔍 Find suitable crops by rainfall and pH, scored by the crop ranker
+    candidates = catalog.suitable_crops(rainfall, soil_ph=soil_ph) or catalog.crops
+    with span("model"):
+        scores, model_info = get_ranker().score(candidates, rainfall, soil_ph, area, investment)
+    suitable = sorted(
+        ({**crop, "score": round(score, 3)} for crop, score in zip(candidates, scores)),
+        key=lambda x: x["score"],
+        reverse=True,
+    )
+    primary = suitable[0]
+    intercrop = suitable[1] if len(suitable) > 1 else primary
+
+    # 💰 Year-1 economics for the recommended combination
+    tree = catalog.boundary_tree
+    with span("economics"):
+        economics = plan_economics(
+            area, primary["name"], intercrop["name"], tree["name"] if tree else None, catalog.crops_by_name
+        )
+
+    # 🌟 AI Confidence Score: how clearly the primary crop beats the alternatives
+    return {
+        "primary_crop": primary,
+        "intercrop": intercrop,
+        "economics": economics,
+        "confidence": round(confidence(sorted(scores, reverse=True)), 2),
+        "model": model_info,
+    }
+
 @agent_bp.route("/api/ai_agent", methods=["POST"])
 def ai_agent():
     """AI assistant that explains and improves generated crop plans."""
     data = request.json or {}
 
-    rainfall = float(data.get("rainfall_mm", 400))
-    soil_ph = float(data.get("soil_ph", 6.5))
-    area = float(data.get("area_m2", 8000))
+    raw_rainfall = float(data.get("rainfall_mm", 400))
+    raw_soil_ph = float(data.get("soil_ph", 6.5))
+
+    # The recommendation is computed from quantized inputs so nearby requests
+    # share one cached entry; the explanation quotes what the farmer entered
+    rainfall = quantize(raw_rainfall, RAINFALL_STEP_MM)
+    soil_ph = quantize(raw_soil_ph, SOIL_PH_STEP)
+    area = quantize(float(data.get("area_m2", 8000)), AREA_STEP_M2)
     investment = data.get("investment_level", "low")
 
     # ✅ Always use correct DB path (based on backend structure)
-    db_path = os.path.join(os.path.dirname(__file__), "..", "data", "sasya.db")
-    db = get_db(db_path)
-    cur = db.execute("SELECT * FROM crops")
-    crops = [dict(x) for x in cur.fetchall()]
-    db.close()
+    db_path = current_app.config.get("DB_PATH") or os.path.join(os.path.dirname(__file__), "..", "data", "sasya.db")
+    catalog = get_catalog(db_path).snapshot()
 
-    if not crops:
+    if not catalog.crops:
         return jsonify({
             "status": "error",
             "message": "No crop data found in database."
         }), 500
 
-    # 🔍 Find suitable crops by rainfall and pH
-    suitable = []
-    for crop in crops:
-        if rainfall >= crop["min_rainfall"] and rainfall <= crop["max_rainfall"]:
-            score = (crop["typical_yield_kg_per_ha"] / (crop["input_cost_per_ha"] or 1)) * random.uniform(0.9, 1.1)
-            score *= (1 - abs(soil_ph - 6.5) * 0.05)
-            suitable.append({**crop, "score": round(score, 3)})
-
-    suitable = sorted(suitable, key=lambda x: x["score"], reverse=True)
-    primary = suitable[0] if suitable else random.choice(crops)
-    intercrop = suitable[1] if len(suitable) > 1 else primary
+    key = (catalog.version, rainfall, soil_ph, area, investment_code(investment))
+    rec = AGENT_CACHE.get(key)
+    cache_status = "hit"
+    if rec is None:
+        rec = _recommend(catalog, rainfall, soil_ph, area, investment)
+        AGENT_CACHE.put(key, rec, AGENT_ENTRY_BYTES)
+        cache_status = "miss"
+    primary, intercrop = rec["primary_crop"], rec["intercrop"]
 
     # 🌾 Generate AI-style reasoning points
     explanation_points = [
-        f"Rainfall of {rainfall} mm supports crops with moderate water needs like {primary['name']}.",
-        f"Soil pH of {soil_ph} is well-suited for legumes and coarse cereals such as {intercrop['name']}.",
+        f"Rainfall of {raw_rainfall} mm supports crops with moderate water needs like {primary['name']}.",
+        f"Soil pH of {raw_soil_ph} is well-suited for legumes and coarse cereals such as {intercrop['name']}.",
         f"With a '{investment}' investment strategy, the system prioritizes cost-effective crops with stable yields.",
         f"Primary crop **{primary['name']}** is recommended for its consistent yield and resilience.",
         f"Intercrop **{intercrop['name']}** enhances biodiversity and soil fertility.",
@@ -52,14 +93,15 @@ def ai_agent():
         "Overall, the AI agent optimized your plan for sustainability, yield, and long-term soil regeneration."
     ]
 
-    # 🌟 AI Confidence Score
-    confidence = round(random.uniform(0.75, 0.95), 2)
-
-    return jsonify({
+    resp = jsonify({
         "status": "ok",
         "input": data,
         "primary_crop": primary,
         "intercrop": intercrop,
+        "economics": rec["economics"],
         "explanation_points": explanation_points,
-        "confidence": confidence
+        "confidence": rec["confidence"],
+        "model": rec["model"]
     })
+    resp.headers["X-Plan-Cache"] = cache_status
+    return resp
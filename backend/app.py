@@ -1,186 +1,275 @@
 # backend/app.py
-from flask import Flask, jsonify, request, send_from_directory
+import time
+_IMPORT_T0 = time.perf_counter()
+
+from flask import Blueprint, Flask, Response, current_app, jsonify, request, send_from_directory, stream_with_context
 from flask_cors import CORS
 import os
-import sqlite3
 import json
+import threading
 from backend.db import (
+    bootstrap_db,
     init_db,
     seed_data,
     get_db,
-    ensure_plans_table,
-    save_labels_for_plan,
     get_labels_for_plan,
+    get_labels_page,
 )
+from backend.catalog import get_catalog
+from backend.planner import build_plan, build_plan_grid, iter_plan_ndjson, parse_field, parse_inputs, plan_cache_key
+from backend.metrics import register_collector, span
+from backend.metrics_service import init_app as init_metrics
+from backend.compression import init_app as init_compression
+from backend import offload, plan_codec
+from backend.plan_cache import AGENT_CACHE, PLAN_CACHE, json_dumper, json_options, splice_body, split_body
+from backend.plan_store import load_plan, storage_stats
+from backend.write_queue import get_writer, writers
+
+# Default database; create_app(db_path=...) or SASYA_DB_PATH override it
+DB_PATH = os.environ.get("SASYA_DB_PATH") or os.path.join(os.path.dirname(__file__), "..", "data", "sasya.db")
+
+# "auto": migrate/seed unless the schema is already current (one PRAGMA per
+# worker). "skip": the deployment ran `flask --app backend.app init-db`.
+DB_BOOTSTRAP = os.environ.get("SASYA_DB_BOOTSTRAP", "auto")
+
+main_bp = Blueprint("main", __name__)
+
+def _db_path():
+    return current_app.config["DB_PATH"]
+
+# ----------------- App factory -----------------
+def create_app(db_path=None, config=None):
+    """
+    Build the Flask app. Startup phases (ms) are kept in
+    app.extensions["sasya_startup_ms"] and exported on /metrics.
+    """
+    timings = {"import": _IMPORT_MS}
+    t = time.perf_counter()
+
+    def mark(phase):
+        nonlocal t
+        now = time.perf_counter()
+        timings[phase] = round((now - t) * 1000, 2)
+        t = now
+
+    app = Flask(__name__, static_folder="../frontend", static_url_path="/")
+    app.config["DB_PATH"] = db_path or DB_PATH
+    app.config.update(config or {})
+    CORS(app)
+
+    # Request timing, SQL timing and /metrics (see backend/metrics_service.py)
+    init_metrics(app)
+    # gzip/deflate (br if installed) by Accept-Encoding (see backend/compression.py)
+    init_compression(app)
+    mark("flask")
+
+    # ✅ --- Register AI Agent Blueprint (ADDED) ---
+    try:
+        from backend.agent_service import agent_bp
+        app.register_blueprint(agent_bp)
+        print("✅ AI Agent Blueprint registered successfully.")
+    except Exception as e:
+        print("⚠️ Could not register agent_service:", str(e))
+    mark("agent_service")
+    # --------------------------------------------------
+
+    # ✅ Batch plan generation (CSV/NDJSON uploads)
+    try:
+        from backend.batch_service import batch_bp
+        app.register_blueprint(batch_bp)
+    except Exception as e:
+        print("batch_service not registered:", str(e))
+    mark("batch_service")
+
+    # ✅ Monte Carlo economics scenarios
+    try:
+        from backend.scenario_service import scenario_bp
+        app.register_blueprint(scenario_bp)
+    except Exception as e:
+        print("scenario_service not registered:", str(e))
+    mark("scenario_service")
+
+    # ✅ Dashboard aggregates over saved plans
+    try:
+        from backend.stats_service import stats_bp
+        app.register_blueprint(stats_bp)
+    except Exception as e:
+        print("stats_service not registered:", str(e))
+    mark("stats_service")
+
+    # ✅ Optional PDF support
+    try:
+        from backend.pdf_service import pdf_bp
+        app.register_blueprint(pdf_bp)
+    except Exception as e:
+        print("pdf_service not registered:", str(e))
+    mark("pdf_service")
 
-# ----------------- Initialization -----------------
-app = Flask(__name__, static_folder="../frontend", static_url_path="/")
-CORS(app)
-
-# ✅ --- Register AI Agent Blueprint (ADDED) ---
-try:
-    from backend.agent_service import agent_bp
-    app.register_blueprint(agent_bp)
-    print("✅ AI Agent Blueprint registered successfully.")
-except Exception as e:
-    print("⚠️ Could not register agent_service:", str(e))
-# --------------------------------------------------
-
-# ✅ Optional PDF support
-try:
-    from backend.pdf_service import pdf_bp
-    app.register_blueprint(pdf_bp)
-except Exception as e:
-    print("pdf_service not registered:", str(e))
-
-# ----------------- Database Setup -----------------
-DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "sasya.db")
-os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-init_db(DB_PATH)
-seed_data(DB_PATH)
+    app.register_blueprint(main_bp)
+    mark("routes")
+
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Migrate and seed the database (run once per deployment)."""
+        init_db(app.config["DB_PATH"])
+        seed_data(app.config["DB_PATH"])
+        print(f"Database ready: {os.path.abspath(app.config['DB_PATH'])}")
+
+    @app.cli.command("rebuild-stats")
+    def rebuild_stats_command():
+        """Recompute the /api/stats summary tables from every saved plan."""
+        from backend.plan_stats import rebuild
+        result = rebuild(app.config["DB_PATH"])
+        print(f"Rebuilt plan stats from {result['plans']} plans "
+              f"({result['species_rows']} species rows, {result['total_rows']} total rows) "
+              f"in {result['seconds']} s")
+
+    # ----------------- Database Setup -----------------
+    if app.config.get("DB_BOOTSTRAP", DB_BOOTSTRAP) != "skip":
+        bootstrap_db(app.config["DB_PATH"])
+    mark("db_bootstrap")
+
+    timings["total"] = round(sum(v for k, v in timings.items()), 2)
+    app.extensions["sasya_startup_ms"] = timings
+    return app
+
+_app = None
+_app_lock = threading.Lock()
+
+def __getattr__(name):
+    # `from backend.app import app` keeps working: the default app is built on first access
+    global _app
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _app_lock:
+        if _app is None:
+            _app = create_app()
+    return _app
+
+@register_collector
+def _app_metrics():
+    stats = {"generate_plan": PLAN_CACHE.stats(), "ai_agent": AGENT_CACHE.stats()}
+    for field, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"),
+                        ("entries", "gauge"), ("bytes", "gauge")):
+        name = f"sasya_plan_cache_{field}" + ("_total" if kind == "counter" else "")
+        yield name, kind, f"Plan cache {field}.", [({"cache": c}, s[field]) for c, s in stats.items()]
+    queued = sum(w.stats()["queued"] for w in writers())
+    yield "sasya_plan_writer_queued", "gauge", "Plan saves waiting for the writer thread.", [({}, queued)]
+    startup = current_app.extensions.get("sasya_startup_ms", {})
+    yield "sasya_startup_seconds", "gauge", "Import and create_app() time by phase.", [
+        ({"phase": phase}, round(ms / 1000.0, 6)) for phase, ms in startup.items()
+    ]
 
 # ----------------- Endpoints -----------------
-@app.route("/health")
+@main_bp.route("/health")
 def health():
     return jsonify({"status": "ok", "service": "sasya-backend"})
 
-@app.route("/api/crops")
+def _catalog_response(body, etag):
+    """Serve a pre-serialized catalog body, answering 304 on a matching ETag."""
+    resp = Response(body, mimetype="application/json")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
+
+@main_bp.route("/api/crops")
 def list_crops():
-    db = get_db(DB_PATH)
-    cur = db.execute(
-        "SELECT id,name,min_rainfall,max_rainfall,typical_yield_kg_per_ha,market_price_per_kg,input_cost_per_ha FROM crops"
-    )
-    rows = [dict(r) for r in cur.fetchall()]
-    db.close()
-    return jsonify({"status": "ok", "count": len(rows), "rows": rows})
+    snap = get_catalog(_db_path()).snapshot()
+    return _catalog_response(snap.crops_body, snap.crops_etag)
 
-@app.route("/api/trees")
+@main_bp.route("/api/trees")
 def list_trees():
-    db = get_db(DB_PATH)
-    cur = db.execute(
-        "SELECT id,name,drought_tolerance,canopy_m,spacing_m,uses FROM trees"
-    )
-    rows = [dict(r) for r in cur.fetchall()]
-    db.close()
-    return jsonify({"status": "ok", "count": len(rows), "rows": rows})
+    snap = get_catalog(_db_path()).snapshot()
+    return _catalog_response(snap.trees_body, snap.trees_etag)
+
+def _wants_binary():
+    """?format=binary, or an Accept header preferring the binary encoding to JSON."""
+    if request.args.get("format") == "binary":
+        return True
+    return request.accept_mimetypes.best_match(
+        ["application/json", plan_codec.MIMETYPE]
+    ) == plan_codec.MIMETYPE
+
+def _binary_response(body):
+    resp = Response(body, mimetype=plan_codec.MIMETYPE)
+    resp.vary.add("Accept")
+    return resp
 
-@app.route("/api/generate_plan", methods=["POST"])
+@main_bp.route("/api/generate_plan", methods=["POST"])
 def generate_plan():
     """Rule-based plan generator (AI integration-ready)"""
-    payload = request.json or {}
-    db = get_db(DB_PATH)
-
-    rainfall = float(payload.get("rainfall_mm", payload.get("rainfall", 400)))
-    area_m2 = float(payload.get("area_m2", 8000))
-    soil_ph = float(payload.get("soil_ph", 6.5))
-    investment = payload.get("investment_level", payload.get("investment", "low"))
+    with span("parse"):
+        payload = request.json or {}
+        try:
+            parse_inputs(payload)
+            parse_field(payload)
+        except (TypeError, ValueError) as e:
+            return jsonify({"status": "error", "message": f"Invalid input: {e}"}), 400
+    with span("catalog"):
+        catalog = get_catalog(_db_path()).snapshot()
 
-    # Select crops
-    cur = db.execute(
-        "SELECT * FROM crops WHERE min_rainfall <= ? AND max_rainfall >= ? ORDER BY typical_yield_kg_per_ha DESC",
-        (rainfall, rainfall),
-    )
-    crops = cur.fetchall()
-    if not crops:
-        cur = db.execute(
-            "SELECT * FROM crops ORDER BY typical_yield_kg_per_ha DESC LIMIT 5"
+    # ?stream=1 or Accept: application/x-ndjson -> header line, then cells row by row
+    wants_ndjson = request.accept_mimetypes.best_match(
+        ["application/json", "application/x-ndjson"]
+    ) == "application/x-ndjson"
+    if request.args.get("stream") in ("1", "true", "ndjson") or wants_ndjson:
+        return Response(
+            stream_with_context(iter_plan_ndjson(payload, catalog)),
+            mimetype="application/x-ndjson",
         )
-        crops = cur.fetchall()
 
-    primary = dict(crops[0]) if crops else {"name": "Unknown"}
-    intercrop = dict(crops[1]) if len(crops) > 1 else dict(crops[0])
+    # ?format=binary or Accept: application/x-sasya-plan -> typed code arrays (backend/plan_codec.py)
+    if _wants_binary():
+        with span("cache"):
+            key = ("binary",) + plan_cache_key(payload, catalog, "columnar")
+            parts = PLAN_CACHE.get(key)
+        cache_status = "hit"
+        if parts is None:
+            plan, grid = build_plan_grid(payload, catalog)
+            with span("serialize"):
+                parts = plan_codec.plan_parts(plan, grid)
+            PLAN_CACHE.put(key, parts, sum(len(p) for p in parts))
+            cache_status = "miss"
+        with span("serialize"):
+            resp = _binary_response(plan_codec.plan_body(parts, payload))
+        resp.headers["X-Plan-Cache"] = cache_status
+        return resp
 
-    # Select tree
-    cur = db.execute(
-        "SELECT * FROM trees ORDER BY CASE drought_tolerance WHEN 'high' THEN 1 WHEN 'medium' THEN 2 ELSE 3 END, spacing_m ASC LIMIT 1"
-    )
-    tree = cur.fetchone()
-    tree = dict(tree) if tree else {"name": "Neem", "spacing_m": 8}
-
-    # Generate layout grid
-    cell_size_m = 4.0
-    side_m = area_m2 ** 0.5
-    cols = max(3, int(side_m // cell_size_m))
-    rows = max(3, int(area_m2 // (cols * cell_size_m)))
-    if rows < 3:
-        rows = cols
-
-    layout = []
-    for r in range(rows):
-        for c in range(cols):
-            cell_id = f"r{r}_c{c}"
-            x_m = round(c * cell_size_m, 2)
-            y_m = round(r * cell_size_m, 2)
-            if r in (0, rows - 1) or c in (0, cols - 1):
-                cell_type = "tree"
-                species = tree["name"]
-            else:
-                cell_type = "crop"
-                species = primary["name"] if r % 2 == 0 else intercrop["name"]
-            layout.append(
-                {
-                    "cell_id": cell_id,
-                    "r": r,
-                    "c": c,
-                    "type": cell_type,
-                    "species": species,
-                    "x_m": x_m,
-                    "y_m": y_m,
-                    "area_m2": cell_size_m * cell_size_m,
-                }
-            )
+    # ?layout=columnar (or "layout_format": "columnar") opts into parallel arrays
+    layout_format = request.args.get("layout") or payload.get("layout_format")
 
-    # Economics
-    econ = {"by_species": {}, "total_revenue": 0, "total_cost": 0, "total_net": 0}
-    for cell in layout:
-        sp = cell["species"]
-        cur = db.execute("SELECT * FROM crops WHERE name=? LIMIT 1", (sp,))
-        crop = cur.fetchone()
-        if crop:
-            ha = cell["area_m2"] / 10000.0
-            yield_kg = crop["typical_yield_kg_per_ha"] * ha
-            revenue = yield_kg * crop["market_price_per_kg"]
-            cost = crop["input_cost_per_ha"] * ha
-            net = revenue - cost
-            if sp not in econ["by_species"]:
-                econ["by_species"][sp] = {
-                    "area_m2": 0,
-                    "revenue": 0,
-                    "cost": 0,
-                    "net": 0,
-                    "yield_kg": 0,
-                }
-            econ["by_species"][sp]["area_m2"] += cell["area_m2"]
-            econ["by_species"][sp]["yield_kg"] += yield_kg
-            econ["by_species"][sp]["revenue"] += revenue
-            econ["by_species"][sp]["cost"] += cost
-            econ["by_species"][sp]["net"] += net
-            econ["total_revenue"] += revenue
-            econ["total_cost"] += cost
-            econ["total_net"] += net
-    db.close()
-
-    return jsonify(
-        {
-            "status": "ok",
-            "input": payload,
-            "primary_crop": primary,
-            "intercrop": intercrop,
-            "boundary_tree": tree,
-            "layout": {
-                "rows": rows,
-                "cols": cols,
-                "cell_size_m": cell_size_m,
-                "cells": layout,
-            },
-            "economics": econ,
-            "explanation": {
-                "method": "Rule-based fallback (AI model integration pending)"
-            },
-        }
-    )
+    # Cached response bytes (minus the "input" echo) for equivalent requests
+    pretty, dumps = json_dumper(current_app)
+    with span("cache"):
+        key = (pretty,) + plan_cache_key(payload, catalog, layout_format)
+        parts = PLAN_CACHE.get(key)
+    cache_status = "hit"
+    if parts is None:
+        if offload.is_heavy(payload, layout_format):
+            # big grids are built and serialized in the heavy-work process pool
+            try:
+                with span("offload"):
+                    parts = offload.build_plan_parts(payload, catalog, layout_format, json_options(current_app)[1])
+            except OverflowError as e:
+                return jsonify({"status": "error", "message": str(e)}), 503
+        else:
+            plan = build_plan(payload, catalog, layout_format)
+            with span("serialize"):
+                parts = split_body(plan, "input", dumps)
+        PLAN_CACHE.put(key, parts, len(parts[0]) + len(parts[1]))
+        cache_status = "miss"
+    with span("serialize"):
+        body = splice_body(parts, payload, dumps, pretty)
+    resp = Response(body, mimetype=current_app.json.mimetype)
+    resp.headers["X-Plan-Cache"] = cache_status
+    resp.vary.add("Accept")
+    return resp
 
-@app.route("/api/save_plan", methods=["POST"])
+@main_bp.route("/api/plan_cache", methods=["GET"])
+def plan_cache_stats():
+    return jsonify({"status": "ok", "generate_plan": PLAN_CACHE.stats(), "ai_agent": AGENT_CACHE.stats()})
+
+@main_bp.route("/api/save_plan", methods=["POST"])
 def save_plan():
     payload = request.json or {}
     farmer_name = (
@@ -190,48 +279,76 @@ def save_plan():
     )
     plan_json = payload.get("plan") or payload
 
-    ensure_plans_table(DB_PATH)
-    plan_text = json.dumps(plan_json, ensure_ascii=False)
+    # Body is hashed, deduplicated and compressed; labels go to plan_grids.
+    # The writer thread commits concurrent saves together.
+    with span("write"):
+        plan_id, storage = get_writer(_db_path()).save(farmer_name, plan_json)
 
-    db = sqlite3.connect(DB_PATH)
-    cur = db.cursor()
-    cur.execute(
-        "INSERT INTO plans (farmer_name, plan_json) VALUES (?, ?)",
-        (farmer_name, plan_text),
-    )
-    db.commit()
-    plan_id = cur.lastrowid
-    db.close()
+    return jsonify({"status": "ok", "message": "Plan saved", "plan_id": plan_id, "storage": storage})
 
-    # Save labels
-    try:
-        layout_cells = plan_json.get("layout", {}).get("cells", [])
-        if layout_cells:
-            save_labels_for_plan(DB_PATH, plan_id, layout_cells)
-    except Exception as e:
-        print("Warning: could not save labels:", e)
+@main_bp.route("/api/plans/<int:plan_id>", methods=["GET"])
+def get_plan(plan_id):
+    saved = load_plan(_db_path(), plan_id)
+    if saved is None:
+        return jsonify({"status": "error", "message": "Plan not found"}), 404
+    body = {"status": "ok", **saved}
+    if _wants_binary():
+        return _binary_response(plan_codec.cells_body(body, ("plan", "layout", "cells")))
+    resp = jsonify(body)
+    resp.vary.add("Accept")
+    return resp
 
-    return jsonify({"status": "ok", "message": "Plan saved", "plan_id": plan_id})
+@main_bp.route("/api/plans/storage", methods=["GET"])
+def plan_storage():
+    return jsonify({"status": "ok", **storage_stats(_db_path()), "writer": get_writer(_db_path()).stats()})
 
-@app.route("/api/labels/<int:plan_id>", methods=["GET"])
+@main_bp.route("/api/labels/<int:plan_id>", methods=["GET"])
 def get_labels(plan_id):
+    """
+    Labels for a saved plan. Optional ?offset=&limit= paging and/or a
+    ?r0=&r1=&c0=&c1= window (half-open); paged responses also carry "total",
+    the number of cells in the window (or the plan) being paged through.
+    ?format=binary (or Accept: application/x-sasya-plan) sends them columnar.
+    """
+    args = request.args
     try:
-        rows = get_labels_for_plan(DB_PATH, plan_id)
-        return jsonify({"status": "ok", "plan_id": plan_id, "count": len(rows), "labels": rows})
+        offset = args.get("offset", 0, type=int)
+        limit = args.get("limit", None, type=int)
+        window = None
+        if any(k in args for k in ("r0", "r1", "c0", "c1")):
+            big = 1 << 31
+            window = (
+                args.get("r0", 0, type=int), args.get("r1", big, type=int),
+                args.get("c0", 0, type=int), args.get("c1", big, type=int),
+            )
+        if offset or limit is not None or window is not None:
+            rows, total = get_labels_page(_db_path(), plan_id, offset=offset, limit=limit, window=window)
+            body = {"status": "ok", "plan_id": plan_id, "count": len(rows), "labels": rows,
+                    "total": total, "offset": offset}
+        else:
+            rows = get_labels_for_plan(_db_path(), plan_id)
+            body = {"status": "ok", "plan_id": plan_id, "count": len(rows), "labels": rows}
+        if _wants_binary():
+            return _binary_response(plan_codec.cells_body(body, ("labels",)))
+        resp = jsonify(body)
+        resp.vary.add("Accept")
+        return resp
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 # ----------------- New: dashboard route -----------------
-@app.route("/dashboard")
-@app.route("/dashboard.html")
+@main_bp.route("/dashboard")
+@main_bp.route("/dashboard.html")
 def dashboard():
     # serve the dashboard.html file located in frontend/
-    return send_from_directory(app.static_folder, "dashboard.html")
+    return send_from_directory(current_app.static_folder, "dashboard.html")
 
-@app.route("/")
+@main_bp.route("/")
 def index():
-    return send_from_directory(app.static_folder, "index.html")
+    return send_from_directory(current_app.static_folder, "index.html")
+
+_IMPORT_MS = round((time.perf_counter() - _IMPORT_T0) * 1000, 2)
 
 # ----------------- Run -----------------
 if __name__ == "__main__":
-    app.run(debug=True, host="127.0.0.1", port=5000)
+    create_app().run(debug=True, host="127.0.0.1", port=5000)
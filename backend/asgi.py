@@ -0,0 +1,192 @@
+# backend/asgi.py
+"""
+ASGI entry point for the Flask app.
+
+    uvicorn backend.asgi:app --workers 2        (or: hypercorn backend.asgi:app)
+
+The event loop only moves bytes: every request runs the Flask app in a
+thread, so SQLite calls and plan building never block the loop. Requests to
+slow routes (plan generation, scenarios, batch uploads, PDF export and its
+long-polls) run in their own bounded thread pool, so however many of them
+are in flight, /health, /api/crops and the other fast routes still get a
+thread at once. The slow routes in turn push their CPU work to process pools
+(backend/offload.py, backend/pdf_service.py), keeping the GIL free for the
+fast ones.
+
+Each request is handled start to finish - including a streamed body and
+Flask's teardown - on one thread, which keeps Flask's context variables
+valid. Streamed responses are passed on with a small buffer for backpressure.
+
+    SASYA_ASGI_THREADS=16  SASYA_ASGI_SLOW_THREADS=8
+"""
+import asyncio
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+FAST_THREADS = int(os.environ.get("SASYA_ASGI_THREADS", 16))
+SLOW_THREADS = int(os.environ.get("SASYA_ASGI_SLOW_THREADS", 8))
+SLOW_PREFIXES = ("/api/generate_plan", "/api/generate_plans_batch", "/api/pdf_", "/api/plan_scenarios")
+STREAM_BUFFER = 8  # response chunks queued ahead of the client
+
+_DONE = object()
+
+
+def _environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", ()):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            key = "HTTP_" + name
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _run_wsgi(wsgi_app, environ, loop, queue, credits):
+    """
+    Worker thread: run the request and feed ("start"|"body", value) items to
+    `queue`. Each body chunk takes one of `credits`, given back once it is
+    sent, so a slow client holds up a streaming response, not memory.
+    """
+    def put(item):
+        if item is not _DONE and item[0] == "body":
+            credits.acquire()
+        loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [(status, headers)]
+        return lambda data: put(("body", data))  # legacy write() callable
+
+    try:
+        result = wsgi_app(environ, start_response)
+        try:
+            status, headers = started[0]
+            put(("start", (int(status.split(" ", 1)[0]), headers)))
+            for chunk in result:
+                if chunk:
+                    put(("body", chunk))
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+    except Exception:
+        if not started:
+            put(("start", (500, [("Content-Type", "text/plain")])))
+            put(("body", b"Internal Server Error"))
+        raise
+    finally:
+        put(_DONE)
+
+
+class AsgiApp:
+    """ASGI callable around a Flask app (built with create_app() on first use if not given)."""
+
+    def __init__(self, flask_app=None, fast_threads=FAST_THREADS, slow_threads=SLOW_THREADS):
+        self._flask_app = flask_app
+        self._lock = threading.Lock()
+        self.fast = ThreadPoolExecutor(fast_threads, thread_name_prefix="asgi-fast")
+        self.slow = ThreadPoolExecutor(slow_threads, thread_name_prefix="asgi-slow")
+
+    @property
+    def flask_app(self):
+        if self._flask_app is None:
+            with self._lock:
+                if self._flask_app is None:
+                    from backend.app import create_app
+                    self._flask_app = create_app()
+        return self._flask_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self.fast, lambda: self.flask_app)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        environ = _environ(scope, b"".join(chunks))
+
+        loop = asyncio.get_running_loop()
+        flask_app = self._flask_app or await loop.run_in_executor(self.fast, lambda: self.flask_app)
+        queue = asyncio.Queue()
+        credits = threading.Semaphore(STREAM_BUFFER)
+        pool = self.slow if scope["path"].startswith(SLOW_PREFIXES) else self.fast
+        worker = loop.run_in_executor(pool, _run_wsgi, flask_app, environ, loop, queue, credits)
+        item = None
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                kind, value = item
+                if kind == "start":
+                    status, headers = value
+                    await send({
+                        "type": "http.response.start",
+                        "status": status,
+                        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+                    })
+                else:
+                    await send({"type": "http.response.body", "body": value, "more_body": True})
+                    credits.release()
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        except Exception:
+            # client went away: let the request thread run to completion
+            while item is not _DONE:
+                credits.release()
+                item = await queue.get()
+            raise
+        finally:
+            await worker
+
+    def close(self):
+        self.fast.shutdown(wait=False)
+        self.slow.shutdown(wait=False)
+
+
+app = AsgiApp()
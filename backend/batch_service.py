@@ -0,0 +1,266 @@
+# backend/batch_service.py
+"""
+Batch plan generation for survey-scale inputs.
+
+Extension officers upload CSV or NDJSON files of farmer records (rainfall_mm,
+area_m2, soil_ph, investment_level, plus any id/name columns). Every record
+goes through planner.build_plan() against one shared catalog snapshot, spread
+over a process pool, and the plans are streamed back as NDJSON in input
+order. The last line reports throughput.
+
+HTTP:  POST /api/generate_plans_batch?workers=4&layout=none   (CSV or NDJSON body)
+CLI:   python -m backend.batch_service farmers.csv -o plans.ndjson --workers 4
+"""
+import csv
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+from backend.catalog import CatalogSnapshot, get_catalog
+from backend.db import bootstrap_db
+from backend.planner import LAYOUT_FORMATS, build_plan
+
+batch_bp = Blueprint("batch", __name__)
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "sasya.db")
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+CHUNK_SIZE = 64           # records per pool task
+MAX_CHUNKS_IN_FLIGHT = 4  # per worker; bounds memory for very large uploads
+
+
+# ----------------- Input parsing -----------------
+def _clean(record):
+    # blank CSV cells should fall back to the planner defaults
+    return {k.strip(): v for k, v in record.items() if k and v not in ("", None)}
+
+
+def read_records(text, fmt=None):
+    """Yield farmer records from CSV or NDJSON text (format sniffed if not given)."""
+    if fmt is None:
+        fmt = "ndjson" if text.lstrip().startswith("{") else "csv"
+    if fmt == "ndjson":
+        for line in text.splitlines():
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield line  # reported as an error row, not a failed batch
+    else:
+        for row in csv.DictReader(io.StringIO(text)):
+            yield _clean(row)
+
+
+# ----------------- Worker side -----------------
+_worker_catalog = None
+
+
+def _init_worker(version, crops, trees):
+    global _worker_catalog
+    _worker_catalog = CatalogSnapshot(version, crops, trees)
+
+
+def _plan_lines(start, records, layout_format, catalog=None):
+    """Plan a chunk of records; returns (ok_count, NDJSON bytes)."""
+    catalog = catalog or _worker_catalog
+    out = []
+    ok = 0
+    for i, record in enumerate(records, start):
+        try:
+            if not isinstance(record, dict):
+                raise ValueError("record is not a JSON object")
+            plan = build_plan(record, catalog, layout_format)
+            plan["row"] = i
+            ok += 1
+        except Exception as e:
+            plan = {"status": "error", "row": i, "input": record, "message": str(e)}
+        out.append(json.dumps(plan, sort_keys=True, ensure_ascii=False))
+    return ok, ("\n".join(out) + "\n").encode("utf-8")
+
+
+# ----------------- Pool management -----------------
+_pools = {}        # (catalog version, size) -> [pool, running batches]
+_pool_key = None   # key of the most recently requested pool
+_pool_lock = threading.Lock()
+
+
+def _retire_idle_pools():
+    # caller holds _pool_lock; a pool is only shut down once no batch uses it
+    for key, (pool, users) in list(_pools.items()):
+        if users == 0 and key != _pool_key:
+            del _pools[key]
+            pool.shutdown(wait=False)
+
+
+def _acquire_pool(catalog, workers):
+    """
+    The pool for (catalog version, size), marked in use until _release_pool().
+    Pools for an older catalog or another size are shut down once the
+    batches still streaming from them finish.
+    """
+    import multiprocessing  # only needed once a batch runs
+    from concurrent.futures import ProcessPoolExecutor
+
+    global _pool_key
+    key = (catalog.version, workers)
+    with _pool_lock:
+        entry = _pools.get(key)
+        if entry is None:
+            entry = _pools[key] = [
+                ProcessPoolExecutor(
+                    max_workers=workers,
+                    # not fork: the server's threads hold locks and SQLite connections
+                    mp_context=multiprocessing.get_context("forkserver"),
+                    initializer=_init_worker,
+                    initargs=(catalog.version, catalog.crops, catalog.trees),
+                ),
+                0,
+            ]
+        entry[1] += 1
+        _pool_key = key
+        _retire_idle_pools()
+        return key, entry[0]
+
+
+def _release_pool(key):
+    with _pool_lock:
+        _pools[key][1] -= 1
+        _retire_idle_pools()
+
+
+def _enumerate_chunks(records, size):
+    """Yield (index of first record, list of records) chunks."""
+    start, chunk = 0, []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield start, chunk
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield start, chunk
+
+
+def run_batch(records, catalog, workers=DEFAULT_WORKERS, layout_format="none", chunk_size=CHUNK_SIZE):
+    """
+    Yield NDJSON byte chunks for `records`, in input order, followed by a
+    summary line with the plans/sec throughput (error rows not counted).
+    """
+    t0 = time.perf_counter()
+    total = ok = 0
+
+    if workers <= 1:
+        for start, chunk in _enumerate_chunks(records, chunk_size):
+            n_ok, data = _plan_lines(start, chunk, layout_format, catalog)
+            total += len(chunk)
+            ok += n_ok
+            yield data
+    else:
+        key, pool = _acquire_pool(catalog, workers)
+        try:
+            window = deque()
+            for start, chunk in _enumerate_chunks(records, chunk_size):
+                window.append((len(chunk), pool.submit(_plan_lines, start, chunk, layout_format)))
+                if len(window) >= workers * MAX_CHUNKS_IN_FLIGHT:
+                    n, fut = window.popleft()
+                    n_ok, data = fut.result()
+                    total += n
+                    ok += n_ok
+                    yield data
+            while window:
+                n, fut = window.popleft()
+                n_ok, data = fut.result()
+                total += n
+                ok += n_ok
+                yield data
+        finally:
+            _release_pool(key)
+
+    seconds = time.perf_counter() - t0
+    summary = {
+        "status": "done",
+        "count": total,
+        "ok": ok,
+        "errors": total - ok,
+        "workers": workers,
+        "catalog_version": catalog.version,
+        "seconds": round(seconds, 3),
+        "plans_per_sec": round(ok / seconds, 1) if seconds > 0 else None,
+    }
+    yield (json.dumps(summary) + "\n").encode("utf-8")
+
+
+# ----------------- Endpoint -----------------
+@batch_bp.route("/api/generate_plans_batch", methods=["POST"])
+def generate_plans_batch():
+    """Stream plans for a CSV/NDJSON upload as NDJSON, one line per record."""
+    layout_format = request.args.get("layout", "none")
+    if layout_format not in LAYOUT_FORMATS:
+        return jsonify({"status": "error", "message": f"layout must be one of {LAYOUT_FORMATS}"}), 400
+    try:
+        workers = max(1, min(int(request.args.get("workers", DEFAULT_WORKERS)), DEFAULT_WORKERS))
+    except ValueError:
+        return jsonify({"status": "error", "message": "workers must be an integer"}), 400
+
+    content_type = request.mimetype or ""
+    fmt = "ndjson" if "ndjson" in content_type or "json" in content_type else None
+    if "csv" in content_type:
+        fmt = "csv"
+    text = request.get_data(as_text=True)
+    records = read_records(text, fmt)
+
+    catalog = get_catalog(current_app.config.get("DB_PATH", DB_PATH)).snapshot()
+    return Response(
+        stream_with_context(run_batch(records, catalog, workers, layout_format)),
+        mimetype="application/x-ndjson",
+    )
+
+
+# ----------------- CLI -----------------
+def main(argv=None):
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Generate plans for a CSV/NDJSON file of farmer records.")
+    ap.add_argument("input", help="CSV or NDJSON file ('-' for stdin)")
+    ap.add_argument("-o", "--output", default="-", help="NDJSON output file (default: stdout)")
+    ap.add_argument("--format", choices=("csv", "ndjson"), help="input format (default: sniffed)")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    ap.add_argument("--layout", choices=LAYOUT_FORMATS, default="none")
+    ap.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    ap.add_argument("--db", default=DB_PATH)
+    args = ap.parse_args(argv)
+
+    if args.input == "-":
+        text = sys.stdin.read()
+    else:
+        with open(args.input, encoding="utf-8-sig") as f:
+            text = f.read()
+    bootstrap_db(args.db)  # migrates, and seeds a new database as create_app() does
+    catalog = get_catalog(args.db).snapshot()
+
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        last = b""
+        for data in run_batch(read_records(text, args.format), catalog, args.workers, args.layout, args.chunk_size):
+            out.write(data)
+            last = data
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    summary = json.loads(last)
+    print(
+        f"{summary['ok']} plans ({summary['errors']} errors) in {summary['seconds']}s "
+        f"= {summary['plans_per_sec']} plans/sec with {summary['workers']} workers",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# backend/catalog.py
+"""
+Versioned in-memory crop/tree catalog.
+
+The catalog tables are effectively static, so they are loaded once per process
+and shared by /api/generate_plan, /api/ai_agent and the list endpoints.
+A snapshot is replaced when the change counter in `catalog_meta` moves
+(see the triggers in SCHEMA_SQL, migration 1 of backend/migrations.py); the
+counter is only read after `PRAGMA data_version` reports a commit from
+another connection.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from backend.db import get_catalog_version
+from backend.db_pool import connect
+from backend.suitability import SuitabilityIndex
+
+# columns served by /api/crops and /api/trees (same as the old SELECTs)
+CROP_LIST_COLUMNS = (
+    "id", "name", "min_rainfall", "max_rainfall",
+    "typical_yield_kg_per_ha", "market_price_per_kg", "input_cost_per_ha",
+)
+TREE_LIST_COLUMNS = ("id", "name", "drought_tolerance", "canopy_m", "spacing_m", "uses")
+
+# same ordering as the boundary-tree SQL: high, medium, then everything else
+DROUGHT_RANK = {"high": 1, "medium": 2}
+
+# how often (seconds) a snapshot re-checks the database for changes
+CHECK_INTERVAL_S = 1.0
+
+
+def _list_body(rows, columns):
+    """Serialize a list endpoint body exactly like jsonify() would."""
+    payload = {
+        "status": "ok",
+        "count": len(rows),
+        "rows": [{k: r.get(k) for k in columns} for r in rows],
+    }
+    body = (json.dumps(payload, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+    etag = hashlib.sha1(body).hexdigest()
+    return body, etag
+
+
+def _tree_sort_key(tree):
+    spacing = tree.get("spacing_m")
+    return (DROUGHT_RANK.get(tree.get("drought_tolerance"), 3), spacing is not None, spacing or 0)
+
+
+class CatalogSnapshot:
+    """Immutable view of the crops/trees tables at one catalog version."""
+
+    def __init__(self, version, crops, trees):
+        self.version = version
+        self.crops = crops
+        self.trees = trees
+
+        # ORDER BY typical_yield_kg_per_ha DESC (NULLs last, ties by id)
+        self.crops_by_yield = sorted(
+            crops,
+            key=lambda c: (c.get("typical_yield_kg_per_ha") is None, -(c.get("typical_yield_kg_per_ha") or 0)),
+        )
+        self.crops_by_name = {}
+        for crop in crops:
+            self.crops_by_name.setdefault(crop["name"], crop)
+
+        self.suitability = SuitabilityIndex(self.crops_by_yield)
+        self.boundary_tree = min(trees, key=_tree_sort_key) if trees else None
+
+        self.crops_body, self.crops_etag = _list_body(crops, CROP_LIST_COLUMNS)
+        self.trees_body, self.trees_etag = _list_body(trees, TREE_LIST_COLUMNS)
+
+    def suitable_crops(self, rainfall, soil_ph=None, season=None, limit=None):
+        """Crops whose rainfall window contains `rainfall`, highest yield first."""
+        return self.suitability.query(rainfall, soil_ph=soil_ph, season=season, limit=limit)
+
+
+class Catalog:
+    """Process-wide loader that keeps one CatalogSnapshot up to date."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._snapshot = None
+        self._data_version = None
+        self._checked_at = 0.0
+
+    def _connect(self):
+        # dedicated connection: it never writes, so data_version only moves
+        # when some other connection commits
+        return connect(self.db_path)
+
+    def _load(self, version):
+        crops = [dict(r) for r in self._conn.execute("SELECT * FROM crops ORDER BY id")]
+        trees = [dict(r) for r in self._conn.execute("SELECT * FROM trees ORDER BY id")]
+        return CatalogSnapshot(version, crops, trees)
+
+    def snapshot(self):
+        """Return the current snapshot, reloading it if the tables changed."""
+        snap = self._snapshot
+        if snap is not None and time.monotonic() - self._checked_at < CHECK_INTERVAL_S:
+            return snap
+
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._snapshot is None or data_version != self._data_version:
+                version = get_catalog_version(self._conn)
+                if self._snapshot is None or version != self._snapshot.version:
+                    self._snapshot = self._load(version)
+                self._data_version = data_version
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        """Force a reload on the next snapshot() call."""
+        with self._lock:
+            self._snapshot = None
+            self._checked_at = 0.0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(db_path):
+    """Shared Catalog for a database file (one per process)."""
+    key = os.path.abspath(db_path)
+    catalog = _catalogs.get(key)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.get(key)
+            if catalog is None:
+                catalog = _catalogs[key] = Catalog(key)
+    return catalog
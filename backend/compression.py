@@ -0,0 +1,133 @@
+# backend/compression.py
+"""
+Content-Encoding negotiation for API responses.
+
+init_app(app) compresses responses for clients that send Accept-Encoding:
+gzip and deflate come from the standard library's zlib, br is offered only
+when the optional `brotli` module is importable. Plain JSON bodies of big
+plans shrink 20-50x (every cell repeats the same keys and a handful of
+species names), the binary encoding (backend/plan_codec.py) another few
+times. Streamed responses (NDJSON plans, batch results) are compressed
+chunk by chunk with a sync flush, so each row still reaches the client
+as soon as it is generated.
+
+Left alone: bodies under MIN_BYTES, file responses (static pages, PDFs,
+anything served with direct_passthrough), already-encoded bodies and media
+types outside COMPRESSIBLE. An ETag on a compressed response is made weak,
+so If-None-Match still matches the representation it was computed for.
+Bodies over FAST_ABOVE_MB (multi-hectare "cells" plans) use level 1: about
+twice as fast as 6 for ~15% more bytes (bench/bench_encodings.py).
+
+    SASYA_COMPRESS=1  SASYA_COMPRESS_LEVEL=6  SASYA_COMPRESS_MIN_BYTES=1024
+    SASYA_COMPRESS_FAST_ABOVE_MB=4
+"""
+import os
+import zlib
+
+from flask import request
+
+from backend.metrics import span
+
+try:
+    import brotli
+except ImportError:  # optional: br is simply not offered
+    brotli = None
+
+ENABLED = os.environ.get("SASYA_COMPRESS", "1") not in ("0", "false", "no")
+LEVEL = int(os.environ.get("SASYA_COMPRESS_LEVEL", 6))  # zlib 1-9; brotli quality is derived
+MIN_BYTES = int(os.environ.get("SASYA_COMPRESS_MIN_BYTES", 1024))
+FAST_ABOVE_BYTES = int(float(os.environ.get("SASYA_COMPRESS_FAST_ABOVE_MB", 4)) * 1024 * 1024)
+
+COMPRESSIBLE = (
+    "application/json",
+    "application/x-ndjson",
+    "application/x-sasya-plan",
+    "text/plain",
+    "text/csv",
+    "text/html",
+)
+
+# zlib wbits per HTTP coding: gzip wrapper / zlib wrapper ("deflate")
+_WBITS = {"gzip": 31, "deflate": 15}
+
+
+def available():
+    """Codings this process can produce, in server preference order."""
+    return (("br",) if brotli is not None else ()) + ("gzip", "deflate")
+
+
+def negotiate(accept_encodings):
+    """Best coding for a parsed Accept-Encoding header, or None for identity."""
+    best, best_q = None, 0
+    for coding in available():
+        q = accept_encodings[coding]  # "*" counts for any coding not listed
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(data, coding, level=LEVEL):
+    """Whole-body compression with `coding` ("br", "gzip" or "deflate")."""
+    if coding == "br":
+        return brotli.compress(data, quality=min(11, max(0, level - 2)))
+    c = zlib.compressobj(level, zlib.DEFLATED, _WBITS[coding])
+    return c.compress(data) + c.flush()
+
+
+def compress_stream(chunks, coding, level=LEVEL):
+    """Compress an iterable of byte chunks, flushing after every chunk."""
+    if coding == "br":
+        c = brotli.Compressor(quality=min(11, max(0, level - 2)))
+        for chunk in chunks:
+            out = c.process(chunk) + c.flush()
+            if out:
+                yield out
+        yield c.finish()
+        return
+    c = zlib.compressobj(level, zlib.DEFLATED, _WBITS[coding])
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        out = c.compress(chunk) + c.flush(zlib.Z_SYNC_FLUSH)
+        if out:
+            yield out
+    yield c.flush()
+
+
+def _vary(response):
+    response.vary.add("Accept-Encoding")
+
+
+def _after(response):
+    if (
+        response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE
+        or not 200 <= response.status_code < 300
+    ):
+        return response
+    _vary(response)
+    coding = negotiate(request.accept_encodings)
+    if coding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, coding)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < MIN_BYTES:
+            return response
+        with span("compress"):
+            response.set_data(compress(body, coding, LEVEL if len(body) <= FAST_ABOVE_BYTES else 1))
+    response.headers["Content-Encoding"] = coding
+
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    if ENABLED:
+        app.after_request(_after)
@@ -0,0 +1,200 @@
+# backend/crop_model.py
+"""
+Serving wrapper for the crop ranking model (ml/train_model.py).
+
+The model is loaded once per process, lazily and under a lock, so concurrent
+first requests share one load. The NumPy-only export (crop_ranker.npz, see
+backend/tree_eval.py) is preferred since it needs no sklearn import; the
+joblib pickle is the fallback. When ml/train_pipeline.py has written
+crop_ranker.json next to them, an artifact is only used if the metadata's
+features and CROP_INDEX match this module, its file hash matches, and (for
+the pickle) it was written by the installed scikit-learn. Every candidate crop for a request
+is scored in a single vectorized predict() call with one feature row per
+crop, using the CROP_INDEX position as `crop_type`. If the model file is
+missing or cannot be unpickled, or a crop is not in CROP_INDEX, a
+deterministic heuristic in the same units is used instead (net return per
+hectare in units of 10,000 currency).
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import warnings
+
+import numpy as np
+
+# MUST match CROP_INDEX in ml/train_model.py (the model's crop_type codes)
+CROP_INDEX = ["Pearl Millet","Sorghum","Pigeon Pea","Greengram","Sesame","Groundnut","Horsegram","Cowpea"]
+CROP_CODES = {name: i for i, name in enumerate(CROP_INDEX)}
+
+# training feature order in ml/train_model.py
+FEATURES = ("rainfall", "soil_ph", "area", "investment", "crop_type")
+INVESTMENT_CODES = {"low": 0, "medium": 1, "med": 1, "high": 2}
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "ml", "models")
+FLAT_MODEL_PATH = os.environ.get("SASYA_CROP_MODEL_FLAT", os.path.join(MODEL_DIR, "crop_ranker.npz"))
+MODEL_PATH = os.environ.get("SASYA_CROP_MODEL", os.path.join(MODEL_DIR, "crop_ranker.pkl"))
+METADATA_PATH = os.environ.get("SASYA_CROP_MODEL_META", os.path.join(MODEL_DIR, "crop_ranker.json"))
+METADATA_FORMATS = (1,)
+
+# the model is fed plain arrays in FEATURES order, not DataFrames
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
+
+def investment_code(investment):
+    if isinstance(investment, (int, float)):
+        return int(min(max(investment, 0), 2))
+    return INVESTMENT_CODES.get(str(investment).strip().lower(), 0)
+
+
+def read_metadata(path):
+    """Training metadata written by ml/train_pipeline.py, or None if absent."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("metadata_format") not in METADATA_FORMATS:
+        raise ValueError(f"unsupported model metadata format {meta.get('metadata_format')!r}")
+    if list(meta.get("features", ())) != list(FEATURES):
+        raise ValueError(f"model features {meta.get('features')} != {list(FEATURES)}")
+    if meta.get("crop_index") != CROP_INDEX:
+        raise ValueError("model CROP_INDEX does not match the server's")
+    return meta
+
+
+def check_artifact(meta, path):
+    """Raise ValueError if `path` is not the file described by `meta`."""
+    if meta is None:
+        return
+    expected = meta.get("files", {}).get(os.path.basename(path))
+    if expected is None:
+        raise ValueError(f"{os.path.basename(path)} is not listed in the model metadata")
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    if h.hexdigest() != expected:
+        raise ValueError(f"{os.path.basename(path)} does not match the model metadata (stale file?)")
+
+
+def heuristic_score(crop, soil_ph):
+    """Net return per ha / 10,000 from catalog figures, damped away from pH 6.5."""
+    gross = (crop.get("typical_yield_kg_per_ha") or 0) * (crop.get("market_price_per_kg") or 0)
+    net = (gross - (crop.get("input_cost_per_ha") or 0)) / 10000.0
+    return net * (1 - abs(soil_ph - 6.5) * 0.05)
+
+
+def confidence(scores):
+    """Softmax weight of the best score among the candidates (0 when empty)."""
+    if not scores:
+        return 0.0
+    top = max(scores)
+    weights = [math.exp(s - top) for s in scores]
+    return 1.0 / sum(weights)
+
+
+class CropRanker:
+    def __init__(self, path=MODEL_PATH, flat_path=FLAT_MODEL_PATH, metadata_path=METADATA_PATH):
+        self.path = path
+        self.flat_path = flat_path
+        self.metadata_path = metadata_path
+        self.version = None
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._model = None
+        self._columns = None
+        self.kind = None
+        self.load_ms = None
+        self.error = None
+
+    def _load_model(self):
+        meta = read_metadata(self.metadata_path)
+        self.version = meta.get("model_version") if meta else None
+        if self.flat_path and os.path.exists(self.flat_path):
+            try:
+                check_artifact(meta, self.flat_path)
+                from backend.tree_eval import FlatTreeEnsemble
+                return "flat", FlatTreeEnsemble.load(self.flat_path, crop_index=CROP_INDEX)
+            except ValueError as e:
+                print("crop_ranker.npz skipped:", e)
+        check_artifact(meta, self.path)
+        if meta is not None:
+            import sklearn
+            if meta.get("sklearn_version") != sklearn.__version__:
+                raise ValueError(
+                    f"pickle was written by scikit-learn {meta.get('sklearn_version')}, "
+                    f"installed is {sklearn.__version__}"
+                )
+        import joblib
+        return "sklearn", joblib.load(self.path)
+
+    def load(self):
+        """The model, loading it on first use; None if it cannot be loaded."""
+        if self._loaded:
+            return self._model
+        with self._lock:
+            if self._loaded:
+                return self._model
+            t0 = time.perf_counter()
+            try:
+                kind, model = self._load_model()
+                names = getattr(model, "feature_names_in_", None)
+                columns = [FEATURES.index(n) for n in names] if names is not None else list(range(len(FEATURES)))
+                model.predict(np.zeros((1, len(FEATURES))))  # first predict is slow; pay it here
+                self._model, self._columns, self.kind = model, columns, kind
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                print("crop_ranker model not loaded, using heuristic scores:", self.error)
+            self.load_ms = round((time.perf_counter() - t0) * 1000, 2)
+            self._loaded = True
+            return self._model
+
+    def score(self, crops, rainfall, soil_ph, area_m2, investment):
+        """
+        Scores for `crops` (catalog rows) in the same order, plus timing info:
+        (scores, {"source", "format", "version", "inference_ms", "load_ms", "model_crops"}).
+        """
+        model = self.load()
+        scores = [None] * len(crops)
+        idx = [i for i, c in enumerate(crops) if c.get("name") in CROP_CODES] if model is not None else []
+
+        t0 = time.perf_counter()
+        if idx:
+            X = np.empty((len(idx), len(FEATURES)), dtype=np.float64)
+            X[:, 0] = rainfall
+            X[:, 1] = soil_ph
+            X[:, 2] = area_m2
+            X[:, 3] = investment_code(investment)
+            X[:, 4] = [CROP_CODES[crops[i]["name"]] for i in idx]
+            for i, s in zip(idx, model.predict(X[:, self._columns])):
+                scores[i] = float(s)
+        inference_ms = (time.perf_counter() - t0) * 1000
+
+        for i, crop in enumerate(crops):
+            if scores[i] is None:
+                scores[i] = heuristic_score(crop, soil_ph)
+
+        info = {
+            "source": "model" if idx else "heuristic",
+            "format": self.kind,
+            "version": self.version,
+            "model_crops": len(idx),
+            "inference_ms": round(inference_ms, 3),
+            "load_ms": self.load_ms,
+        }
+        return scores, info
+
+
+_ranker = None
+_ranker_lock = threading.Lock()
+
+
+def get_ranker():
+    global _ranker
+    if _ranker is None:
+        with _ranker_lock:
+            if _ranker is None:
+                _ranker = CropRanker()
+    return _ranker
@@ -1,28 +1,9 @@
 # backend/db.py
-import sqlite3
-import os
-
-SCHEMA_SQL = """
-CREATE TABLE IF NOT EXISTS crops (
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  name TEXT,
-  min_rainfall INTEGER,
-  max_rainfall INTEGER,
-  season TEXT,
-  typical_yield_kg_per_ha REAL,
-  input_cost_per_ha REAL,
-  market_price_per_kg REAL
-);
-
-CREATE TABLE IF NOT EXISTS trees (
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  name TEXT,
-  drought_tolerance TEXT,
-  canopy_m REAL,
-  spacing_m REAL,
-  uses TEXT
-);
-"""
+import json
+from itertools import islice
+from backend.db_pool import get_pool
+from backend.migrations import migrate
+from backend.label_codec import decode_grid, encode_cells
 
 SEED_CROPS = [
   ("Pearl Millet",200,600,"Kharif",800,10000,10),
@@ -43,93 +24,110 @@ SEED_TREES = [
 ]
 
 def get_db(db_path):
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """
+    Pooled connection for this thread (see backend/db_pool.py).
+    close() hands it back to the pool rather than closing it.
+    """
+    return get_pool(db_path).connection()
 
 def init_db(db_path):
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    conn = sqlite3.connect(db_path)
-    with conn:
-        conn.executescript(SCHEMA_SQL)
-    conn.close()
+    """Create/upgrade the schema (see backend/migrations.py)."""
+    migrate(db_path)
+
+def bootstrap_db(db_path):
+    """
+    Startup check for app workers: migrate, and seed a freshly created
+    database. Once the schema is current this costs one PRAGMA read per
+    process, so deployments that run init-db can start any number of workers.
+    """
+    if migrate(db_path):
+        seed_data(db_path)
 
 def seed_data(db_path):
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    # ensure tables exist
-    cur.executescript(SCHEMA_SQL)
-    # seed crops if empty
-    cur.execute("SELECT COUNT(1) as cnt FROM crops")
-    if cur.fetchone()[0] == 0:
-        cur.executemany(
-            "INSERT INTO crops (name,min_rainfall,max_rainfall,season,typical_yield_kg_per_ha,input_cost_per_ha,market_price_per_kg) VALUES (?,?,?,?,?,?,?)",
-            SEED_CROPS
-        )
-    # seed trees if empty
-    cur.execute("SELECT COUNT(1) as cnt FROM trees")
-    if cur.fetchone()[0] == 0:
-        cur.executemany(
-            "INSERT INTO trees (name,drought_tolerance,canopy_m,spacing_m,uses) VALUES (?,?,?,?,?)",
-            SEED_TREES
-        )
+    migrate(db_path)
+    conn = get_db(db_path)
+    try:
+        cur = conn.cursor()
+        # seed crops if empty
+        cur.execute("SELECT COUNT(1) as cnt FROM crops")
+        if cur.fetchone()[0] == 0:
+            cur.executemany(
+                "INSERT INTO crops (name,min_rainfall,max_rainfall,season,typical_yield_kg_per_ha,input_cost_per_ha,market_price_per_kg) VALUES (?,?,?,?,?,?,?)",
+                SEED_CROPS
+            )
+        # seed trees if empty
+        cur.execute("SELECT COUNT(1) as cnt FROM trees")
+        if cur.fetchone()[0] == 0:
+            cur.executemany(
+                "INSERT INTO trees (name,drought_tolerance,canopy_m,spacing_m,uses) VALUES (?,?,?,?,?)",
+                SEED_TREES
+            )
+        conn.commit()
+    finally:
+        conn.close()
 
-    conn.commit()
-    conn.close()
+def bump_catalog_version(conn):
+    """
+    Mark the crop/tree catalog as changed.
+    The crops/trees triggers already do this for normal writes; bulk loaders
+    that bypass them should call this once after committing.
+    """
+    conn.execute("UPDATE catalog_meta SET version = version + 1 WHERE id = 1")
+
+def get_catalog_version(conn):
+    row = conn.execute("SELECT version FROM catalog_meta WHERE id = 1").fetchone()
+    return row[0] if row else 0
 
 # ----------------- Plans table -----------------
 def ensure_plans_table(db_path):
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS plans (
-      id INTEGER PRIMARY KEY AUTOINCREMENT,
-      farmer_name TEXT,
-      plan_json TEXT,
-      created_at TEXT DEFAULT (datetime('now'))
-    );
-    """)
-    conn.commit()
-    conn.close()
+    """Kept for callers of the old API; the table is created by migrations."""
+    migrate(db_path)
+
+def insert_plan(db_path, farmer_name, plan_text):
+    """Insert a plans row and return its id."""
+    conn = get_db(db_path)
+    try:
+        cur = conn.execute(
+            "INSERT INTO plans (farmer_name, plan_json) VALUES (?, ?)",
+            (farmer_name, plan_text),
+        )
+        conn.commit()
+        return cur.lastrowid
+    finally:
+        conn.close()
 
 # ----------------- Labels table & helpers -----------------
 def ensure_labels_table(db_path):
-    """
-    Create labels table if not exists.
-    Stores cell-level metadata for each saved plan.
-    """
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS labels (
-      id INTEGER PRIMARY KEY AUTOINCREMENT,
-      plan_id INTEGER NOT NULL,
-      cell_id TEXT NOT NULL,
-      r INTEGER,
-      c INTEGER,
-      type TEXT,
-      species TEXT,
-      x_m REAL,
-      y_m REAL,
-      area_m2 REAL,
-      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    """)
-    conn.commit()
-    conn.close()
+    """Kept for callers of the old API; the table is created by migrations."""
+    migrate(db_path)
 
 def save_labels_for_plan(db_path, plan_id, layout_cells):
     """
-    Insert layout cell rows for a saved plan.
+    Store layout cells for a saved plan.
     layout_cells: list of dicts each containing
       cell_id, r, c, type, species, x_m, y_m, area_m2
+    Regular grids (everything generate_plan produces) are stored as one
+    run-length encoded plan_grids row; anything else as one labels row per cell.
     """
     if not layout_cells:
         return
-    ensure_labels_table(db_path)
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
+    conn = get_db(db_path)
+    try:
+        _insert_labels(conn, plan_id, layout_cells)
+        conn.commit()
+    finally:
+        conn.close()
+
+def _insert_labels(conn, plan_id, layout_cells):
+    """Store layout cells; True if stored as a grid that decodes back to exactly `layout_cells`."""
+    encoded = encode_cells(layout_cells)
+    if encoded is not None:
+        rows, cols, cell_size_m, cell_area_m2, palette, blob = encoded
+        conn.execute("""
+          INSERT OR REPLACE INTO plan_grids (plan_id, rows, cols, cell_size_m, cell_area_m2, palette, grid)
+          VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (plan_id, rows, cols, cell_size_m, cell_area_m2, json.dumps(palette), blob))
+        return True
     rows = []
     for c in layout_cells:
         rows.append((
@@ -143,21 +141,113 @@ def save_labels_for_plan(db_path, plan_id, layout_cells):
           c.get("y_m"),
           c.get("area_m2")
         ))
-    cur.executemany("""
+    conn.executemany("""
       INSERT INTO labels (plan_id, cell_id, r, c, type, species, x_m, y_m, area_m2)
       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, rows)
-    conn.commit()
-    conn.close()
+    return False
+
+def _load_grid(conn, plan_id):
+    row = conn.execute(
+        "SELECT rows, cols, cell_size_m, cell_area_m2, palette, grid FROM plan_grids WHERE plan_id = ?",
+        (plan_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    return decode_grid(row["rows"], row["cols"], row["cell_size_m"], row["cell_area_m2"],
+                       json.loads(row["palette"]), row["grid"])
+
+def _window_sql(window):
+    if window is None:
+        return "", []
+    return " AND r >= ? AND r < ? AND c >= ? AND c < ?", list(window)
+
+def _grid_total(grid, window):
+    return grid.count if window is None else grid.window_count(*window)
+
+def count_labels_for_plan(db_path, plan_id, window=None):
+    """Number of label cells for plan_id (inside window=(r0, r1, c0, c1) if given)."""
+    conn = get_db(db_path)
+    try:
+        grid = _load_grid(conn, plan_id)
+        if grid is not None:
+            return _grid_total(grid, window)
+        where, params = _window_sql(window)
+        return conn.execute(
+            "SELECT COUNT(*) FROM labels WHERE plan_id = ?" + where, [plan_id] + params
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+def _labels_page(conn, plan_id, offset, limit, window, with_total):
+    grid = _load_grid(conn, plan_id)
+    if grid is not None:
+        stop = None if limit is None else offset + limit
+        if window is not None:
+            rows = list(islice(grid.iter_window(*window), offset, stop))
+        else:
+            rows = list(grid.iter_cells(offset, stop))
+        return rows, _grid_total(grid, window) if with_total else None
+
+    where, params = _window_sql(window)
+    sql = "SELECT cell_id, r, c, type, species, x_m, y_m, area_m2 FROM labels WHERE plan_id = ?" + where
+    params = [plan_id] + params
+    total = None
+    if with_total:
+        total = conn.execute("SELECT COUNT(*) FROM labels WHERE plan_id = ?" + where, params).fetchone()[0]
+    sql += " ORDER BY id ASC"
+    if limit is not None or offset:
+        sql += " LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+    return [dict(r) for r in conn.execute(sql, params).fetchall()], total
+
+def get_labels_for_plan(db_path, plan_id, offset=0, limit=None, window=None):
+    """
+    Return list of label dicts for a given plan_id, row-major.
+    offset/limit page through the cells; window=(r0, r1, c0, c1) keeps only
+    cells with r0 <= r < r1 and c0 <= c < c1. Encoded grids are decoded
+    lazily, so a page or window only materializes the cells it returns.
+    """
+    conn = get_db(db_path)
+    try:
+        return _labels_page(conn, plan_id, offset, limit, window, with_total=False)[0]
+    finally:
+        conn.close()
+
+def get_labels_page(db_path, plan_id, offset=0, limit=None, window=None):
+    """
+    (labels, total): get_labels_for_plan() plus the number of cells the
+    page is taken from (those inside window, if given), reading the
+    stored grid once.
+    """
+    conn = get_db(db_path)
+    try:
+        return _labels_page(conn, plan_id, offset, limit, window, with_total=True)
+    finally:
+        conn.close()
 
-def get_labels_for_plan(db_path, plan_id):
+def compact_labels(db_path):
     """
-    Return list of label dicts for a given plan_id.
+    Re-encode legacy per-cell label rows as plan_grids where possible.
+    Returns (plans converted, label rows removed).
     """
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute("SELECT cell_id, r, c, type, species, x_m, y_m, area_m2 FROM labels WHERE plan_id = ? ORDER BY id ASC", (plan_id,))
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return rows
+    conn = get_db(db_path)
+    converted = removed = 0
+    try:
+        plan_ids = [r[0] for r in conn.execute(
+            "SELECT DISTINCT plan_id FROM labels WHERE plan_id NOT IN (SELECT plan_id FROM plan_grids)"
+        )]
+        for plan_id in plan_ids:
+            cells = [dict(r) for r in conn.execute(
+                "SELECT cell_id, r, c, type, species, x_m, y_m, area_m2 FROM labels WHERE plan_id = ? ORDER BY id ASC",
+                (plan_id,),
+            )]
+            if encode_cells(cells) is None:
+                continue
+            _insert_labels(conn, plan_id, cells)
+            removed += conn.execute("DELETE FROM labels WHERE plan_id = ?", (plan_id,)).rowcount
+            converted += 1
+            conn.commit()
+    finally:
+        conn.close()
+    return converted, removed
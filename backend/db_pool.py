@@ -0,0 +1,260 @@
+# backend/db_pool.py
+"""
+Pooled SQLite connections.
+
+Connections are opened once with WAL journaling and tuned pragmas, then reused:
+a thread that already holds a connection gets the same one back (nested
+helpers share it), and released connections go onto an idle stack for the
+next request instead of being closed. sqlite3's per-connection statement
+cache (`cached_statements`) keeps prepared statements warm across requests.
+In WAL mode readers no longer block behind the plan writer.
+
+set_query_observer(fn) makes every pooled execute()/executemany(), on the
+connection or on one of its cursors, report (sql, seconds) to fn;
+backend/metrics_service.py installs the SQL timing histogram this way.
+"""
+import atexit
+import os
+import sqlite3
+import threading
+import time
+
+BUSY_TIMEOUT_MS = 5000  # how long a writer waits for the write lock
+
+# applied to every new connection (journal_mode=WAL also persists in the file)
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),      # WAL + NORMAL is durable across app crashes
+    ("cache_size", -16000),         # ~16 MB page cache per connection
+    ("mmap_size", 256 * 1024 * 1024),
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", BUSY_TIMEOUT_MS),
+)
+
+STATEMENT_CACHE_SIZE = 256  # prepared statements kept per connection
+MAX_IDLE = 16               # idle connections kept per database
+
+_query_observer = None
+
+
+def set_query_observer(fn):
+    """Call fn(sql, seconds) after each pooled execute(); None turns timing off."""
+    global _query_observer
+    _query_observer = fn
+
+
+def connect(db_path):
+    """Open a new tuned connection (not pooled)."""
+    conn = sqlite3.connect(
+        db_path,
+        timeout=BUSY_TIMEOUT_MS / 1000.0,
+        check_same_thread=False,  # pooled connections move between threads, never shared
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+class _TimedCursor:
+    """sqlite3.Cursor whose execute()/executemany() report to the query observer."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, *args):
+        _timed(self._cursor.execute, sql, args)
+        return self
+
+    def executemany(self, sql, *args):
+        _timed(self._cursor.executemany, sql, args)
+        return self
+
+
+def _timed(method, sql, args):
+    observer = _query_observer
+    if observer is None:
+        return method(sql, *args)
+    t0 = time.perf_counter()
+    try:
+        return method(sql, *args)
+    finally:
+        observer(sql, time.perf_counter() - t0)
+
+
+class _Lease:
+    """One checkout of a raw connection; depth counts the proxies still open."""
+
+    __slots__ = ("conn", "depth", "savepoints")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.depth = 0
+        self.savepoints = 0
+
+
+class PooledConnection:
+    """
+    Proxy handed out by ConnectionPool. Behaves like a sqlite3.Connection,
+    except close() returns it to the pool (rolling back anything uncommitted,
+    just like closing a real connection would).
+
+    A nested proxy (a helper called while its caller holds the same
+    connection) that is handed out inside an open transaction gets a
+    SAVEPOINT: its commit() releases the savepoint and its rollback() undoes
+    only its own work, so the caller's transaction is committed by the caller.
+    """
+
+    def __init__(self, pool, lease):
+        self._pool = pool
+        self._lease = lease
+        self._conn = lease.conn
+        self._released = False
+        self._savepoint = None
+        if lease.depth > 1 and self._conn.in_transaction:
+            lease.savepoints += 1
+            self._savepoint = f"pool_nested_{lease.savepoints}"
+            self._conn.execute(f"SAVEPOINT {self._savepoint}")
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def cursor(self, *args):
+        return _TimedCursor(self._conn.cursor(*args))
+
+    def execute(self, sql, *args):
+        return _timed(self._conn.execute, sql, args)
+
+    def executemany(self, sql, *args):
+        return _timed(self._conn.executemany, sql, args)
+
+    def _end_savepoint(self, rollback):
+        name, self._savepoint = self._savepoint, None
+        if not self._conn.in_transaction:
+            return  # the caller's transaction already ended
+        if rollback:
+            self._conn.execute(f"ROLLBACK TO SAVEPOINT {name}")
+        self._conn.execute(f"RELEASE SAVEPOINT {name}")
+
+    def commit(self):
+        if self._savepoint is None:
+            self._conn.commit()
+        else:
+            self._end_savepoint(rollback=False)
+
+    def rollback(self):
+        if self._savepoint is None:
+            self._conn.rollback()
+        else:
+            self._end_savepoint(rollback=True)
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            if self._savepoint is not None:
+                # leave uncommitted nested work to the caller's transaction
+                self._end_savepoint(rollback=False)
+            self._pool._release(self._lease)
+
+
+class ConnectionPool:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._idle = []
+        self._all = set()
+        self._closed = False
+
+    def connection(self):
+        """Connection for the calling thread; call close() when done."""
+        local = self._local
+        lease = getattr(local, "lease", None)
+        with self._lock:
+            if lease is None or lease.depth == 0:  # depth 0: released, possibly by another thread
+                conn = self._idle.pop() if self._idle else None
+                lease = local.lease = _Lease(conn) if conn is not None else None
+            if lease is not None:
+                lease.depth += 1
+        if lease is None:
+            conn = connect(self.db_path)
+            lease = local.lease = _Lease(conn)
+            lease.depth = 1
+            with self._lock:
+                self._all.add(conn)
+        return PooledConnection(self, lease)
+
+    def _release(self, lease):
+        # the depth lives on the lease, not the thread, so a proxy may be
+        # closed from any thread
+        with self._lock:
+            lease.depth -= 1
+            if lease.depth > 0:
+                return
+        conn = lease.conn
+        if conn.in_transaction:
+            conn.rollback()
+        lease.savepoints = 0
+        with self._lock:
+            if not self._closed and len(self._idle) < MAX_IDLE:
+                self._idle.append(conn)
+                return
+            self._all.discard(conn)
+        conn.close()
+
+    def close_all(self):
+        """Close every connection this pool opened (shutdown hook)."""
+        with self._lock:
+            self._closed = True
+            conns = list(self._all)
+            self._all.clear()
+            self._idle.clear()
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path):
+    key = os.path.abspath(db_path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(key)
+    return pool
+
+
+def close_all_pools():
+    """Close all pooled connections, e.g. on worker shutdown."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+
+atexit.register(close_all_pools)
@@ -0,0 +1,99 @@
+# backend/economics.py
+"""
+Closed-form plan economics.
+
+The standard layout is a border ring of boundary trees with interior rows
+alternating intercrop (odd rows) and primary crop (even rows), so the number
+of cells per species follows directly from rows/cols. Economics is then
+O(species) using cached crop rows: no per-cell walk, no per-species SQL.
+"""
+from backend.layout_engine import CELL_SIZE_M, grid_shape
+
+
+def cell_counts(rows, cols, primary, intercrop, tree):
+    """
+    {species: cells} for a rows x cols layout, in row-major order of first
+    appearance (same order a cell-by-cell walk would produce).
+    """
+    interior_rows = max(0, rows - 2)
+    interior_cols = max(0, cols - 2)
+    odd_rows = (interior_rows + 1) // 2   # r = 1, 3, ... -> intercrop
+    even_rows = interior_rows // 2        # r = 2, 4, ... -> primary
+    border = rows * cols - interior_rows * interior_cols
+
+    counts = {}
+    for name, n in (
+        (tree, border),
+        (intercrop, odd_rows * interior_cols),
+        (primary, even_rows * interior_cols),
+    ):
+        if n:
+            counts[name] = counts.get(name, 0) + n
+    return counts
+
+
+def summarize(counts, crops_by_name, cell_area_m2, rounded=True):
+    """
+    Turn {species: cells} into the `economics` block of a plan.
+
+    rounded=True gives the per-species report used by generate_plan (rounded
+    figures, cell_count, a note for trees/non-crops). rounded=False gives the
+    raw per-crop sums the older generate_plan accumulated cell by cell.
+    """
+    if rounded:
+        econ = {"by_species": {}, "total_revenue": 0.0, "total_cost": 0.0, "total_net": 0.0}
+    else:
+        econ = {"by_species": {}, "total_revenue": 0, "total_cost": 0, "total_net": 0}
+
+    for sp, n in counts.items():
+        if rounded:
+            sp = sp or "unknown"
+        crop = crops_by_name.get(sp)
+        area = n * cell_area_m2
+        if crop:
+            if rounded:
+                ha = area / 10000.0
+                yield_kg = crop["typical_yield_kg_per_ha"] * ha
+                revenue = yield_kg * crop["market_price_per_kg"]
+                cost = crop["input_cost_per_ha"] * ha
+            else:
+                # per-cell figures times the cell count
+                ha = cell_area_m2 / 10000.0
+                yield_kg = crop["typical_yield_kg_per_ha"] * ha * n
+                revenue = crop["typical_yield_kg_per_ha"] * ha * crop["market_price_per_kg"] * n
+                cost = crop["input_cost_per_ha"] * ha * n
+            net = revenue - cost
+            if rounded:
+                econ["by_species"][sp] = {
+                    "area_m2": round(area, 2),
+                    "yield_kg": round(yield_kg, 2),
+                    "revenue": round(revenue, 2),
+                    "cost": round(cost, 2),
+                    "net": round(net, 2),
+                    "cell_count": int(area / cell_area_m2),
+                }
+            else:
+                econ["by_species"][sp] = {
+                    "area_m2": area,
+                    "revenue": revenue,
+                    "cost": cost,
+                    "net": net,
+                    "yield_kg": yield_kg,
+                }
+            econ["total_revenue"] += revenue
+            econ["total_cost"] += cost
+            econ["total_net"] += net
+        elif rounded:
+            econ["by_species"][sp] = {
+                "area_m2": round(area, 2),
+                "notes": "Tree or non-crop: long-term benefits",
+            }
+    return econ
+
+
+def plan_economics(area_m2, primary, intercrop, tree, crops_by_name,
+                   cell_size_m=CELL_SIZE_M, rounded=True):
+    """Economics for the standard layout of a field of `area_m2` (species names)."""
+    rows, cols = grid_shape(area_m2, cell_size_m)
+    counts = cell_counts(rows, cols, primary, intercrop, tree)
+    return summarize(counts, crops_by_name, round(cell_size_m * cell_size_m, 2), rounded=rounded)
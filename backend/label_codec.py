@@ -0,0 +1,170 @@
+# backend/label_codec.py
+"""
+Compact run-length encoding for saved plan labels.
+
+A plan layout is a regular rows x cols grid, so instead of one `labels` row
+per cell a plan is stored as:
+  - a palette of distinct (type, species) pairs, and
+  - the row-major grid as (palette code, run length) pairs, zlib-compressed.
+The border ring plus alternating crop rows come out at ~3 runs per grid row.
+Cell ids and x/y coordinates are derived from r/c and the cell size, so
+decoding reproduces the original label dicts exactly (whole-number
+coordinates and areas come back as floats, e.g. 4.0 for a browser's 4).
+"""
+import sys
+import zlib
+from array import array
+
+# version byte at the start of every blob
+CODEC_VERSION = 1
+
+# the keys of a decoded cell; cells carrying anything else are not encoded
+LABEL_KEYS = frozenset(("cell_id", "r", "c", "type", "species", "x_m", "y_m", "area_m2"))
+
+
+class LabelGrid:
+    """Decoded-on-demand view of one stored plan grid."""
+
+    def __init__(self, rows, cols, cell_size_m, cell_area_m2, palette, runs):
+        self.rows = rows
+        self.cols = cols
+        self.cell_size_m = cell_size_m
+        self.cell_area_m2 = cell_area_m2
+        self.palette = palette  # list of (type, species)
+        self.runs = runs        # flat array: code, length, code, length, ...
+
+    @property
+    def count(self):
+        return self.rows * self.cols
+
+    def _cell(self, r, c, code):
+        cell_type, species = self.palette[code]
+        cs = self.cell_size_m
+        return {
+            "cell_id": f"r{r}_c{c}",
+            "r": r,
+            "c": c,
+            "type": cell_type,
+            "species": species,
+            "x_m": round(c * cs, 2),
+            "y_m": round(r * cs, 2),
+            "area_m2": self.cell_area_m2,
+        }
+
+    def iter_cells(self, start=0, stop=None):
+        """Cells with row-major index in [start, stop), skipping whole runs."""
+        stop = self.count if stop is None else min(stop, self.count)
+        cols = self.cols
+        pos = 0
+        runs = self.runs
+        for i in range(0, len(runs), 2):
+            code, length = runs[i], runs[i + 1]
+            end = pos + length
+            if end > start:
+                for idx in range(max(pos, start), min(end, stop)):
+                    yield self._cell(idx // cols, idx % cols, code)
+            pos = end
+            if pos >= stop:
+                return
+
+    def window_count(self, r0, r1, c0, c1):
+        """Number of cells iter_window() yields for the same bounds."""
+        rows = min(self.rows, r1) - max(0, r0)
+        cols = min(self.cols, c1) - max(0, c0)
+        return max(0, rows) * max(0, cols)
+
+    def iter_window(self, r0, r1, c0, c1):
+        """Cells with r0 <= r < r1 and c0 <= c < c1, row-major."""
+        r0, r1 = max(0, r0), min(self.rows, r1)
+        c0, c1 = max(0, c0), min(self.cols, c1)
+        for r in range(r0, r1):
+            yield from self.iter_cells(r * self.cols + c0, r * self.cols + c1)
+
+
+def _number(value):
+    # JSON.stringify writes 4.0 as 4, so browser-saved plans carry ints here
+    if type(value) is float:
+        return value
+    if type(value) is int:
+        return float(value)
+    raise TypeError("not a number")
+
+
+def encode_cells(cells):
+    """
+    Encode layout cells as (rows, cols, cell_size_m, cell_area_m2, palette,
+    blob), or return None when the cells are not a complete row-major grid
+    with derived ids/coordinates and exactly the LABEL_KEYS (those are
+    stored the old way). A non-None result decodes back to `cells`.
+    """
+    if not cells:
+        return None
+    try:
+        rows = cells[-1]["r"] + 1
+        cols = cells[-1]["c"] + 1
+        if len(cells) != rows * cols:
+            return None
+        if cols > 1:
+            cell_size_m = _number(cells[1]["x_m"])
+        elif rows > 1:
+            cell_size_m = _number(cells[1]["y_m"])
+        else:
+            cell_size_m = 0.0
+        cell_area_m2 = _number(cells[0]["area_m2"])
+
+        palette = []
+        codes = {}
+        runs = array("I")
+        last = None
+        for idx, cell in enumerate(cells):
+            r, c = divmod(idx, cols)
+            if (
+                cell.keys() != LABEL_KEYS
+                or cell["r"] != r or cell["c"] != c
+                or cell["cell_id"] != f"r{r}_c{c}"
+                or _number(cell["x_m"]) != round(c * cell_size_m, 2)
+                or _number(cell["y_m"]) != round(r * cell_size_m, 2)
+                or _number(cell["area_m2"]) != cell_area_m2
+            ):
+                return None
+            key = (cell["type"], cell["species"])
+            code = codes.get(key)
+            if code is None:
+                code = codes[key] = len(palette)
+                palette.append(key)
+            if code == last:
+                runs[-1] += 1
+            else:
+                runs.append(code)
+                runs.append(1)
+                last = code
+    except (AttributeError, KeyError, TypeError, IndexError):
+        return None
+
+    if sys.byteorder != "little":
+        runs.byteswap()  # blobs are little-endian uint32
+    blob = bytes([CODEC_VERSION]) + zlib.compress(runs.tobytes())
+    return rows, cols, cell_size_m, cell_area_m2, palette, blob
+
+
+def decode_grid(rows, cols, cell_size_m, cell_area_m2, palette, blob):
+    """Inverse of encode_cells(); palette is a list of [type, species]."""
+    if not blob or blob[0] != CODEC_VERSION:
+        raise ValueError("unsupported label grid encoding")
+    runs = array("I")
+    runs.frombytes(zlib.decompress(blob[1:]))
+    if sys.byteorder != "little":
+        runs.byteswap()
+    return LabelGrid(rows, cols, cell_size_m, cell_area_m2, [tuple(p) for p in palette], runs)
+
+
+if __name__ == "__main__":
+    # python -m backend.label_codec [db_path]: re-encode legacy label rows
+    import os
+    from backend.db import compact_labels
+    from backend.migrations import migrate
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "data", "sasya.db")
+    migrate(db_path)
+    plans, rows = compact_labels(db_path)
+    print(f"Compacted {plans} plans, removed {rows} label rows")
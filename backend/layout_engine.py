@@ -0,0 +1,257 @@
+# backend/layout_engine.py
+"""
+Vectorized farm layout engine.
+
+The grid is held as NumPy arrays (species codes, type codes, boundary mask,
+x/y axes) instead of one dict per 4 m cell. Callers pick the response shape:
+`to_cells()` gives the original list-of-dicts, `to_columnar()` gives
+parallel code arrays plus a species dictionary, which is far smaller for
+large farms.
+
+Rectangular fields keep the original shape rule (grid_shape() from area_m2,
+a tree in every border cell). Surveyed boundary polygons go through
+build_field_layout(): the polygon is rasterized (backend/field_geometry.py)
+and trees sit at their real spacing_m along the perimeter.
+"""
+import numpy as np
+
+from backend import field_geometry
+
+CELL_SIZE_M = 4.0
+
+# type codes used in LayoutGrid.type_codes / the columnar "type_code" array
+TYPE_NAMES = ("crop", "tree")
+CROP, TREE = 0, 1
+
+
+def grid_shape(area_m2, cell_size_m=CELL_SIZE_M):
+    """Rows/cols for a roughly square field of `area_m2` (same rule as before)."""
+    side_m = area_m2 ** 0.5
+    cols = max(3, int(side_m // cell_size_m))
+    rows = max(3, int(area_m2 // (cols * cell_size_m)))
+    if rows < 3:
+        rows = cols
+    return rows, cols
+
+
+def _row_cells(r, species_row, type_row, names, xs, y_m, cell_area_m2, c0=0):
+    """Cell dicts for one row (or the slice of it starting at column c0)."""
+    return [
+        {
+            "cell_id": f"r{r}_c{c}",
+            "r": r,
+            "c": c,
+            "type": TYPE_NAMES[tp],
+            "species": names[sp],
+            "x_m": xs[c],
+            "y_m": y_m,
+            "area_m2": cell_area_m2,
+        }
+        for c, sp, tp in zip(range(c0, c0 + len(species_row)), species_row, type_row)
+    ]
+
+
+class LayoutGrid:
+    """One plan layout as arrays of shape (rows, cols)."""
+
+    def __init__(self, rows, cols, cell_size_m, species, species_codes, type_codes, boundary, mask=None):
+        self.rows = rows
+        self.cols = cols
+        self.cell_size_m = cell_size_m
+        self.species = species              # code -> species name
+        self.species_codes = species_codes  # int16 (rows, cols)
+        self.type_codes = type_codes        # uint8 (rows, cols), see TYPE_NAMES
+        self.boundary = boundary            # bool (rows, cols)
+        self.mask = mask                    # bool (rows, cols) cells in the field; None = all
+
+    @property
+    def x_m(self):
+        """x coordinate of each column (m)."""
+        return np.round(np.arange(self.cols) * self.cell_size_m, 2)
+
+    @property
+    def y_m(self):
+        """y coordinate of each row (m)."""
+        return np.round(np.arange(self.rows) * self.cell_size_m, 2)
+
+    @property
+    def cell_count(self):
+        if self.mask is not None:
+            return int(self.mask.sum())
+        return self.rows * self.cols
+
+    def species_counts(self):
+        """{species: number of cells} for species present, in species-code order."""
+        codes = self.species_codes if self.mask is None else self.species_codes[self.mask]
+        counts = np.bincount(codes.ravel(), minlength=len(self.species))
+        return {sp: n for sp, n in zip(self.species, counts.tolist()) if n}
+
+    def _axes(self):
+        cs = self.cell_size_m
+        xs = [round(c * cs, 2) for c in range(self.cols)]
+        ys = [round(r * cs, 2) for r in range(self.rows)]
+        return xs, ys
+
+    def to_cells(self, cell_area_m2=None):
+        """The classic `layout.cells` list: one dict per cell, row-major."""
+        if cell_area_m2 is None:
+            cell_area_m2 = self.cell_size_m * self.cell_size_m
+        if self.mask is not None:
+            cells = []
+            for _, row_cells in self.iter_rows(cell_area_m2):
+                cells.extend(row_cells)
+            return cells
+        xs, ys = self._axes()
+        cells = []
+        for r, (sp_row, tp_row) in enumerate(zip(self.species_codes.tolist(), self.type_codes.tolist())):
+            cells.extend(_row_cells(r, sp_row, tp_row, self.species, xs, ys[r], cell_area_m2))
+        return cells
+
+    def iter_rows(self, cell_area_m2=None, max_cells=None):
+        """
+        Yield (r, cells) row by row, like iter_layout_rows(); cells outside a
+        masked field are skipped and every run of inside cells is its own slice.
+        """
+        if cell_area_m2 is None:
+            cell_area_m2 = self.cell_size_m * self.cell_size_m
+        xs, ys = self._axes()
+        step = max_cells or self.cols
+        for r in range(self.rows):
+            sp_row, tp_row = self.species_codes[r], self.type_codes[r]
+            if self.mask is None:
+                runs = [(0, self.cols)]
+            else:
+                edges = np.flatnonzero(np.diff(np.concatenate(([0], self.mask[r].view(np.int8), [0]))))
+                runs = zip(edges[0::2].tolist(), edges[1::2].tolist())
+            for start, stop in runs:
+                for c0 in range(start, stop, step):
+                    c1 = min(stop, c0 + step)
+                    yield r, _row_cells(r, sp_row[c0:c1].tolist(), tp_row[c0:c1].tolist(),
+                                        self.species, xs, ys[r], cell_area_m2, c0)
+
+    def code_arrays(self):
+        """
+        Flat row-major (species_code, type_code) arrays in the narrowest
+        signed dtype; cells outside a masked field are -1 in both.
+        """
+        dtype = np.int8 if len(self.species) <= 127 else np.int16
+        species_codes = self.species_codes.astype(dtype)
+        type_codes = self.type_codes.astype(np.int8)
+        if self.mask is not None:
+            species_codes[~self.mask] = -1
+            type_codes[~self.mask] = -1
+        return species_codes.ravel(), type_codes.ravel()
+
+    def columnar_header(self):
+        """to_columnar() without the two code arrays."""
+        xs, ys = self._axes()
+        return {
+            "format": "columnar",
+            "species": list(self.species),
+            "types": list(TYPE_NAMES),
+            "x_m": xs,
+            "y_m": ys,
+        }
+
+    def to_columnar(self):
+        """
+        Columnar layout: row-major code arrays (cell i is r = i // cols,
+        c = i % cols) plus the species/type dictionaries and the x/y axes.
+        Cells outside a masked field have species_code and type_code -1.
+        """
+        species_codes, type_codes = self.code_arrays()
+        return {
+            **self.columnar_header(),
+            "species_code": species_codes.tolist(),
+            "type_code": type_codes.tolist(),
+        }
+
+
+def build_layout(area_m2, primary, intercrop, tree, cell_size_m=CELL_SIZE_M):
+    """
+    Border ring of `tree`, interior rows alternating `primary` (even rows)
+    and `intercrop` (odd rows). Arguments are species names (tree may be None).
+    """
+    rows, cols = grid_shape(area_m2, cell_size_m)
+
+    # species dictionary in row-major order of first appearance:
+    # border (row 0), first interior row (odd -> intercrop), then primary
+    species = []
+    for name in (tree, intercrop, primary):
+        if name not in species:
+            species.append(name)
+    code = {name: i for i, name in enumerate(species)}
+
+    boundary = np.zeros((rows, cols), dtype=bool)
+    boundary[0, :] = boundary[-1, :] = True
+    boundary[:, 0] = boundary[:, -1] = True
+
+    row_codes = np.where(np.arange(rows) % 2 == 0, code[primary], code[intercrop]).astype(np.int16)
+    species_codes = np.repeat(row_codes[:, None], cols, axis=1)
+    species_codes[boundary] = code[tree]
+
+    type_codes = boundary.astype(np.uint8)  # TREE on the ring, CROP inside
+
+    return LayoutGrid(rows, cols, cell_size_m, species, species_codes, type_codes, boundary)
+
+
+def build_field_layout(field, primary, intercrop, tree, tree_spacing_m, cell_size_m=CELL_SIZE_M):
+    """
+    Layout of a field_geometry.Field: interior rows alternate `primary`
+    (even rows) and `intercrop` (odd rows) as on a rectangle, and `tree` goes
+    in the field cell nearest each point `tree_spacing_m` apart along the
+    perimeter. Returns (LayoutGrid, number of trees planted).
+    """
+    mask = field_geometry.rasterize(field, cell_size_m)
+    rows, cols = mask.shape
+
+    species = []
+    for name in (tree, intercrop, primary):
+        if name not in species:
+            species.append(name)
+    code = {name: i for i, name in enumerate(species)}
+
+    # field cells with a 4-neighbour outside the field (or off the grid)
+    padded = np.pad(mask, 1)
+    boundary = mask & ~(padded[:-2, 1:-1] & padded[2:, 1:-1] & padded[1:-1, :-2] & padded[1:-1, 2:])
+
+    points = field_geometry.perimeter_points(field, tree_spacing_m)
+    tree_r, tree_c = field_geometry.snap_to_cells(points, mask, cell_size_m)
+    trees = np.zeros((rows, cols), dtype=bool)
+    trees[tree_r, tree_c] = True
+
+    row_codes = np.where(np.arange(rows) % 2 == 0, code[primary], code[intercrop]).astype(np.int16)
+    species_codes = np.repeat(row_codes[:, None], cols, axis=1)
+    species_codes[trees] = code[tree]
+    type_codes = trees.astype(np.uint8)
+
+    grid = LayoutGrid(rows, cols, cell_size_m, species, species_codes, type_codes, boundary, mask)
+    return grid, int(trees.sum())  # several perimeter points can snap to one cell
+
+
+def iter_layout_rows(area_m2, primary, intercrop, tree, cell_size_m=CELL_SIZE_M,
+                     cell_area_m2=None, max_cells=None):
+    """
+    Yield (r, cells) for the same layout build_layout() describes, one row at
+    a time and without holding the grid, so memory is O(cols) whatever the
+    area. Rows wider than `max_cells` are yielded in several slices.
+    """
+    rows, cols = grid_shape(area_m2, cell_size_m)
+    if cell_area_m2 is None:
+        cell_area_m2 = cell_size_m * cell_size_m
+    names = (tree, intercrop, primary)
+    xs = [round(c * cell_size_m, 2) for c in range(cols)]
+    step = max_cells or cols
+
+    border_sp, border_tp = [0] * cols, [TREE] * cols
+    inner_tp = [TREE] + [CROP] * (cols - 2) + [TREE]
+    odd_sp = [0] + [1] * (cols - 2) + [0]
+    even_sp = [0] + [2] * (cols - 2) + [0]
+    for r in range(rows):
+        if r in (0, rows - 1):
+            sp_row, tp_row = border_sp, border_tp
+        else:
+            sp_row, tp_row = (even_sp if r % 2 == 0 else odd_sp), inner_tp
+        y_m = round(r * cell_size_m, 2)
+        for c0 in range(0, cols, step):
+            yield r, _row_cells(r, sp_row[c0:c0 + step], tp_row[c0:c0 + step], names, xs, y_m, cell_area_m2, c0)
@@ -0,0 +1,226 @@
+# backend/metrics.py
+"""
+In-process counters and histograms, rendered in the Prometheus text format.
+
+Independent of Flask (backend/metrics_service.py installs the request hooks
+and serves /metrics), so the planner and other core modules can time their
+phases with `with span("layout"):`. Inside a request a span is also added
+to that request's Server-Timing breakdown; work outside a request (worker
+threads, PDF renders) is recorded under route="background". SQL timing
+comes from the pooled connections in backend/db_pool.py, which report each
+execute() to observe_sql() once it is installed as their query observer.
+"""
+import bisect
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+
+# seconds
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+
+# ----------------- Metric types -----------------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _num(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, doc, labels=()):
+        self.name, self.doc, self.label_names = name, doc, tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.label_names, key)} {_num(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics), one series per label set."""
+
+    def __init__(self, name, doc, labels=(), buckets=REQUEST_BUCKETS):
+        self.name, self.doc, self.label_names = name, doc, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.label_names)
+        i = bisect.bisect_left(self.buckets, value)  # first bucket with le >= value
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                running += count
+                le = _labels(self.label_names, key, [f'le="{_num(bound)}"'])
+                yield f"{self.name}_bucket{le} {running}"
+            yield f"{self.name}_sum{_labels(self.label_names, key)} {series[-1]!r}"
+            yield f"{self.name}_count{_labels(self.label_names, key)} {running}"
+
+
+_registry = []
+_collectors = []  # callables yielding (name, type, doc, [(labels dict, value)])
+
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def register_collector(fn):
+    """Add a callback that reports current values (cache sizes, queue depth...) at scrape time."""
+    _collectors.append(fn)
+    return fn
+
+
+REQUESTS = register(Counter(
+    "sasya_http_requests_total", "HTTP requests by route, method and status.",
+    ("method", "route", "status")))
+REQUEST_SECONDS = register(Histogram(
+    "sasya_http_request_duration_seconds", "Time spent handling a request (to response start).",
+    ("method", "route")))
+PHASE_SECONDS = register(Histogram(
+    "sasya_phase_duration_seconds", "Time spent in named phases of request handling.",
+    ("route", "phase")))
+SQL_SECONDS = register(Histogram(
+    "sasya_sql_query_duration_seconds", "SQLite execute() time by statement kind.",
+    ("route", "op"), buckets=SQL_BUCKETS))
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    for fn in _collectors:
+        try:
+            families = list(fn())
+        except Exception:
+            continue
+        for name, kind, doc, samples in families:
+            lines.append(f"# HELP {name} {doc}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                names = tuple(labels)
+                lines.append(f"{name}{_labels(names, [labels[n] for n in names])} {_num(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ----------------- Spans -----------------
+# per-request state (see request_started); None outside requests
+_current = contextvars.ContextVar("sasya_request_metrics", default=None)
+BACKGROUND = "background"
+
+
+def request_started(route):
+    """Make `route` the current request for spans and SQL timing; returns (token, state)."""
+    state = {"route": route, "spans": {}, "sql_s": 0.0, "sql_n": 0, "t0": time.perf_counter()}
+    return _current.set(state), state
+
+
+def request_finished(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(phase):
+    """Time a phase; inside a request it is also reported in Server-Timing."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        state = _current.get()
+        route = BACKGROUND
+        if state is not None:
+            route = state["route"]
+            spans = state["spans"]
+            spans[phase] = spans.get(phase, 0.0) + elapsed
+        PHASE_SECONDS.observe(elapsed, route=route, phase=phase)
+
+
+def observe_phase(phase, seconds, route=BACKGROUND):
+    """Record a phase measured elsewhere (e.g. in a worker process)."""
+    PHASE_SECONDS.observe(seconds, route=route, phase=phase)
+
+
+def observe_sql(sql, seconds):
+    state = _current.get()
+    route = BACKGROUND
+    if state is not None:
+        route = state["route"]
+        state["sql_s"] += seconds
+        state["sql_n"] += 1
+    op = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+    SQL_SECONDS.observe(seconds, route=route, op=op)
+
+
+# ----------------- Sampling profiler -----------------
+class SamplingProfiler:
+    """Samples one thread's stack every `interval_s`; folded() gives collapsed stacks."""
+
+    def __init__(self, thread_id, interval_s):
+        self.thread_id, self.interval_s = thread_id, interval_s
+        self.samples = _Tally()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sasya-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
@@ -0,0 +1,116 @@
+# backend/metrics_service.py
+"""
+Request timing middleware, /metrics and the opt-in sampling profiler.
+
+init_app(app) times every request by route (the URL rule, not the raw path,
+so plan ids don't multiply the series), reports the phase spans and SQL
+time of each request in its Server-Timing header, and serves /metrics in
+the Prometheus text format (see backend/metrics.py).
+
+Profiling: with SASYA_PROFILING=1, a request sent with ?profile=1 (or the
+header X-Profile: 1) has its thread's stack sampled every
+PROFILE_INTERVAL_MS. The response carries X-Profile-Id, and
+GET /debug/profiles/<id> returns the collapsed stacks (flamegraph.pl or
+speedscope input).
+
+    SASYA_METRICS=1  SASYA_PROFILING=0  SASYA_PROFILE_INTERVAL_MS=5
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import Blueprint, Response, g, request
+
+from backend.db_pool import set_query_observer
+from backend.metrics import (
+    REQUEST_SECONDS,
+    REQUESTS,
+    SamplingProfiler,
+    observe_sql,
+    render,
+    request_finished,
+    request_started,
+)
+
+ENABLED = os.environ.get("SASYA_METRICS", "1") not in ("0", "false", "no")
+PROFILING = os.environ.get("SASYA_PROFILING", "0") in ("1", "true", "yes")
+PROFILE_INTERVAL_MS = float(os.environ.get("SASYA_PROFILE_INTERVAL_MS", 5))
+MAX_PROFILES = 32  # most recent profiles kept in memory
+
+metrics_bp = Blueprint("metrics", __name__)
+
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def _wants_profile():
+    return PROFILING and (request.args.get("profile") in ("1", "true") or request.headers.get("X-Profile") == "1")
+
+
+def _before():
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    g._metrics_token, g._metrics = request_started(route)
+    if _wants_profile():
+        g._profiler = SamplingProfiler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000.0).start()
+
+
+def _after(response):
+    state = g.pop("_metrics", None)
+    if state is None:
+        return response
+    elapsed = time.perf_counter() - state["t0"]
+    REQUEST_SECONDS.observe(elapsed, method=request.method, route=state["route"])
+    REQUESTS.inc(method=request.method, route=state["route"], status=response.status_code)
+
+    timings = [f"{phase};dur={s * 1000:.2f}" for phase, s in state["spans"].items()]
+    if state["sql_n"]:
+        timings.append(f'sql;dur={state["sql_s"] * 1000:.2f};desc="{state["sql_n"]} queries"')
+    timings.append(f"total;dur={elapsed * 1000:.2f}")
+    response.headers["Server-Timing"] = ", ".join(timings)
+
+    profiler = g.pop("_profiler", None)
+    if profiler is not None:
+        profiler.stop()
+        profile_id = uuid.uuid4().hex[:12]
+        with _profiles_lock:
+            _profiles[profile_id] = profiler.folded()
+            while len(_profiles) > MAX_PROFILES:
+                _profiles.popitem(last=False)
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+def _teardown(exc):
+    token = g.pop("_metrics_token", None)
+    if token is not None:
+        request_finished(token)
+    profiler = g.pop("_profiler", None)
+    if profiler is not None:  # the request failed before after_request
+        profiler.stop()
+
+
+def init_app(app):
+    """Install request timing and the /metrics endpoint on `app` (skipped if SASYA_METRICS=0)."""
+    if not ENABLED:
+        return
+    set_query_observer(observe_sql)
+    app.before_request(_before)
+    app.after_request(_after)
+    app.teardown_request(_teardown)
+    app.register_blueprint(metrics_bp)
+
+
+@metrics_bp.route("/metrics")
+def metrics():
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
+
+@metrics_bp.route("/debug/profiles/<profile_id>")
+def get_profile(profile_id):
+    with _profiles_lock:
+        folded = _profiles.get(profile_id)
+    if folded is None:
+        return Response("unknown or expired profile\n", status=404, mimetype="text/plain")
+    return Response(folded, mimetype="text/plain")
@@ -0,0 +1,260 @@
+# backend/migrations.py
+"""
+Versioned schema migrations.
+
+All DDL lives here and runs once at startup (init_db), tracked with
+PRAGMA user_version, so no CREATE TABLE/INDEX statements sit on the request
+path. Statements are idempotent (IF NOT EXISTS, or a callable that checks
+first), which lets the early migrations upgrade databases created before
+versioning existed.
+
+To change the schema, append a (version, description, sql) entry; never edit
+one that has shipped.
+"""
+import os
+import sqlite3
+import threading
+
+from backend.db_pool import connect
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS crops (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name TEXT,
+  min_rainfall INTEGER,
+  max_rainfall INTEGER,
+  season TEXT,
+  typical_yield_kg_per_ha REAL,
+  input_cost_per_ha REAL,
+  market_price_per_kg REAL
+);
+
+CREATE TABLE IF NOT EXISTS trees (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name TEXT,
+  drought_tolerance TEXT,
+  canopy_m REAL,
+  spacing_m REAL,
+  uses TEXT
+);
+
+-- change counter for the in-memory catalog (backend/catalog.py)
+CREATE TABLE IF NOT EXISTS catalog_meta (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  version INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS crops_version_ins AFTER INSERT ON crops
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS crops_version_upd AFTER UPDATE ON crops
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS crops_version_del AFTER DELETE ON crops
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trees_version_ins AFTER INSERT ON trees
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trees_version_upd AFTER UPDATE ON trees
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trees_version_del AFTER DELETE ON trees
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+"""
+
+PLANS_LABELS_SQL = """
+CREATE TABLE IF NOT EXISTS plans (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  farmer_name TEXT,
+  plan_json TEXT,
+  created_at TEXT DEFAULT (datetime('now'))
+);
+
+-- cell-level metadata for each saved plan
+CREATE TABLE IF NOT EXISTS labels (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  plan_id INTEGER NOT NULL,
+  cell_id TEXT NOT NULL,
+  r INTEGER,
+  c INTEGER,
+  type TEXT,
+  species TEXT,
+  x_m REAL,
+  y_m REAL,
+  area_m2 REAL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS idx_labels_plan_id ON labels (plan_id);
+CREATE INDEX IF NOT EXISTS idx_crops_name ON crops (name);
+CREATE INDEX IF NOT EXISTS idx_crops_rainfall ON crops (min_rainfall, max_rainfall);
+"""
+
+PLAN_GRIDS_SQL = """
+-- run-length encoded label grids (backend/label_codec.py), one row per plan;
+-- plans whose cells are not a regular grid keep using `labels`
+CREATE TABLE IF NOT EXISTS plan_grids (
+  plan_id INTEGER PRIMARY KEY,
+  rows INTEGER NOT NULL,
+  cols INTEGER NOT NULL,
+  cell_size_m REAL NOT NULL,
+  cell_area_m2 REAL,
+  palette TEXT NOT NULL,
+  grid BLOB NOT NULL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+PLAN_BODIES_SQL = """
+-- content-addressed, compressed plan bodies (backend/plan_store.py);
+-- plans rows point at them through plans.body_hash
+CREATE TABLE IF NOT EXISTS plan_bodies (
+  hash TEXT PRIMARY KEY,
+  codec TEXT NOT NULL,
+  body BLOB NOT NULL,
+  raw_size INTEGER NOT NULL,
+  stored_size INTEGER NOT NULL,
+  ref_count INTEGER NOT NULL DEFAULT 0,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+PLAN_STATS_SQL = """
+-- dashboard aggregates kept up to date by each save (backend/plan_stats.py);
+-- grain 'd' rows are per day, 'm' rows per month (day = the 1st);
+-- rebuilt from the plans with `flask --app backend.app rebuild-stats`
+CREATE TABLE IF NOT EXISTS plan_stats (
+  grain TEXT NOT NULL,
+  day TEXT NOT NULL,
+  region TEXT NOT NULL,
+  species TEXT NOT NULL,
+  plans INTEGER NOT NULL,
+  cells INTEGER NOT NULL,
+  area_m2 REAL NOT NULL,
+  revenue REAL NOT NULL,
+  cost REAL NOT NULL,
+  net REAL NOT NULL,
+  PRIMARY KEY (grain, day, region, species)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS plan_stats_totals (
+  grain TEXT NOT NULL,
+  day TEXT NOT NULL,
+  region TEXT NOT NULL,
+  plans INTEGER NOT NULL,
+  area_m2 REAL NOT NULL,
+  revenue REAL NOT NULL,
+  cost REAL NOT NULL,
+  net REAL NOT NULL,
+  PRIMARY KEY (grain, day, region)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_plan_stats_region ON plan_stats (grain, region, day);
+-- covering: per-species series and all-time species totals never touch the table
+CREATE INDEX IF NOT EXISTS idx_plan_stats_species
+  ON plan_stats (grain, species, day, plans, cells, area_m2, revenue, cost, net);
+CREATE INDEX IF NOT EXISTS idx_plan_stats_totals_region ON plan_stats_totals (grain, region, day);
+"""
+
+
+PLAN_STATS_AREA_SQL = """
+-- plan_stats_totals.area_m2 is now the laid-out area like plan_stats.area_m2
+-- (the sum over species), not the requested input area
+UPDATE plan_stats_totals SET area_m2 = COALESCE((
+  SELECT SUM(s.area_m2) FROM plan_stats s
+  WHERE s.grain = plan_stats_totals.grain AND s.day = plan_stats_totals.day
+    AND s.region = plan_stats_totals.region
+), 0);
+"""
+
+
+def _add_plan_body_hash(conn):
+    columns = [r[1] for r in conn.execute("PRAGMA table_info(plans)")]
+    if "body_hash" not in columns:
+        conn.execute("ALTER TABLE plans ADD COLUMN body_hash TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_plans_body_hash ON plans (body_hash)")
+
+
+# (version, description, SQL script or callable(conn))
+MIGRATIONS = [
+    (1, "crop/tree catalog and change counter", SCHEMA_SQL),
+    (2, "plans and labels", PLANS_LABELS_SQL),
+    (3, "indexes on labels.plan_id, crops.name and crop rainfall ranges", INDEXES_SQL),
+    (4, "run-length encoded label grids", PLAN_GRIDS_SQL),
+    (5, "content-addressed plan bodies", PLAN_BODIES_SQL),
+    (6, "plans.body_hash", _add_plan_body_hash),
+    (7, "plan_stats summary tables", PLAN_STATS_SQL),
+    (8, "plan_stats_totals area from the laid-out cells", PLAN_STATS_AREA_SQL),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+_migrated = set()
+_lock = threading.Lock()
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _statements(sql):
+    """Split a script into complete statements (trigger bodies stay whole)."""
+    buf = ""
+    for line in sql.splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            yield buf
+            buf = ""
+    if buf.strip() and not buf.strip().startswith("--"):
+        yield buf
+
+
+def _apply(conn, version, step):
+    """
+    Run one migration in its own write transaction. The version is re-read
+    after taking the write lock, so concurrent workers apply it only once.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if get_schema_version(conn) >= version:
+            conn.execute("ROLLBACK")
+            return False
+        if callable(step):
+            step(conn)
+        else:
+            for stmt in _statements(step):
+                conn.execute(stmt)
+        conn.execute(f"PRAGMA user_version = {version}")
+        conn.execute("COMMIT")
+        return True
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def migrate(db_path):
+    """
+    Bring `db_path` up to SCHEMA_VERSION. Cheap after the first call in a
+    process; returns the list of versions applied by this call.
+    """
+    key = os.path.abspath(db_path)
+    if key in _migrated:
+        return []
+    with _lock:
+        if key in _migrated:
+            return []
+        os.makedirs(os.path.dirname(key), exist_ok=True)
+        conn = connect(key)
+        conn.isolation_level = None  # explicit BEGIN/COMMIT below
+        applied = []
+        try:
+            current = get_schema_version(conn)
+            for version, description, step in MIGRATIONS:
+                if version <= current:
+                    continue
+                if _apply(conn, version, step):
+                    applied.append(version)
+                    print(f"DB migration {version} applied: {description}")
+        finally:
+            conn.close()
+        _migrated.add(key)
+        return applied
@@ -0,0 +1,122 @@
+# backend/offload.py
+"""
+Bounded process pool for CPU-heavy plan builds.
+
+Building and serializing the layout of a big farm holds the GIL for tens to
+hundreds of milliseconds, which stalls every other request thread in the
+process (/health, /api/crops...). Plans with at least MIN_CELLS grid cells
+are therefore built in a small process pool and come back as the
+already-serialized (head, tail) response parts that /api/generate_plan
+caches. At most MAX_PENDING heavy builds may be queued or running; beyond
+that callers get OverflowError (503), not an ever-growing backlog.
+
+    SASYA_HEAVY_WORKERS=2  SASYA_HEAVY_MAX_PENDING=16  SASYA_OFFLOAD_MIN_CELLS=2500   (0 disables)
+"""
+import json
+import os
+import threading
+from concurrent.futures import BrokenExecutor  # BrokenProcessPool without importing multiprocessing
+
+from backend.catalog import CatalogSnapshot
+from backend.plan_cache import split_body
+from backend.planner import build_plan, layout_shape
+
+WORKERS = int(os.environ.get("SASYA_HEAVY_WORKERS", min(2, os.cpu_count() or 1)))
+MAX_PENDING = int(os.environ.get("SASYA_HEAVY_MAX_PENDING", 16))
+MIN_CELLS = int(os.environ.get("SASYA_OFFLOAD_MIN_CELLS", 2500))  # ~4 ha at 4 m cells
+TIMEOUT_S = 120
+
+_pool = None
+_pool_version = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+
+
+def is_heavy(payload, layout_format=None):
+    """Whether build_plan(payload) is big enough to be worth a process hop."""
+    if not MIN_CELLS or WORKERS < 1 or layout_format == "none":
+        return False
+    rows, cols = layout_shape(payload)
+    return rows * cols >= MIN_CELLS
+
+
+def _pool_for(catalog):
+    # caller holds _pool_lock; workers get the catalog once, at start-up
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    global _pool, _pool_version
+    if _pool is not None and _pool_version != catalog.version:
+        _pool.shutdown(wait=False)  # builds already queued finish on the old catalog
+        _pool = None
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=WORKERS,
+            # not fork: the server's thread pools and write queue hold locks
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=_init_worker,
+            initargs=(catalog.version, catalog.crops, catalog.trees),
+        )
+        _pool_version = catalog.version
+    return _pool
+
+
+def _discard(pool):
+    # caller holds _pool_lock; a broken pool is replaced on the next build
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False)
+
+
+# ----------------- Worker side -----------------
+_worker_catalog = None
+
+
+def _init_worker(version, crops, trees):
+    global _worker_catalog
+    _worker_catalog = CatalogSnapshot(version, crops, trees)
+
+
+def _build_parts(payload, layout_format, json_opts):
+    plan = build_plan(payload, _worker_catalog, layout_format)
+    return split_body(plan, "input", lambda obj: json.dumps(obj, **json_opts))
+
+
+# ----------------- Caller side -----------------
+def build_plan_parts(payload, catalog, layout_format, json_opts):
+    """
+    split_body(build_plan(...), "input") computed in the heavy pool; blocks
+    the calling thread (not the GIL) until done. json_opts come from
+    plan_cache.json_options(app). A build whose worker died (e.g. OOM-killed)
+    is retried once on a fresh pool.
+    """
+    if not _slots.acquire(blocking=False):
+        raise OverflowError("Too many large plans in progress, try again shortly")
+    try:
+        for attempt in (1, 2):
+            with _pool_lock:
+                pool = _pool_for(catalog)
+                try:
+                    fut = pool.submit(_build_parts, payload, layout_format, json_opts)
+                except BrokenExecutor:
+                    _discard(pool)
+                    continue
+            try:
+                return fut.result(timeout=TIMEOUT_S)
+            except BrokenExecutor:
+                with _pool_lock:
+                    _discard(pool)
+                if attempt == 2:
+                    raise
+        raise BrokenExecutor("heavy plan pool failed to start")
+    finally:
+        _slots.release()
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
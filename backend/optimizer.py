@@ -0,0 +1,226 @@
+# backend/optimizer.py
+"""
+Deterministic (primary, intercrop, boundary tree) optimizer.
+
+A combination is scored on the standard layout (backend/economics.py: a
+border ring of trees, interior rows alternating intercrop and primary), or
+on the primary/intercrop cell counts of a rasterized boundary polygon when
+the caller passes them:
+
+  profit   year-1 net of the crop cells, per hectare, relative to the best
+           candidate's net per hectare
+  fit      how central rainfall (and soil pH, where a crop has a pH window)
+           sits in each crop's window, weighted by its share of the cells
+  tree     drought tolerance (counting for more the drier the field) and
+           boundary density (closer spacing_m -> tighter windbreak)
+  synergy  primary and intercrop share a growing season
+
+score = sum(WEIGHTS[k] * component[k]); every component is in [0, 1]
+except profit, which goes negative for loss-making crops.
+
+profit and fit split into a primary part a(p) and an intercrop part b(i),
+the tree term depends on the tree alone and synergy is at most
+WEIGHTS["synergy"]. So the best tree is picked on its own, and the
+(primary, intercrop) pairs are searched by branch and bound: primaries in
+descending a(p), intercrops in descending b(i), and a branch is cut as soon
+as a(p) + b(i) + max synergy cannot beat the best pair found so far. The
+result is the exact optimum of the brute-force search (bench/bench_optimizer.py),
+with ties broken by catalog rank (highest typical yield first), then tree id,
+so the same inputs always give the same plan.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from backend.catalog import DROUGHT_RANK
+from backend.economics import cell_counts
+from backend.layout_engine import CELL_SIZE_M
+
+WEIGHTS = {"profit": 0.45, "fit": 0.25, "tree": 0.15, "synergy": 0.15}
+DROUGHT_SCORE = {1: 1.0, 2: 0.6, 3: 0.2}  # by catalog.DROUGHT_RANK
+SEARCH_CACHE_SIZE = 256  # (snapshot, inputs) -> result
+
+OptimizedSpecies = namedtuple("OptimizedSpecies", "primary intercrop tree score components candidates")
+
+
+def _window_fit(value, lo, hi):
+    """1 at the centre of [lo, hi], falling to 0 at its edges (and outside)."""
+    if lo is None or hi is None:
+        return 1.0
+    if hi <= lo:
+        return 1.0 if value == lo else 0.0
+    half = (hi - lo) / 2.0
+    return max(0.0, 1.0 - abs(value - (lo + half)) / half)
+
+
+def _seasons(crop):
+    return frozenset(s.strip().lower() for s in (crop.get("season") or "").split("/") if s.strip())
+
+
+def _net_per_ha(crop):
+    # same figures summarize() uses; crops with missing economics earn nothing
+    try:
+        return crop["typical_yield_kg_per_ha"] * crop["market_price_per_kg"] - crop["input_cost_per_ha"]
+    except (KeyError, TypeError):
+        return 0.0
+
+
+def _tree_score(tree, rainfall):
+    # drought tolerance matters fully below 200 mm and a quarter from 1000 mm up
+    drought_weight = min(1.0, max(0.25, (1000.0 - rainfall) / 800.0))
+    drought = DROUGHT_SCORE[DROUGHT_RANK.get(tree.get("drought_tolerance"), 3)]
+    spacing = tree.get("spacing_m")
+    density = min(1.0, CELL_SIZE_M / spacing) if spacing else 0.0
+    return drought_weight * drought + (1.0 - drought_weight) * density
+
+
+def _best_tree(trees, scores):
+    if not trees:
+        return None
+    return max(range(len(trees)), key=lambda t: (scores[t], -(trees[t].get("id") or 0)))
+
+
+DEFAULT_TREE = {"name": "Neem", "spacing_m": 8}
+
+
+def best_tree(catalog, rainfall):
+    """
+    The boundary tree optimize_species() picks at `rainfall` (a copy); the
+    tree is scored on its own, so callers can lay out a field with it before
+    the crop search.
+    """
+    trees = catalog.trees
+    t = _best_tree(trees, [_tree_score(tree, float(rainfall)) for tree in trees])
+    return dict(trees[t]) if t is not None else dict(DEFAULT_TREE)
+
+
+class Scorer:
+    """
+    Per-candidate score parts for one set of inputs. `crops` are in catalog
+    rank order; economics use catalog.crops_by_name like the plan does.
+    """
+
+    def __init__(self, crops, trees, crops_by_name, rainfall, rows, cols, soil_ph=None, crop_cells=None):
+        self.crops = crops
+        self.trees = trees
+
+        # share of the crop cells that go to the primary vs the intercrop
+        if crop_cells is None:
+            counts = cell_counts(rows, cols, "p", "i", "t")
+            crop_cells = counts.get("p", 0), counts.get("i", 0)
+        n_p, n_i = crop_cells
+        share_p = n_p / (n_p + n_i) if n_p + n_i else 0.5
+        share_i = 1.0 - share_p
+        self.share_p, self.share_i = share_p, share_i
+
+        nets = [_net_per_ha(crops_by_name.get(c["name"], c)) for c in crops]
+        scale = max(nets, default=0.0)
+        if scale <= 0:
+            scale = max((abs(n) for n in nets), default=0.0) or 1.0
+
+        self.profit, self.fit, self.a, self.b = [], [], [], []
+        w_profit, w_fit = WEIGHTS["profit"], WEIGHTS["fit"]
+        for crop, net in zip(crops, nets):
+            fit = _window_fit(rainfall, crop.get("min_rainfall"), crop.get("max_rainfall"))
+            if soil_ph is not None:
+                fit *= _window_fit(soil_ph, crop.get("min_ph"), crop.get("max_ph"))
+            profit = net / scale
+            self.profit.append(profit)
+            self.fit.append(fit)
+            self.a.append(w_profit * share_p * profit + w_fit * share_p * fit)
+            self.b.append(w_profit * share_i * profit + w_fit * share_i * fit)
+        self._seasons = {}  # parsed lazily: the search only looks at a few pairs
+
+        self.tree_score = [_tree_score(tree, rainfall) for tree in trees]
+
+    def seasons(self, k):
+        found = self._seasons.get(k)
+        if found is None:
+            found = self._seasons[k] = _seasons(self.crops[k])
+        return found
+
+    def synergy(self, p, i):
+        return 1.0 if self.seasons(p) & self.seasons(i) else 0.0
+
+    def pair_score(self, p, i):
+        return self.a[p] + self.b[i] + WEIGHTS["synergy"] * self.synergy(p, i)
+
+    def total(self, p, i, t):
+        """Full score of crops[p], crops[i], trees[t] (t None: no tree in the catalog)."""
+        return self.pair_score(p, i) + WEIGHTS["tree"] * (self.tree_score[t] if t is not None else 0.0)
+
+    def components(self, p, i, t):
+        return {
+            "profit": self.share_p * self.profit[p] + self.share_i * self.profit[i],
+            "fit": self.share_p * self.fit[p] + self.share_i * self.fit[i],
+            "tree": self.tree_score[t] if t is not None else 0.0,
+            "synergy": self.synergy(p, i),
+        }
+
+    def best_tree(self):
+        """Index of the highest-scoring tree (lowest id on ties), or None."""
+        return _best_tree(self.trees, self.tree_score)
+
+    def best_pair(self):
+        """
+        (p, i, explored) maximizing pair_score with p != i (p == i only for a
+        one-crop catalog); ties go to the better-ranked primary, then intercrop.
+        """
+        n = len(self.crops)
+        if n == 1:
+            return 0, 0, 1
+        a, b = self.a, self.b
+        max_syn = WEIGHTS["synergy"]
+        primaries = sorted(range(n), key=lambda k: (-a[k], k))
+        intercrops = sorted(range(n), key=lambda k: (-b[k], k))
+        best, best_key, explored = None, None, 0
+        for p in primaries:
+            if best is not None and a[p] + b[intercrops[0]] + max_syn < best_key[0]:
+                break
+            for i in intercrops:
+                if i == p:
+                    continue
+                if best is not None and a[p] + b[i] + max_syn < best_key[0]:
+                    break
+                explored += 1
+                key = (self.pair_score(p, i), -p, -i)
+                if best is None or key > best_key:
+                    best, best_key = (p, i), key
+        return best[0], best[1], explored
+
+
+_search_version = None  # catalog version the _search memo holds results for
+
+
+@lru_cache(maxsize=SEARCH_CACHE_SIZE)
+def _search(catalog, rainfall, rows, cols, soil_ph, season, crop_cells):
+    crops = catalog.suitable_crops(rainfall, season=season) or catalog.crops_by_yield
+    if not crops:
+        return None
+    scorer = Scorer(crops, catalog.trees, catalog.crops_by_name, rainfall, rows, cols, soil_ph, crop_cells)
+    p, i, _ = scorer.best_pair()
+    t = scorer.best_tree()
+    return crops[p], crops[i], t, scorer.total(p, i, t), scorer.components(p, i, t), len(crops)
+
+
+def optimize_species(catalog, rainfall, rows, cols, soil_ph=None, season=None, crop_cells=None):
+    """
+    Best (primary, intercrop, tree) for a rows x cols layout, as copies of
+    catalog rows, plus the score and its components. crop_cells, a
+    (primary cells, intercrop cells) pair, replaces the standard layout's
+    counts (a boundary polygon's field). Candidates are the crops suitable
+    for `rainfall` (and `season`); if none are, every crop. Results are
+    memoized per catalog snapshot and inputs; a new catalog version drops
+    the memo so replaced snapshots are not kept alive.
+    """
+    global _search_version
+    if catalog.version != _search_version:
+        _search.cache_clear()
+        _search_version = catalog.version
+    if crop_cells is not None:
+        crop_cells = tuple(int(n) for n in crop_cells)
+    found = _search(catalog, float(rainfall), rows, cols, soil_ph, str(season) if season else None, crop_cells)
+    if found is None:
+        return None
+    primary, intercrop, t, score, components, candidates = found
+    tree = dict(catalog.trees[t]) if t is not None else dict(DEFAULT_TREE)
+    return OptimizedSpecies(dict(primary), dict(intercrop), tree, score, dict(components), candidates)
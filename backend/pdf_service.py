@@ -1,43 +1,411 @@
-from fpdf import FPDF
-from flask import Blueprint, request, send_file
-import io, datetime
+from flask import Blueprint, current_app, has_app_context, jsonify, request, send_file, url_for
+import io, datetime, os, re, threading, time, hashlib, json
+from concurrent.futures import BrokenExecutor, TimeoutError as FutureTimeout, wait
+from backend.catalog import get_catalog
+from backend.economics import cell_counts, summarize
+from backend.layout_engine import CELL_SIZE_M, grid_shape
+from backend.metrics import observe_phase, span
+from backend.plan_cache import PlanCache
 
 pdf_bp = Blueprint("pdf_bp", __name__)
 
-@pdf_bp.route("/api/pdf_plan", methods=["POST"])
-def make_pdf():
-    data = request.get_json(force=True)
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "sasya.db")
+
+# Rendering runs in a process pool so export spikes don't hold request threads
+PDF_WORKERS = int(os.environ.get("SASYA_PDF_WORKERS", min(4, os.cpu_count() or 1)))
+MAX_PENDING_JOBS = 256     # queued/running renders (per process) before new exports get 503
+JOB_TTL_S = 15 * 60        # job records are forgotten after this long
+PDF_TTL_S = 60 * 60        # rendered PDFs are kept this long
+SWEEP_INTERVAL_S = 60      # how often a submit looks for expired files
+SYNC_TIMEOUT_S = 60        # /api/pdf_plan waits this long for its render
+MAX_POLL_WAIT_S = 30       # longest ?wait= a status poll may block for
+
+# shared job directory; default: pdf_jobs/ next to the database
+PDF_DIR = os.environ.get("SASYA_PDF_DIR")
+
+# rendered PDFs by hash of everything the document shows (this process's copy of PDF_DIR)
+PDF_CACHE = PlanCache(max_bytes=32 * 1024 * 1024, ttl_s=PDF_TTL_S)
+
+def _plan_economics(data):
+    """Recompute year-1 economics from the plan's layout and the crop catalog."""
+    layout = data.get("layout") or {}
+    rows, cols = layout.get("rows"), layout.get("cols")
+    if not rows or not cols:
+        rows, cols = grid_shape(float((data.get("input") or {}).get("area_m2", 8000)))
+    cell_size_m = layout.get("cell_size_m") or CELL_SIZE_M
+    field = layout.get("field") or {}
+    if isinstance(field.get("cell_counts"), dict):
+        # boundary-polygon plans: cells per species come from the rasterized field
+        counts = {sp: int(n) for sp, n in field["cell_counts"].items()}
+    else:
+        counts = cell_counts(
+            rows, cols,
+            data['primary_crop'].get('name'),
+            data['intercrop'].get('name'),
+            (data.get('boundary_tree') or {}).get('name'),
+        )
+    db_path = current_app.config.get("DB_PATH", DB_PATH) if has_app_context() else DB_PATH
+    catalog = get_catalog(db_path).snapshot()
+    return summarize(counts, catalog.crops_by_name, round(cell_size_m * cell_size_m, 2))
+
+def _latin1(text):
+    # the core PDF fonts are latin-1; anything else would fail the encode below
+    return str(text).encode("latin1", "replace").decode("latin1")
+
+def _render_doc(doc):
+    """Render the plan PDF from render_input() output; returns the PDF bytes."""
+    from fpdf import FPDF  # imported in the render workers, not at app startup
+
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Arial", "B", 16)
     pdf.cell(0, 10, "Sasya Yojana Land Plan", ln=True, align="C")
     pdf.set_font("Arial", size=12)
-    pdf.cell(0, 10, f"Farmer: {data['input'].get('name','')}", ln=True)
-    pdf.cell(0, 10, f"Area: {data['input'].get('area_m2','')} m²", ln=True)
+    pdf.cell(0, 10, _latin1(f"Farmer: {doc['name']}"), ln=True)
+    pdf.cell(0, 10, _latin1(f"Area: {doc['area_m2']} m²"), ln=True)
     pdf.ln(5)
     pdf.cell(0, 10, "Crops & Trees:", ln=True)
     pdf.set_font("Arial", size=11)
-    pdf.multi_cell(0, 8,
-        f"Boundary tree: {data['boundary_tree'].get('name','')}\n"
-        f"Primary crop: {data['primary_crop'].get('name','')}\n"
-        f"Intercrop: {data['intercrop'].get('name','')}")
+    pdf.multi_cell(0, 8, _latin1(
+        f"Boundary tree: {doc['boundary_tree']}\n"
+        f"Primary crop: {doc['primary_crop']}\n"
+        f"Intercrop: {doc['intercrop']}"))
+    pdf.ln(5)
+    econ = doc["economics"]
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 10, "Economics (year 1)", ln=True)
+    pdf.set_font("Arial", size=11)
+    for sp, row in econ["by_species"].items():
+        if "net" in row:
+            pdf.cell(0, 8, _latin1(f"{sp}: {row['area_m2']:.0f} m2, net Rs. {row['net']:,.2f}"), ln=True)
+    pdf.cell(0, 8,
+        f"Revenue Rs. {econ['total_revenue']:,.2f} | Cost Rs. {econ['total_cost']:,.2f} | "
+        f"Net Rs. {econ['total_net']:,.2f}", ln=True)
     pdf.ln(5)
     pdf.set_font("Arial", "B", 12)
     pdf.cell(0, 10, "Action Plan", ln=True)
     pdf.set_font("Arial", size=11)
     steps = [
-        f"Plant {data['boundary_tree'].get('name','trees')} around boundary.",
+        f"Plant {doc['boundary_tree'] or 'trees'} around boundary.",
         f"Prepare land and add compost.",
-        f"Sow {data['primary_crop'].get('name','')} with {data['intercrop'].get('name','')} in rows.",
+        f"Sow {doc['primary_crop']} with {doc['intercrop']} in rows.",
         "Mulch soil and irrigate during dry spells.",
         "Use organic pest repellents.",
         "Harvest and record yields."
     ]
     for i, s in enumerate(steps, 1):
-        pdf.multi_cell(0, 8, f"{i}. {s}")
+        pdf.multi_cell(0, 8, _latin1(f"{i}. {s}"))
     pdf.ln(10)
     pdf.set_font("Arial", "I", 10)
-    pdf.cell(0, 10, "Generated on " + datetime.datetime.now().strftime("%Y-%m-%d %H:%M"), ln=True)
-    stream = io.BytesIO(pdf.output(dest="S").encode("latin1"))
-    stream.seek(0)
-    return send_file(stream, as_attachment=True, download_name="SasyaPlan.pdf", mimetype="application/pdf")
+    pdf.cell(0, 10, "Generated on " + doc["generated_on"], ln=True)
+    return pdf.output(dest="S").encode("latin1")
+
+def _timed_render(doc):
+    t0 = time.perf_counter()
+    body = _render_doc(doc)
+    return body, round((time.perf_counter() - t0) * 1000, 2)
+
+def render_input(data):
+    """
+    Everything the PDF shows, as plain data (economics included, so workers
+    never touch the DB), plus its content hash for the render cache.
+    """
+    doc = {
+        "name": data['input'].get('name', ''),
+        "area_m2": ((data.get('layout') or {}).get('field') or {}).get('area_m2', data['input'].get('area_m2', '')),
+        "boundary_tree": data['boundary_tree'].get('name', ''),
+        "primary_crop": data['primary_crop'].get('name', ''),
+        "intercrop": data['intercrop'].get('name', ''),
+        "economics": _plan_economics(data),
+        # part of the content hash, so a cached PDF never shows another day's date
+        "generated_on": datetime.date.today().isoformat(),
+    }
+    raw = json.dumps(doc, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return doc, hashlib.sha256(raw).hexdigest()
+
+# ----------------- Job queue -----------------
+# A job id is the content hash of render_input(), so identical exports share
+# one job and any worker process can answer for any job: the job record
+# (<id>.json: render input, then render time or error) and the finished PDF
+# (<id>.pdf) are files in a directory all workers share. A worker asked
+# about a job that has a record but no PDF and no render of its own
+# (another worker is rendering it, or died doing so) renders it too.
+_pool = None
+_pool_lock = threading.Lock()
+_inflight = {}        # job id -> this process's render future
+_jobs_lock = threading.Lock()
+_last_sweep = 0.0
+_JOB_ID = re.compile(r"[0-9a-f]{64}")
+
+def _get_pool():
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # not fork: the server's threads hold locks and SQLite connections
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+        return _pool
+
+def _discard_pool(pool):
+    # a render worker died (e.g. OOM-killed): the next render starts a fresh pool
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+def _broken(fut):
+    return fut.done() and not fut.cancelled() and isinstance(fut.exception(), BrokenExecutor)
+
+def _store_dir():
+    if PDF_DIR:
+        path = PDF_DIR
+    else:
+        db_path = current_app.config.get("DB_PATH", DB_PATH) if has_app_context() else DB_PATH
+        path = os.path.join(os.path.dirname(os.path.abspath(db_path)), "pdf_jobs")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _write_file(path, data):
+    # write-then-rename, so other workers never read a partial file
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _read_record(store, job_id):
+    try:
+        with open(os.path.join(store, job_id + ".json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _update_record(store, job_id, **changes):
+    record = _read_record(store, job_id)
+    if record is not None:
+        record.update(changes)
+        _write_file(os.path.join(store, job_id + ".json"), json.dumps(record).encode("utf-8"))
+
+def _read_pdf(store, job_id):
+    body = PDF_CACHE.get(job_id)
+    if body is None:
+        try:
+            with open(os.path.join(store, job_id + ".pdf"), "rb") as f:
+                body = f.read()
+        except OSError:
+            return None
+        PDF_CACHE.put(job_id, body, len(body))
+    return body
+
+def _sweep(store, now):
+    global _last_sweep
+    if now - _last_sweep < SWEEP_INTERVAL_S:
+        return
+    _last_sweep = now
+    for name in os.listdir(store):
+        path = os.path.join(store, name)
+        try:
+            if now - os.path.getmtime(path) > (PDF_TTL_S if name.endswith(".pdf") else JOB_TTL_S):
+                os.remove(path)
+        except OSError:
+            pass  # another worker got there first
+
+def _on_done(store, job_id, pool, fut):
+    try:
+        if fut.cancelled():
+            return
+        try:
+            body, render_ms = fut.result()
+        except BrokenExecutor:
+            # not the document's fault: no error recorded, so the next
+            # poll renders it again on a fresh pool
+            _discard_pool(pool)
+            return
+        except Exception as e:
+            _update_record(store, job_id, error=str(e) or type(e).__name__)
+            return
+        PDF_CACHE.put(job_id, body, len(body))
+        _write_file(os.path.join(store, job_id + ".pdf"), body)
+        _update_record(store, job_id, render_ms=render_ms)
+        observe_phase("pdf_render", render_ms / 1000.0)
+    finally:
+        # only now, so a poll never sees neither the render nor its file
+        with _jobs_lock:
+            if _inflight.get(job_id) is fut:
+                del _inflight[job_id]
+
+def _start_render(store, job_id, doc):
+    """This process's render of `doc`, started unless one is in flight."""
+    with _jobs_lock:
+        fut = _inflight.get(job_id)
+        if fut is not None and not _broken(fut):
+            return fut
+        if len(_inflight) >= MAX_PENDING_JOBS:
+            raise OverflowError("PDF queue is full, try again shortly")
+        pool = _get_pool()
+        try:
+            fut = pool.submit(_timed_render, doc)
+        except BrokenExecutor:
+            _discard_pool(pool)
+            pool = _get_pool()
+            fut = pool.submit(_timed_render, doc)
+        _inflight[job_id] = fut
+    # outside the lock: on an already-finished render the callback runs
+    # right here, and _on_done takes _jobs_lock
+    fut.add_done_callback(lambda f: _on_done(store, job_id, pool, f))
+    return fut
+
+def submit(data):
+    """Queue a render for `data` (a generate_plan response); returns (store, job id, render input)."""
+    with span("pdf_input"):
+        doc, job_id = render_input(data)
+    store = _store_dir()
+    now = time.time()
+    _sweep(store, now)
+    cached = _read_pdf(store, job_id) is not None
+    record = {"doc": doc, "created": now, "cached": cached, "render_ms": None, "error": None}
+    _write_file(os.path.join(store, job_id + ".json"), json.dumps(record).encode("utf-8"))
+    if not cached:
+        _start_render(store, job_id, doc)
+    return store, job_id, doc
+
+def job_state(store, job_id):
+    """(state, job record) for a job id; state is None for an unknown or expired job."""
+    with _jobs_lock:
+        fut = _inflight.get(job_id)
+    record = _read_record(store, job_id)
+    if fut is not None and _broken(fut):
+        return "running", record  # _on_done is dropping it; the next poll re-renders
+    if fut is not None and fut.done() and not fut.cancelled():
+        # finished, but _on_done may not have written its files yet
+        record = dict(record or {})
+        if fut.exception() is not None:
+            record["error"] = str(fut.exception()) or type(fut.exception()).__name__
+            return "error", record
+        body, record["render_ms"] = fut.result()
+        PDF_CACHE.put(job_id, body, len(body))
+        return "done", record
+    if fut is not None:
+        return ("running" if fut.running() else "queued"), record
+    if _read_pdf(store, job_id) is not None:
+        return "done", record
+    if record is None:
+        return None, None
+    if record.get("error"):
+        return "error", record
+    _start_render(store, job_id, record["doc"])
+    return "queued", record
+
+def _job_json(job_id, state, record):
+    record = record or {}
+    body = {
+        "status": "ok" if state != "error" else "error",
+        "job_id": job_id,
+        "state": state,
+        "cached": bool(record.get("cached")),
+        "poll_url": url_for("pdf_bp.pdf_job_status", job_id=job_id),
+        "download_url": url_for("pdf_bp.pdf_job_download", job_id=job_id),
+    }
+    if record.get("render_ms") is not None:
+        body["render_ms"] = record["render_ms"]
+    if record.get("error"):
+        body["message"] = record["error"]
+    return body
+
+def _send_pdf(body):
+    return send_file(io.BytesIO(body), as_attachment=True, download_name="SasyaPlan.pdf", mimetype="application/pdf")
+
+def _unknown_job():
+    return jsonify({"status": "error", "message": "Unknown or expired job"}), 404
+
+@pdf_bp.route("/api/pdf_jobs", methods=["POST"])
+def create_pdf_job():
+    """Enqueue a PDF export; poll the returned URL, then download."""
+    data = request.get_json(force=True)
+    try:
+        store, job_id, _ = submit(data)
+        state, record = job_state(store, job_id)
+    except OverflowError as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    return jsonify(_job_json(job_id, state, record)), 202
+
+@pdf_bp.route("/api/pdf_jobs/<job_id>", methods=["GET"])
+def pdf_job_status(job_id):
+    """Job state; ?wait=<seconds> long-polls until the render finishes."""
+    if not _JOB_ID.fullmatch(job_id):
+        return _unknown_job()
+    store = _store_dir()
+    try:
+        state, record = job_state(store, job_id)
+        timeout = min(max(request.args.get("wait", 0, type=float), 0), MAX_POLL_WAIT_S)
+        if timeout and state in ("queued", "running"):
+            with _jobs_lock:
+                fut = _inflight.get(job_id)
+            if fut is not None:
+                wait([fut], timeout=timeout)
+                state, record = job_state(store, job_id)
+    except OverflowError as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    if state is None:
+        return _unknown_job()
+    return jsonify(_job_json(job_id, state, record))
+
+@pdf_bp.route("/api/pdf_jobs/<job_id>/download", methods=["GET"])
+def pdf_job_download(job_id):
+    if not _JOB_ID.fullmatch(job_id):
+        return _unknown_job()
+    store = _store_dir()
+    body = _read_pdf(store, job_id)
+    if body is not None:
+        return _send_pdf(body)
+    try:
+        state, record = job_state(store, job_id)
+    except OverflowError as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    if state is None:
+        return _unknown_job()
+    return jsonify(_job_json(job_id, state, record)), (500 if state == "error" else 409)
+
+@pdf_bp.route("/api/pdf_jobs/stats", methods=["GET"])
+def pdf_job_stats():
+    """This process's renders plus the shared directory's finished and failed jobs."""
+    with _jobs_lock:
+        futures = list(_inflight.values())
+    running = sum(1 for f in futures if f.running() or f.done())
+    store = _store_dir()
+    names = os.listdir(store)
+    errors = sum(1 for n in names if n.endswith(".json") and (_read_record(store, n[:-5]) or {}).get("error"))
+    counts = {
+        "queued": len(futures) - running,
+        "running": running,
+        "done": sum(1 for n in names if n.endswith(".pdf")),
+        "error": errors,
+    }
+    return jsonify({"status": "ok", "workers": PDF_WORKERS, "jobs": counts, "cache": PDF_CACHE.stats()})
+
+@pdf_bp.route("/api/pdf_plan", methods=["POST"])
+def make_pdf():
+    """Synchronous export (kept for old clients): same queue and cache, waits for the file."""
+    data = request.get_json(force=True)
+    try:
+        store, job_id, doc = submit(data)
+    except OverflowError as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    for attempt in (1, 2):
+        body = _read_pdf(store, job_id)
+        if body is not None:
+            return _send_pdf(body)
+        try:
+            body, _ = _start_render(store, job_id, doc).result(timeout=SYNC_TIMEOUT_S)
+            return _send_pdf(body)
+        except OverflowError as e:
+            return jsonify({"status": "error", "message": str(e)}), 503
+        except FutureTimeout:
+            return jsonify({"status": "error", "message": "PDF render timed out", "job_id": job_id}), 504
+        except BrokenExecutor as e:
+            if attempt == 2:  # otherwise retried on a fresh pool
+                return jsonify(_job_json(job_id, "error", {"error": str(e) or type(e).__name__})), 500
+        except Exception as e:
+            return jsonify(_job_json(job_id, "error", {"error": str(e) or type(e).__name__})), 500
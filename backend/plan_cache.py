@@ -0,0 +1,152 @@
+# backend/plan_cache.py
+"""
+In-process cache for plan results.
+
+Entries are keyed on normalized inputs plus the catalog version (so a catalog
+edit never serves stale plans), evicted least-recently-used beyond a byte and
+entry budget, and expire after a TTL. /api/generate_plan stores the
+serialized response with the per-request "input" echo cut out: a hit is the
+cached head + the new input + the cached tail, with no layout generation or
+JSON encoding of the plan.
+
+    SASYA_PLAN_CACHE_MB=64  SASYA_PLAN_CACHE_TTL_S=600   (MB=0 disables)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+MAX_BYTES = int(float(os.environ.get("SASYA_PLAN_CACHE_MB", 64)) * 1024 * 1024)
+MAX_ENTRIES = 4096
+MAX_ENTRY_BYTES = 4 * 1024 * 1024  # larger plans (huge fields) are not cached
+TTL_S = float(os.environ.get("SASYA_PLAN_CACHE_TTL_S", 600))
+
+# ai_agent input quantization (its scores use the raw values as model features)
+RAINFALL_STEP_MM = 5
+SOIL_PH_STEP = 0.1
+AREA_STEP_M2 = 1
+
+_SPLICE = "\x00plan-cache-splice\x00"
+
+
+def quantize(value, step):
+    return round(round(value / step) * step, 6)
+
+
+class PlanCache:
+    """Thread-safe LRU + TTL map; `size` is the caller's estimate in bytes."""
+
+    def __init__(self, max_bytes=MAX_BYTES, max_entries=MAX_ENTRIES, ttl_s=TTL_S, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 and self.max_entries > 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= self._clock():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, value, size):
+        if not self.enabled or size > min(MAX_ENTRY_BYTES, self.max_bytes):
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (self._clock() + self.ttl_s, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# ----------------- Response splicing -----------------
+def _pretty(app):
+    compact = getattr(app.json, "compact", None)
+    return (compact is None and app.debug) or compact is False
+
+
+def json_dumper(app):
+    """(pretty, dumps) matching what jsonify() would emit for `app`."""
+    provider = app.json
+    pretty = _pretty(app)
+    kwargs = {"indent": 2} if pretty else {"separators": (",", ":")}
+    return pretty, lambda obj: provider.dumps(obj, **kwargs)
+
+
+def json_options(app):
+    """
+    (pretty, json.dumps kwargs) giving the same bytes as json_dumper(app) for
+    plain JSON data; unlike the dumper it can be sent to a worker process.
+    """
+    provider = app.json
+    pretty = _pretty(app)
+    options = {"indent": 2} if pretty else {"separators": (",", ":")}
+    options["ensure_ascii"] = getattr(provider, "ensure_ascii", True)
+    options["sort_keys"] = getattr(provider, "sort_keys", True)
+    return pretty, options
+
+
+def split_body(obj, field, dumps):
+    """
+    Serialize `obj` with a placeholder at top-level `field` and return the
+    (head, tail) bytes around it; head + dumps(value) + tail == dumps(obj).
+    """
+    text = dumps({**obj, field: _SPLICE})
+    head, tail = text.split(dumps(_SPLICE))
+    return head.encode("utf-8"), tail.encode("utf-8")
+
+
+def splice_body(parts, value, dumps, pretty):
+    """jsonify()-identical response body for the cached parts plus `value`."""
+    text = dumps(value)
+    if pretty:
+        text = text.replace("\n", "\n  ")  # nested one level deep
+    head, tail = parts
+    return head + text.encode("utf-8") + tail + b"\n"
+
+
+PLAN_CACHE = PlanCache()
+AGENT_CACHE = PlanCache(max_bytes=min(MAX_BYTES, 8 * 1024 * 1024))
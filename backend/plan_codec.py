@@ -0,0 +1,216 @@
+# backend/plan_codec.py
+"""
+Compact binary encoding for plan and label responses.
+
+JSON repeats "cell_id", "species", "x_m"... for every cell. The binary form
+(MIMETYPE, asked for with an Accept header or ?format=binary) is one JSON
+header followed by raw little-endian typed arrays:
+
+    "SSYB"  version:u8  3 reserved bytes  header_len:u32
+    header  UTF-8 JSON, header_len bytes
+    zero padding to a multiple of ALIGN
+    data    the arrays, each starting on an ALIGN boundary
+
+The header is the response document plus a top-level "$arrays" index of
+[key path, dtype, offset, length] entries; decoding puts each array at its
+key path (dtype is one of TYPED_ARRAYS, offset counts from the start of
+data). Aligned offsets let a browser wrap each array in an
+Int8Array/Float32Array/... view without copying.
+
+Plans use the columnar layout (species/type dictionaries, x/y axes) with the
+two per-cell code arrays as int8 (int16 beyond 127 species), so a cell costs
+2 bytes before compression instead of ~120. Decoded and turned back into
+lists, the document is exactly build_plan(payload, catalog, "columnar").
+Label lists (/api/labels, the cells of a saved plan) become a (type,
+species) palette plus per-cell code and r/c/x/y columns; cell ids are
+dropped when they are the usual "r{r}_c{c}".
+"""
+import json
+import struct
+
+import numpy as np
+
+from backend.plan_cache import split_body
+
+MIMETYPE = "application/x-sasya-plan"
+MAGIC = b"SSYB"
+VERSION = 1
+ALIGN = 8
+TYPED_ARRAYS = ("i1", "u1", "i2", "u2", "i4", "u4", "f4", "f8")
+
+_PREFIX = struct.Struct("<4sB3xI")
+
+
+def _dumps(obj):
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"))
+
+
+def _pad(n):
+    return b"\0" * (-n % ALIGN)
+
+
+def pack_arrays(arrays):
+    """{key path tuple: ndarray} -> ("$arrays" index, data bytes)."""
+    index, chunks, offset = [], [], 0
+    for path, values in arrays.items():
+        values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder("<"))
+        dtype = f"{values.dtype.kind}{values.dtype.itemsize}"
+        if dtype not in TYPED_ARRAYS:
+            raise TypeError(f"{'.'.join(path)}: no typed array for dtype {values.dtype}")
+        raw = values.tobytes()
+        index.append([list(path), dtype, offset, int(values.size)])
+        chunks += [raw, _pad(len(raw))]
+        offset += len(raw) + len(chunks[-1])
+    return index, b"".join(chunks)
+
+
+def assemble(header, data):
+    """Binary body for serialized `header` bytes and packed array `data`."""
+    prefix = _PREFIX.pack(MAGIC, VERSION, len(header))
+    return b"".join((prefix, header, _pad(len(prefix) + len(header)), data))
+
+
+def encode(doc, arrays):
+    """Binary body for the dict `doc` plus {key path tuple: ndarray} to place in it."""
+    index, data = pack_arrays(arrays)
+    return assemble(_dumps({**doc, "$arrays": index}).encode("utf-8"), data)
+
+
+def decode(blob):
+    """Document of a binary body, with its arrays as read-only NumPy views."""
+    magic, version, header_len = _PREFIX.unpack_from(blob)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a sasya binary plan (or an unsupported version)")
+    start = _PREFIX.size + header_len
+    doc = json.loads(bytes(blob[_PREFIX.size:start]).decode("utf-8"))
+    start += -start % ALIGN
+
+    for path, dtype, offset, length in doc.pop("$arrays"):
+        target = doc
+        for key in path[:-1]:
+            target = target[key]
+        target[path[-1]] = np.frombuffer(blob, dtype="<" + dtype, count=length, offset=start + offset)
+    return doc
+
+
+def to_json_data(doc):
+    """A decoded document with its arrays turned back into lists."""
+    if isinstance(doc, np.ndarray):
+        return doc.tolist()
+    if isinstance(doc, dict):
+        return {k: to_json_data(v) for k, v in doc.items()}
+    if isinstance(doc, list):
+        return [to_json_data(v) for v in doc]
+    return doc
+
+
+# ----------------- Plans -----------------
+def plan_parts(plan, grid):
+    """
+    (head, tail, data) for a plan built with layout "none" and its
+    LayoutGrid; plan_body(parts, payload) splices the "input" echo back in,
+    so the parts can live in the PLAN_CACHE like the JSON ones.
+    """
+    species_code, type_code = grid.code_arrays()
+    index, data = pack_arrays({("layout", "species_code"): species_code, ("layout", "type_code"): type_code})
+    layout = {**plan["layout"], **grid.columnar_header()}
+    head, tail = split_body({**plan, "layout": layout, "$arrays": index}, "input", _dumps)
+    return head, tail, data
+
+
+def plan_body(parts, value):
+    head, tail, data = parts
+    return assemble(head + _dumps(value).encode("utf-8") + tail, data)
+
+
+# ----------------- Labels -----------------
+def _int_column(values):
+    if any(v is None for v in values):
+        return values
+    column = np.array(values, dtype=np.int64)
+    if column.size and (column.min() < -32768 or column.max() > 32767):
+        return column.astype(np.int32)
+    return column.astype(np.int16)
+
+
+def _float_column(values):
+    if any(v is None for v in values):
+        return values
+    column = np.array(values, dtype=np.float64)
+    single = column.astype(np.float32)
+    return single if np.array_equal(single, column) else column
+
+
+def labels_columns(rows):
+    """
+    Columnar form of get_labels_for_plan() rows: {"format": "columnar",
+    "palette": [[type, species], ...], "code", "r", "c", "x_m", "y_m"} (arrays
+    where the values allow it, lists for NULL-holding legacy columns),
+    "area_m2" as one number when every cell has the same area, and
+    "cell_id" only when some id is not "r{r}_c{c}".
+    """
+    palette = {}
+    codes = [palette.setdefault((row["type"], row["species"]), len(palette)) for row in rows]
+    r = [row["r"] for row in rows]
+    c = [row["c"] for row in rows]
+    columns = {
+        "format": "columnar",
+        "palette": [list(key) for key in palette],
+        "code": np.array(codes, dtype=np.uint8 if len(palette) <= 256 else np.uint16),
+        "r": _int_column(r),
+        "c": _int_column(c),
+        "x_m": _float_column([row["x_m"] for row in rows]),
+        "y_m": _float_column([row["y_m"] for row in rows]),
+    }
+    areas = {row["area_m2"] for row in rows}
+    columns["area_m2"] = next(iter(areas)) if len(areas) == 1 else _float_column([row["area_m2"] for row in rows])
+    if any(row["cell_id"] != f"r{ri}_c{ci}" for row, ri, ci in zip(rows, r, c)):
+        columns["cell_id"] = [row["cell_id"] for row in rows]
+    return columns
+
+
+def _replace(obj, path, value):
+    key = path[0]
+    return {**obj, key: value if len(path) == 1 else _replace(obj[key], path[1:], value)}
+
+
+def cells_body(body, path):
+    """
+    Binary form of a response dict whose label-shaped cell list sits at
+    `path` (a tuple of keys), e.g. ("labels",) for /api/labels. A missing or
+    differently shaped list (saved plans hold whatever the client posted)
+    is left as JSON in the header.
+    """
+    cells = body
+    for key in path:
+        cells = cells.get(key) if isinstance(cells, dict) else None
+    try:
+        columns = labels_columns(cells)
+    except (AttributeError, KeyError, TypeError):
+        return encode(body, {})
+    arrays = {path + (k,): v for k, v in columns.items() if isinstance(v, np.ndarray)}
+    plain = {k: v for k, v in columns.items() if not isinstance(v, np.ndarray)}
+    return encode(_replace(body, path, plain), arrays)
+
+
+def labels_from_columns(columns):
+    """The label dicts back from a decoded labels_columns() block."""
+    n = len(columns["code"])
+    area = columns["area_m2"]
+    cols = {k: to_json_data(columns[k]) for k in ("r", "c", "x_m", "y_m")}
+    areas = to_json_data(area) if isinstance(area, (list, np.ndarray)) else [area] * n
+    ids = columns.get("cell_id") or [f"r{r}_c{c}" for r, c in zip(cols["r"], cols["c"])]
+    palette = columns["palette"]
+    return [
+        {
+            "cell_id": ids[i],
+            "r": cols["r"][i],
+            "c": cols["c"][i],
+            "type": palette[code][0],
+            "species": palette[code][1],
+            "x_m": cols["x_m"][i],
+            "y_m": cols["y_m"][i],
+            "area_m2": areas[i],
+        }
+        for i, code in enumerate(to_json_data(columns["code"]))
+    ]
@@ -0,0 +1,346 @@
+# backend/plan_stats.py
+"""
+Incrementally maintained analytics over saved plans.
+
+Saved plans are compressed JSON bodies, so "area under each species" or
+"total projected net" over them would mean decoding every plan. Instead each
+save adds its contribution to two summary tables (migration 7):
+
+  plan_stats         (grain, day, region, species) -> plans, cells, area_m2,
+                                                      revenue, cost, net
+  plan_stats_totals  (grain, day, region)          -> plans, area_m2, revenue,
+                                                      cost, net
+
+once per grain: a 'd' row for the day and an 'm' row for its month (day is
+then the 1st). record() runs inside save_plan_in(), in the transaction that
+stores the plan, so the tables never disagree with `plans`. The /api/stats
+endpoints (backend/stats_service.py) read only these tables, and a date
+range reads whole months from the 'm' rows and only its partial months from
+the 'd' rows, so even all-time queries touch months x regions x species
+rows whatever the number of plans.
+
+day is the UTC date of plans.created_at. region is the plan input's
+"district", else its "region", else "" (unspecified, not counted as a
+district). Species cells/areas come from the layout (a boundary field's
+cell_counts, or the closed-form counts of the standard grid); revenue/cost/net
+from the plan's economics, so boundary trees show up with area but no
+income. Areas are always the laid-out area the economics cover (cells x cell
+area), and a plan's total area is the sum over its species, so species
+areas add up to the totals (the standard grid can cover more than the
+requested area_m2).
+
+rebuild() recomputes both tables from the stored plans, for backfill or
+after plans were edited outside save_plan:
+
+    flask --app backend.app rebuild-stats
+"""
+import json
+import time
+from datetime import date, timedelta
+from functools import lru_cache
+
+from backend.db import get_db
+from backend.economics import cell_counts
+
+MAX_REGION_LEN = 80
+MEASURES = ("revenue", "cost", "net")
+DAY, MONTH = "d", "m"
+
+_SPECIES_UPSERT = """
+  INSERT INTO plan_stats (grain, day, region, species, plans, cells, area_m2, revenue, cost, net)
+  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+  ON CONFLICT (grain, day, region, species) DO UPDATE SET
+    plans = plans + excluded.plans,
+    cells = cells + excluded.cells,
+    area_m2 = area_m2 + excluded.area_m2,
+    revenue = revenue + excluded.revenue,
+    cost = cost + excluded.cost,
+    net = net + excluded.net
+"""
+
+_TOTALS_UPSERT = """
+  INSERT INTO plan_stats_totals (grain, day, region, plans, area_m2, revenue, cost, net)
+  VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+  ON CONFLICT (grain, day, region) DO UPDATE SET
+    plans = plans + excluded.plans,
+    area_m2 = area_m2 + excluded.area_m2,
+    revenue = revenue + excluded.revenue,
+    cost = cost + excluded.cost,
+    net = net + excluded.net
+"""
+
+
+def _num(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return value if value == value and abs(value) != float("inf") else 0.0
+
+
+def _dict(value):
+    return value if isinstance(value, dict) else {}
+
+
+def contribution(plan):
+    """
+    (region, totals, {species: (cells, area_m2, revenue, cost, net)}) for a
+    saved plan body. Saved plans are whatever the client posted, so missing
+    or malformed parts count as zero rather than failing the save.
+    """
+    plan = _dict(plan)
+    inp = _dict(plan.get("input"))
+    region = str(inp.get("district") or inp.get("region") or "").strip()[:MAX_REGION_LEN]
+    layout = _dict(plan.get("layout"))
+    econ = _dict(plan.get("economics"))
+    by_species = _dict(econ.get("by_species"))
+    field = _dict(layout.get("field"))
+
+    cell_size = _num(layout.get("cell_size_m"))
+    counts = _dict(field.get("cell_counts"))
+    if not counts and layout.get("rows") and layout.get("cols"):
+        names = [_dict(plan.get(k)).get("name") for k in ("primary_crop", "intercrop", "boundary_tree")]
+        if all(isinstance(n, str) for n in names):
+            try:
+                counts = cell_counts(int(layout["rows"]), int(layout["cols"]), *names)
+            except (TypeError, ValueError):
+                counts = {}
+
+    species = {}
+    for name in list(counts) + [n for n in by_species if n not in counts]:
+        row = _dict(by_species.get(name))
+        cells = int(_num(counts.get(name)))
+        area = _num(row["area_m2"]) if "area_m2" in row else cells * cell_size * cell_size
+        species[str(name)] = (cells, area) + tuple(_num(row.get(m)) for m in MEASURES)
+
+    totals = (sum(s[1] for s in species.values()),) + tuple(_num(econ.get(f"total_{m}")) for m in MEASURES)
+    return region, totals, species
+
+
+def _grains(day):
+    return ((DAY, day), (MONTH, day[:8] + "01"))
+
+
+def _write(conn, day, region, totals, species):
+    for grain, key in _grains(day):
+        conn.executemany(_SPECIES_UPSERT, [
+            (grain, key, region, name, 1) + values for name, values in species.items()
+        ])
+        conn.execute(_TOTALS_UPSERT, (grain, key, region, 1) + totals)
+
+
+def record(conn, plan_id, plan):
+    """Add saved plan `plan_id` to the summary tables (inside the caller's transaction)."""
+    day = conn.execute("SELECT date(created_at) FROM plans WHERE id = ?", (plan_id,)).fetchone()[0]
+    _write(conn, day, *contribution(plan))
+
+
+# ----------------- Backfill -----------------
+class _Rollup:
+    """In-memory sums for rebuild(); plans sharing a body are decoded once."""
+
+    def __init__(self, conn):
+        from backend.plan_store import _decode_body
+
+        self.conn = conn
+        self.plans = 0
+        self.species = {}
+        self.totals = {}
+
+        @lru_cache(maxsize=4096)
+        def body_contribution(body_hash):
+            row = conn.execute("SELECT codec, body FROM plan_bodies WHERE hash = ?", (body_hash,)).fetchone()
+            return contribution(_decode_body(row["codec"], row["body"]) if row is not None else None)
+
+        self._body_contribution = body_contribution
+
+    def _add(self, day, region, totals, species, n):
+        self.plans += n
+        for grain, key in _grains(day):
+            acc = self.totals.setdefault((grain, key, region), [0, 0.0, 0.0, 0.0, 0.0])
+            acc[0] += n
+            for i, v in enumerate(totals, 1):
+                acc[i] += v * n
+            for name, values in species.items():
+                acc = self.species.setdefault((grain, key, region, name), [0, 0, 0.0, 0.0, 0.0, 0.0])
+                acc[0] += n
+                for i, v in enumerate(values, 1):
+                    acc[i] += v * n
+
+    def add_plans(self, lo, hi):
+        """Plans with lo < id <= hi."""
+        for day, body_hash, n in self.conn.execute("""
+          SELECT date(created_at), body_hash, COUNT(*) FROM plans
+          WHERE id > ? AND id <= ? AND body_hash IS NOT NULL GROUP BY 1, 2
+        """, (lo, hi)):
+            self._add(day, *self._body_contribution(body_hash), n)
+        for day, plan_json in self.conn.execute("""
+          SELECT date(created_at), plan_json FROM plans
+          WHERE id > ? AND id <= ? AND body_hash IS NULL
+        """, (lo, hi)):
+            try:
+                plan = json.loads(plan_json) if plan_json else None
+            except ValueError:
+                plan = None
+            self._add(day, *contribution(plan), 1)
+
+
+def rebuild(db_path):
+    """
+    Recompute both tables from every saved plan. The bulk of the plans is
+    read without blocking saves; plans saved meanwhile are added under the
+    write lock that swaps the tables' contents.
+    Returns {"plans", "species_rows", "total_rows", "seconds"}.
+    """
+    t0 = time.perf_counter()
+    conn = get_db(db_path)
+    try:
+        rollup = _Rollup(conn)
+        snapshot = conn.execute("SELECT COALESCE(MAX(id), 0) FROM plans").fetchone()[0]
+        rollup.add_plans(0, snapshot)
+
+        conn.execute("BEGIN IMMEDIATE")
+        rollup.add_plans(snapshot, 2 ** 63 - 1)
+        conn.execute("DELETE FROM plan_stats")
+        conn.execute("DELETE FROM plan_stats_totals")
+        conn.executemany(
+            "INSERT INTO plan_stats (grain, day, region, species, plans, cells, area_m2, revenue, cost, net)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [key + tuple(acc) for key, acc in rollup.species.items()],
+        )
+        conn.executemany(
+            "INSERT INTO plan_stats_totals (grain, day, region, plans, area_m2, revenue, cost, net)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [key + tuple(acc) for key, acc in rollup.totals.items()],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return {
+        "plans": rollup.plans,
+        "species_rows": len(rollup.species),
+        "total_rows": len(rollup.totals),
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+
+
+# ----------------- Queries -----------------
+def _month_start(d):
+    return d.replace(day=1)
+
+
+def _next_month(d):
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _periods(start=None, end=None):
+    """
+    (SQL, params) selecting the rows that cover [start, end] (ISO dates,
+    inclusive, None = unbounded) exactly once: 'm' rows for every whole month
+    inside the range, 'd' rows for the partial months at either end.
+    """
+    lo = date.fromisoformat(start) if start else None
+    hi = date.fromisoformat(end) if end else None
+    if lo is not None and hi is not None and lo > hi:
+        return "0", []
+    # whole months are [m0, m1): m0 is a month's 1st, m1 the 1st after the last one
+    m0 = None if lo is None else (lo if lo.day == 1 else _next_month(lo))
+    m1 = None if hi is None else (_next_month(hi) if _next_month(hi) - timedelta(days=1) == hi else _month_start(hi))
+    if m0 is not None and m1 is not None and m0 >= m1:
+        return "grain = 'd' AND day >= ? AND day <= ?", [lo.isoformat(), hi.isoformat()]
+
+    months, month_params = ["grain = 'm'"], []
+    if m0 is not None:
+        months.append("day >= ?")
+        month_params.append(m0)
+    if m1 is not None:
+        months.append("day < ?")
+        month_params.append(m1)
+    parts = [("(" + " AND ".join(months) + ")", month_params)]
+    if m0 is not None and lo < m0:
+        parts.insert(0, ("(grain = 'd' AND day >= ? AND day < ?)", [lo, m0]))
+    if m1 is not None and m1 <= hi:
+        parts.append(("(grain = 'd' AND day >= ? AND day <= ?)", [m1, hi]))
+    return (
+        "(" + " OR ".join(sql for sql, _ in parts) + ")",
+        [d.isoformat() for _, values in parts for d in values],
+    )
+
+
+def _filters(start=None, end=None, region=None, species=None, grain=None):
+    if grain == DAY:
+        clauses, params = ["grain = 'd'"], []
+        for sql, value in (("day >= ?", start), ("day <= ?", end)):
+            if value is not None:
+                clauses.append(sql)
+                params.append(value)
+    else:
+        period, params = _periods(start, end)
+        clauses = [period]
+    for sql, value in (("region = ?", region), ("species = ?", species)):
+        if value is not None:
+            clauses.append(sql)
+            params.append(value)
+    return " WHERE " + " AND ".join(clauses), params
+
+
+def _rows(db_path, sql, params):
+    conn = get_db(db_path)
+    try:
+        return [
+            {k: round(v, 2) if isinstance(v, float) else v for k, v in dict(r).items()}
+            for r in conn.execute(sql, params)
+        ]
+    finally:
+        conn.close()
+
+
+_SUMS = "SUM(plans) AS plans, SUM(area_m2) AS area_m2, SUM(revenue) AS revenue, SUM(cost) AS cost, SUM(net) AS net"
+
+
+def summary(db_path, start=None, end=None, region=None):
+    """
+    Plan count, laid-out area and projected economics over the filtered
+    days/region; "regions" counts named districts/regions only.
+    """
+    where, params = _filters(start, end, region)
+    days_where, days_params = _filters(start, end, region, grain=DAY)
+    row = _rows(db_path, f"""
+      SELECT {_SUMS}, COUNT(DISTINCT NULLIF(region, '')) AS regions,
+        (SELECT MIN(day) FROM plan_stats_totals{days_where}) AS first_day,
+        (SELECT MAX(day) FROM plan_stats_totals{days_where}) AS last_day
+      FROM plan_stats_totals{where}
+    """, days_params + days_params + params)[0]
+    for key in ("plans", "area_m2", "revenue", "cost", "net"):
+        row[key] = row[key] or 0
+    return row
+
+
+def by_species(db_path, start=None, end=None, region=None, limit=None):
+    """Per-species plans/cells/area/economics, largest area first."""
+    where, params = _filters(start, end, region)
+    sql = f"""
+      SELECT species, SUM(cells) AS cells, {_SUMS}
+      FROM plan_stats{where} GROUP BY species ORDER BY area_m2 DESC, species
+    """
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return _rows(db_path, sql, params)
+
+
+def by_region(db_path, start=None, end=None, limit=None):
+    """Per-region totals, most plans first ("" is plans without a district/region)."""
+    where, params = _filters(start, end)
+    sql = f"SELECT region, {_SUMS} FROM plan_stats_totals{where} GROUP BY region ORDER BY plans DESC, region"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return _rows(db_path, sql, params)
+
+
+def daily(db_path, start=None, end=None, region=None, species=None):
+    """Per-day series of the totals, or of one species' figures."""
+    where, params = _filters(start, end, region, species, grain=DAY)
+    table = "plan_stats" if species is not None else "plan_stats_totals"
+    return _rows(db_path, f"SELECT day, {_SUMS} FROM {table}{where} GROUP BY day ORDER BY day", params)
@@ -0,0 +1,234 @@
+# backend/plan_store.py
+"""
+Content-addressed, compressed storage for saved plans.
+
+A saved plan is split in two:
+  - a `plans` row with the farmer name and timestamp, pointing at
+  - a `plan_bodies` row keyed by the SHA-256 of the canonical plan JSON
+    (sorted keys, compact separators, 8000.0 written as 8000 the way the
+    browser sends it), zlib-compressed.
+Re-saving an identical plan only bumps the body's ref_count. Layout cells are
+already kept per plan in plan_grids/labels; when the plan_grids row decodes
+back to exactly the saved cells they are stripped from the body and put back
+by load_plan(), otherwise the body keeps them. Each save also updates the dashboard
+aggregates (backend/plan_stats.py) in the same transaction.
+"""
+import copy
+import hashlib
+import json
+import zlib
+
+from backend import plan_stats
+from backend.db import _insert_labels, get_db, get_labels_for_plan
+
+ZLIB_LEVEL = 6
+
+
+def _whole_floats_as_ints(obj):
+    # the browser posts plans through JSON.stringify, which writes 8000.0 as
+    # 8000; both spellings of a plan must hash the same
+    if type(obj) is float and obj.is_integer():
+        return int(obj)
+    if isinstance(obj, dict):
+        return {k: _whole_floats_as_ints(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_whole_floats_as_ints(v) for v in obj]
+    return obj
+
+
+def canonical_json(plan):
+    """Canonical UTF-8 encoding used for hashing and storage (whole floats written as ints)."""
+    return json.dumps(
+        _whole_floats_as_ints(plan), sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+
+
+def _encode_body(raw):
+    packed = zlib.compress(raw, ZLIB_LEVEL)
+    if len(packed) < len(raw):
+        return "zlib", packed
+    return "raw", raw
+
+
+def _decode_body(codec, body):
+    if codec == "zlib":
+        body = zlib.decompress(body)
+    elif codec != "raw":
+        raise ValueError(f"unknown plan body codec {codec!r}")
+    return json.loads(body)
+
+
+def _layout_cells(plan):
+    layout = plan.get("layout") if isinstance(plan, dict) else None
+    cells = layout.get("cells") if isinstance(layout, dict) else None
+    return cells if isinstance(cells, list) and cells else None
+
+
+def _store_body(conn, plan):
+    """Insert or reference the body for `plan`; returns the storage summary."""
+    raw = canonical_json(plan)
+    digest = hashlib.sha256(raw).hexdigest()
+    row = conn.execute("SELECT stored_size FROM plan_bodies WHERE hash = ?", (digest,)).fetchone()
+    if row is not None:
+        conn.execute("UPDATE plan_bodies SET ref_count = ref_count + 1 WHERE hash = ?", (digest,))
+        stored = 0
+    else:
+        codec, body = _encode_body(raw)
+        stored = len(body)
+        conn.execute("""
+          INSERT INTO plan_bodies (hash, codec, body, raw_size, stored_size, ref_count)
+          VALUES (?, ?, ?, ?, ?, 1)
+        """, (digest, codec, body, len(raw), stored))
+    return {
+        "hash": digest,
+        "raw_bytes": len(raw),
+        "stored_bytes": stored,
+        "deduplicated": row is not None,
+    }
+
+
+def save_plan(db_path, farmer_name, plan):
+    """
+    Save `plan` (the generate_plan response) for `farmer_name` in one
+    transaction. Returns (plan_id, storage summary).
+    """
+    conn = get_db(db_path)
+    try:
+        result = save_plan_in(conn, farmer_name, plan)
+        conn.commit()
+        return result
+    finally:
+        conn.close()
+
+
+def save_plan_in(conn, farmer_name, plan):
+    """save_plan() inside the caller's transaction (no commit)."""
+    cur = conn.execute("INSERT INTO plans (farmer_name) VALUES (?)", (farmer_name,))
+    plan_id = cur.lastrowid
+
+    body = plan
+    labels = 0
+    cells = _layout_cells(plan)
+    if cells is not None:
+        conn.execute("SAVEPOINT labels")
+        try:
+            exact = _insert_labels(conn, plan_id, cells)
+            conn.execute("RELEASE labels")
+        except Exception as e:
+            # keep the cells in the body instead of failing the save
+            conn.execute("ROLLBACK TO labels")
+            conn.execute("RELEASE labels")
+            print("Warning: could not save labels:", e)
+        else:
+            labels = len(cells)
+            if exact:
+                body = copy.copy(plan)
+                body["layout"] = {k: v for k, v in plan["layout"].items() if k != "cells"}
+
+    storage = _store_body(conn, body)
+    storage["labels"] = labels
+    conn.execute("UPDATE plans SET body_hash = ? WHERE id = ?", (storage["hash"], plan_id))
+    plan_stats.record(conn, plan_id, plan)
+    return plan_id, storage
+
+
+def load_plan(db_path, plan_id):
+    """
+    The saved plan as a dict (layout cells restored), or None if there is no
+    such plan. Plans saved before the store existed are read from plan_json.
+    """
+    conn = get_db(db_path)
+    try:
+        row = conn.execute("""
+          SELECT p.farmer_name, p.created_at, p.plan_json, b.codec, b.body
+          FROM plans p LEFT JOIN plan_bodies b ON b.hash = p.body_hash
+          WHERE p.id = ?
+        """, (plan_id,)).fetchone()
+        if row is None:
+            return None
+        if row["body"] is not None:
+            plan = _decode_body(row["codec"], row["body"])
+            layout = plan.get("layout") if isinstance(plan, dict) else None
+            if isinstance(layout, dict) and "cells" not in layout:
+                cells = get_labels_for_plan(db_path, plan_id)
+                if cells:
+                    layout["cells"] = cells
+        else:
+            plan = json.loads(row["plan_json"]) if row["plan_json"] else None
+        return {
+            "plan_id": plan_id,
+            "farmer_name": row["farmer_name"],
+            "created_at": row["created_at"],
+            "plan": plan,
+        }
+    finally:
+        conn.close()
+
+
+def storage_stats(db_path):
+    """Totals for the plan store, including bytes saved by dedup and compression."""
+    conn = get_db(db_path)
+    try:
+        plans, legacy, legacy_bytes = conn.execute(
+            "SELECT COUNT(*), COUNT(plan_json), COALESCE(SUM(LENGTH(CAST(plan_json AS BLOB))), 0) FROM plans"
+        ).fetchone()
+        bodies, refs, raw, stored = conn.execute("""
+          SELECT COUNT(*), COALESCE(SUM(ref_count), 0),
+                 COALESCE(SUM(raw_size * ref_count), 0), COALESCE(SUM(stored_size), 0)
+          FROM plan_bodies
+        """).fetchone()
+    finally:
+        conn.close()
+    return {
+        "plans": plans,
+        "legacy_plans": legacy,
+        "legacy_bytes": legacy_bytes,
+        "bodies": bodies,
+        "body_refs": refs,
+        "raw_bytes": raw,
+        "stored_bytes": stored,
+        "saved_bytes": raw - stored,
+        "ratio": round(raw / stored, 2) if stored else None,
+    }
+
+
+def compact_plans(db_path):
+    """
+    Move legacy plans.plan_json text into the plan store.
+    Returns (plans converted, plan_json bytes freed).
+    """
+    conn = get_db(db_path)
+    converted = freed = 0
+    try:
+        rows = conn.execute(
+            "SELECT id, plan_json FROM plans WHERE body_hash IS NULL AND plan_json IS NOT NULL"
+        ).fetchall()
+        for row in rows:
+            try:
+                plan = json.loads(row["plan_json"])
+            except ValueError:
+                continue
+            storage = _store_body(conn, plan)
+            conn.execute(
+                "UPDATE plans SET body_hash = ?, plan_json = NULL WHERE id = ?",
+                (storage["hash"], row["id"]),
+            )
+            converted += 1
+            freed += len(row["plan_json"].encode("utf-8"))
+            conn.commit()
+    finally:
+        conn.close()
+    return converted, freed
+
+
+if __name__ == "__main__":
+    # python -m backend.plan_store [db_path]: move legacy plan_json into the store
+    import os
+    import sys
+    from backend.migrations import migrate
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "data", "sasya.db")
+    migrate(db_path)
+    plans, freed = compact_plans(db_path)
+    print(f"Compacted {plans} plans, freed {freed} bytes of plan_json")
+    print(json.dumps(storage_stats(db_path), indent=2))
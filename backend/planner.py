@@ -0,0 +1,294 @@
+# backend/planner.py
+"""
+Rule-based plan generation, independent of Flask.
+
+/api/generate_plan, the batch engine and the CLI all call build_plan() so
+there is exactly one implementation of the planning rules.
+
+A payload may carry a surveyed "boundary" polygon (see
+backend/field_geometry.py); the layout is then the rasterized field with
+boundary trees at their spacing_m, and area_m2 is taken from the polygon.
+"""
+import json
+import math
+
+from backend.economics import cell_counts, summarize
+from backend.field_geometry import MAX_GRID_CELLS, parse_boundary
+from backend.layout_engine import CELL_SIZE_M, build_field_layout, build_layout, grid_shape, iter_layout_rows
+from backend.metrics import span
+from backend.optimizer import best_tree, optimize_species
+
+LAYOUT_FORMATS = ("cells", "columnar", "none")
+# "rules": top two suitable crops by yield + catalog.boundary_tree (default)
+# "optimize": backend.optimizer's branch-and-bound search
+STRATEGIES = ("rules", "optimize")
+RULES_EXPLANATION = {"method": "Rule-based fallback (AI model integration pending)"}
+
+# cells per NDJSON line in streaming mode (wide rows are split)
+STREAM_MAX_CELLS = 4096
+
+# boundary tree spacing when a tree row has neither spacing_m nor canopy_m
+DEFAULT_TREE_SPACING_M = 8.0
+
+
+def parse_inputs(payload):
+    """
+    Normalized (rainfall, area_m2, soil_ph, investment) from a request payload.
+    Raises ValueError for non-finite numbers and for an area that is not
+    positive or would lay out more than field_geometry.MAX_GRID_CELLS cells.
+    """
+    rainfall = float(payload.get("rainfall_mm", payload.get("rainfall", 400)))
+    area_m2 = float(payload.get("area_m2", 8000))
+    soil_ph = float(payload.get("soil_ph", 6.5))
+    investment = payload.get("investment_level", payload.get("investment", "low"))
+    if not all(math.isfinite(v) for v in (rainfall, area_m2, soil_ph)):
+        raise ValueError("rainfall_mm, area_m2 and soil_ph must be finite numbers")
+    if area_m2 <= 0:
+        raise ValueError("area_m2 must be positive")
+    if area_m2 > MAX_GRID_CELLS * CELL_SIZE_M * CELL_SIZE_M:
+        raise ValueError(f"area_m2 is too large (at most {MAX_GRID_CELLS * CELL_SIZE_M * CELL_SIZE_M:.0f})")
+    return rainfall, area_m2, soil_ph, investment
+
+
+def parse_field(payload):
+    """field_geometry.Field for the payload's "boundary", or None for a rectangular field."""
+    field = parse_boundary(payload.get("boundary"))
+    if field is not None:
+        rows, cols = field.grid_shape(CELL_SIZE_M)
+        if rows * cols > MAX_GRID_CELLS:
+            raise ValueError(f"field is too large ({rows} x {cols} cells)")
+    return field
+
+
+def layout_shape(payload, field=None):
+    """(rows, cols) of the plan grid: the polygon's bounding box, or grid_shape(area_m2)."""
+    field = field or parse_field(payload)
+    if field is not None:
+        return field.grid_shape(CELL_SIZE_M)
+    _, area_m2, _, _ = parse_inputs(payload)
+    return grid_shape(area_m2, CELL_SIZE_M)
+
+
+def tree_spacing(tree):
+    """Metres between boundary trees along a polygon perimeter."""
+    return float(tree.get("spacing_m") or tree.get("canopy_m") or DEFAULT_TREE_SPACING_M)
+
+
+def select_species(catalog, rainfall):
+    """Primary crop, intercrop and boundary tree (copies of catalog rows)."""
+    crops = catalog.suitable_crops(rainfall, limit=2)
+    if not crops:
+        crops = catalog.crops_by_yield[:5]
+
+    primary = dict(crops[0]) if crops else {"name": "Unknown"}
+    intercrop = dict(crops[1]) if len(crops) > 1 else dict(crops[0])
+
+    tree = catalog.boundary_tree
+    tree = dict(tree) if tree else {"name": "Neem", "spacing_m": 8}
+    return primary, intercrop, tree
+
+
+def field_crop_cells(field, tree):
+    """
+    (primary cells, intercrop cells) of the field's rasterized layout with
+    `tree` on the boundary, so the optimizer weighs the crops by the shares
+    the plan will actually have.
+    """
+    grid, _ = build_field_layout(field, "primary", "intercrop", "tree", tree_spacing(tree), CELL_SIZE_M)
+    counts = grid.species_counts()
+    return counts.get("primary", 0), counts.get("intercrop", 0)
+
+
+def choose_species(payload, catalog, field=None):
+    """(primary, intercrop, tree, explanation) for the payload's "strategy"."""
+    rainfall, area_m2, soil_ph, _ = parse_inputs(payload)
+    if payload.get("strategy") == "optimize":
+        with span("optimize"):
+            if field is not None:
+                rows, cols = field.grid_shape(CELL_SIZE_M)
+                crop_cells = field_crop_cells(field, best_tree(catalog, rainfall))
+            else:
+                rows, cols = grid_shape(area_m2, CELL_SIZE_M)
+                crop_cells = None
+            best = optimize_species(catalog, rainfall, rows, cols, soil_ph, payload.get("season"), crop_cells)
+        if best is not None:
+            return best.primary, best.intercrop, best.tree, {
+                "method": "Branch-and-bound optimizer (profit, rainfall/pH fit, boundary tree, season overlap)",
+                "score": round(best.score, 4),
+                "components": {k: round(v, 4) for k, v in best.components.items()},
+                "candidates": best.candidates,
+            }
+    primary, intercrop, tree = select_species(catalog, rainfall)
+    return primary, intercrop, tree, dict(RULES_EXPLANATION)
+
+
+def build_plan(payload, catalog, layout_format=None):
+    """
+    Full generate_plan response for `payload` against a CatalogSnapshot.
+    layout_format: "cells" (default), "columnar", or "none" (dimensions only).
+    payload["strategy"]: see STRATEGIES.
+    """
+    return _build(payload, catalog, layout_format)[0]
+
+
+def build_plan_grid(payload, catalog):
+    """
+    (plan with layout "none", LayoutGrid): the binary encoding
+    (backend/plan_codec.py) sends the grid's code arrays as they are.
+    """
+    plan, grid = _build(payload, catalog, "none")
+    if grid is None:
+        _, area_m2, _, _ = parse_inputs(payload)
+        with span("layout"):
+            grid = build_layout(
+                area_m2,
+                plan["primary_crop"]["name"],
+                plan["intercrop"]["name"],
+                plan["boundary_tree"]["name"],
+                plan["layout"]["cell_size_m"],
+            )
+    return plan, grid
+
+
+def _build(payload, catalog, layout_format):
+    """(plan, LayoutGrid or None): the grid of a boundary polygon is always built."""
+    _, area_m2, _, _ = parse_inputs(payload)
+    field = parse_field(payload)
+    primary, intercrop, tree, explanation = choose_species(payload, catalog, field)
+    if field is not None:
+        return _build_field(payload, field, primary, intercrop, tree, explanation, catalog, layout_format)
+
+    # Layout dimensions; the grid itself is only built when it is returned
+    cell_size_m = CELL_SIZE_M
+    cell_area_m2 = cell_size_m * cell_size_m
+    rows, cols = grid_shape(area_m2, cell_size_m)
+    layout = {"rows": rows, "cols": cols, "cell_size_m": cell_size_m}
+    if layout_format != "none":
+        with span("layout"):
+            grid = build_layout(area_m2, primary["name"], intercrop["name"], tree["name"], cell_size_m)
+            if layout_format == "columnar":
+                layout.update(grid.to_columnar())
+            else:
+                layout["cells"] = grid.to_cells(cell_area_m2)
+
+    # Economics (closed form: cells per species follow from rows/cols)
+    with span("economics"):
+        counts = cell_counts(rows, cols, primary["name"], intercrop["name"], tree["name"])
+        econ = summarize(counts, catalog.crops_by_name, cell_area_m2, rounded=False)
+
+    return {
+        "status": "ok",
+        "input": payload,
+        "primary_crop": primary,
+        "intercrop": intercrop,
+        "boundary_tree": tree,
+        "layout": layout,
+        "economics": econ,
+        "explanation": explanation,
+    }, None
+
+
+def _build_field(payload, field, primary, intercrop, tree, explanation, catalog, layout_format):
+    cell_size_m = CELL_SIZE_M
+    cell_area_m2 = cell_size_m * cell_size_m
+    spacing_m = tree_spacing(tree)
+    with span("layout"):
+        grid, tree_count = build_field_layout(
+            field, primary["name"], intercrop["name"], tree["name"], spacing_m, cell_size_m
+        )
+    counts = grid.species_counts()
+    layout = {
+        "rows": grid.rows,
+        "cols": grid.cols,
+        "cell_size_m": cell_size_m,
+        "field": {
+            "area_m2": round(field.area_m2, 2),
+            "perimeter_m": round(field.perimeter_m, 2),
+            "cells": grid.cell_count,
+            "cell_counts": counts,
+            "tree_count": tree_count,
+            "tree_spacing_m": spacing_m,
+        },
+    }
+    if layout_format == "columnar":
+        layout.update(grid.to_columnar())
+    elif layout_format != "none":
+        layout["cells"] = grid.to_cells(cell_area_m2)
+
+    # Economics from the rasterized cell counts (trees earn nothing in year 1)
+    with span("economics"):
+        econ = summarize(counts, catalog.crops_by_name, cell_area_m2, rounded=False)
+
+    return {
+        "status": "ok",
+        "input": payload,
+        "primary_crop": primary,
+        "intercrop": intercrop,
+        "boundary_tree": tree,
+        "layout": layout,
+        "economics": econ,
+        "explanation": explanation,
+    }, grid
+
+
+def plan_cache_key(payload, catalog, layout_format=None):
+    """
+    Everything build_plan() output depends on, apart from the "input" echo,
+    from the normalized inputs alone, so computing the key never runs the
+    species selection or the optimizer: rainfall and the grid shape for the
+    rules, plus soil_ph and the season for the optimizer (investment is used
+    by neither). A boundary polygon matters through its geometry.
+    """
+    rainfall, _, soil_ph, _ = parse_inputs(payload)
+    field = parse_field(payload)
+    strategy = "optimize" if payload.get("strategy") == "optimize" else "rules"
+    if layout_format not in ("columnar", "none"):
+        layout_format = "cells"
+    key = (
+        catalog.version,
+        layout_format,
+        strategy,
+        rainfall,
+        layout_shape(payload, field),
+        field.key() if field is not None else None,
+    )
+    if strategy == "optimize":
+        season = payload.get("season")
+        key += (soil_ph, str(season) if season else None)
+    return key
+
+
+def _ndjson(obj):
+    return (json.dumps(obj, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def iter_plan_ndjson(payload, catalog, max_cells=STREAM_MAX_CELLS):
+    """
+    Streaming form of build_plan(): one "header" line with everything except
+    the cells, then "row" lines of layout cells generated row by row, then an
+    "end" line. Server memory stays O(cols) however large area_m2 is (a
+    boundary polygon's grid is held as arrays, the cell dicts still per row).
+    """
+    header, grid = _build(payload, catalog, "none")
+    header["type"] = "header"
+    header["layout"]["format"] = "ndjson"
+    yield _ndjson(header)
+
+    _, area_m2, _, _ = parse_inputs(payload)
+    layout = header["layout"]
+    if grid is not None:
+        rows_iter = grid.iter_rows(max_cells=max_cells)
+    else:
+        rows_iter = iter_layout_rows(
+            area_m2,
+            header["primary_crop"]["name"],
+            header["intercrop"]["name"],
+            header["boundary_tree"]["name"],
+            layout["cell_size_m"],
+            max_cells=max_cells,
+        )
+    count = 0
+    for r, cells in rows_iter:
+        count += len(cells)
+        yield _ndjson({"type": "row", "r": r, "cells": cells})
+    yield _ndjson({"type": "end", "rows": layout["rows"], "cols": layout["cols"], "cells": count})
@@ -0,0 +1,70 @@
+# backend/scenario_service.py
+"""
+/api/plan_scenarios: net-income distributions for a plan.
+
+The body is a generate_plan payload (rainfall_mm, area_m2 or boundary,
+strategy...) plus optional scenario settings (backend/scenarios.py
+DEFAULTS: draws, rainfall_cv, yield_cv, price_cv, price_crash_prob,
+price_crash_pct, time_budget_ms) and a seed. The plan is built exactly as
+generate_plan builds it; its per-species crop areas are then simulated.
+Without a seed, one is derived from the body so the same request gives the
+same answer.
+"""
+import json
+import os
+import zlib
+
+from flask import Blueprint, current_app, jsonify, request
+
+from backend.catalog import get_catalog
+from backend.planner import build_plan, parse_field, parse_inputs
+from backend.scenarios import parse_options, simulate
+
+scenario_bp = Blueprint("scenarios", __name__)
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "sasya.db")
+
+
+def _seed(payload):
+    if payload.get("seed") is not None:
+        seed = int(payload["seed"])
+        if seed < 0:
+            raise ValueError("seed must be a non-negative integer")
+        return seed
+    return zlib.crc32(json.dumps(payload, sort_keys=True, default=str).encode("utf-8"))
+
+
+@scenario_bp.route("/api/plan_scenarios", methods=["POST"])
+def plan_scenarios():
+    """Monte Carlo rainfall/yield/price scenarios for the plan generate_plan would return."""
+    payload = request.json or {}
+    try:
+        options = parse_options(payload)
+        rainfall, _, _, _ = parse_inputs(payload)
+        parse_field(payload)
+        seed = _seed(payload)
+    except (TypeError, ValueError, OverflowError) as e:
+        return jsonify({"status": "error", "message": f"Invalid input: {e}"}), 400
+
+    catalog = get_catalog(current_app.config.get("DB_PATH", DB_PATH)).snapshot()
+    plan = build_plan(payload, catalog, "none")
+    species = [
+        (name, row["area_m2"], catalog.crops_by_name[name])
+        for name, row in plan["economics"]["by_species"].items()
+        if name in catalog.crops_by_name
+    ]
+    if not species:
+        return jsonify({"status": "error", "message": "The plan has no crops with economics to simulate."}), 422
+
+    return jsonify({
+        "status": "ok",
+        "input": payload,
+        "primary_crop": plan["primary_crop"]["name"],
+        "intercrop": plan["intercrop"]["name"],
+        "boundary_tree": plan["boundary_tree"]["name"],
+        "point_estimate": {
+            "total_net": round(plan["economics"]["total_net"], 2),
+            "by_species": {name: round(row["net"], 2) for name, row in plan["economics"]["by_species"].items()},
+        },
+        "scenarios": simulate(species, rainfall, options, seed),
+    })
@@ -0,0 +1,245 @@
+# backend/scenarios.py
+"""
+Monte Carlo scenarios for plan economics, independent of Flask.
+
+The plan's year-1 economics (backend/economics.py) is one point estimate.
+Here every draw samples:
+
+  rainfall   lognormal around the expected rainfall (rainfall_cv); one value
+             per draw, shared by all species
+  yield      typical_yield_kg_per_ha x a rainfall response (full yield inside
+             the crop's rainfall window, falling to nothing at half its
+             minimum, and to 30% at double its maximum) x lognormal noise
+             per species (yield_cv)
+  price      market_price_per_kg x lognormal noise per species (price_cv),
+             and with probability price_crash_prob a market-wide crash
+             that takes price_crash_pct off every price
+  cost       input_cost_per_ha, as in the point estimate
+
+Draws are generated CHUNK_DRAWS at a time and folded into running
+statistics (count, mean, variance, losses) plus a fixed-range histogram with
+per-bin sums for every species and for the total. Percentiles are read off
+the histograms, and the expected shortfall comes from the bin sums. So memory
+stays O(chunk + bins) for up to MAX_DRAWS draws. The histogram range is set
+from the first chunk with some padding; rarer extremes land in under/overflow
+bins whose exact min/max are tracked. Runs that fit in one chunk (the
+interactive default) keep their draws and report exact order statistics.
+A time budget stops the run between chunks, and the response says how many
+draws made it.
+"""
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+from backend.metrics import span
+
+DEFAULTS = {
+    "draws": 20_000,
+    "rainfall_cv": 0.25,
+    "yield_cv": 0.15,
+    "price_cv": 0.20,
+    "price_crash_prob": 0.10,
+    "price_crash_pct": 40.0,
+    "time_budget_ms": 250,
+}
+MAX_DRAWS = 1_000_000
+MAX_TIME_BUDGET_MS = 5000
+CHUNK_DRAWS = 65_536
+HIST_BINS = 4096
+HIST_PAD = 0.25  # fraction of the first chunk's range added on each side
+PERCENTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+TAIL_PCT = 5  # expected shortfall / value at risk level
+
+
+def parse_options(payload):
+    """Validated scenario options from a request payload (ValueError if out of range)."""
+    opts = {}
+    for key, default in DEFAULTS.items():
+        value = payload.get(key, default)
+        opts[key] = int(value) if key in ("draws", "time_budget_ms") else float(value)
+    if not 1 <= opts["draws"] <= MAX_DRAWS:
+        raise ValueError(f"draws must be between 1 and {MAX_DRAWS}")
+    if not 1 <= opts["time_budget_ms"] <= MAX_TIME_BUDGET_MS:
+        raise ValueError(f"time_budget_ms must be between 1 and {MAX_TIME_BUDGET_MS}")
+    for key in ("rainfall_cv", "yield_cv", "price_cv"):
+        if not 0 <= opts[key] <= 2:
+            raise ValueError(f"{key} must be between 0 and 2")
+    if not 0 <= opts["price_crash_prob"] <= 1:
+        raise ValueError("price_crash_prob must be between 0 and 1")
+    if not 0 <= opts["price_crash_pct"] <= 100:
+        raise ValueError("price_crash_pct must be between 0 and 100")
+    return opts
+
+
+def _lognormal_sigma(cv):
+    return float(np.sqrt(np.log1p(cv * cv)))
+
+
+def rainfall_response(rain, lo, hi):
+    """Yield factor for rainfall draws against a crop's [lo, hi] window (NULL bounds: no effect)."""
+    factor = np.ones_like(rain)
+    if lo:
+        factor = np.minimum(factor, np.clip(1.0 - 2.0 * (lo - rain) / lo, 0.0, 1.0))
+    if hi:
+        factor = np.minimum(factor, np.clip(1.0 - 0.7 * (rain - hi) / hi, 0.3, 1.0))
+    return factor
+
+
+class _Summary:
+    """Running statistics and histograms for `n` series, fed one chunk at a time."""
+
+    def __init__(self, n):
+        self.n = n
+        self.count = 0
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.losses = np.zeros(n, dtype=np.int64)
+        self.min = np.full(n, np.inf)
+        self.max = np.full(n, -np.inf)
+        self.lo = self.width = None
+        self.hist = np.zeros((n, HIST_BINS + 2), dtype=np.int64)  # [under, bins..., over]
+        self.sums = np.zeros((n, HIST_BINS + 2))
+        self.first = None  # sorted draws while only one chunk has been added
+
+    def add(self, values):
+        """values: (n, k) array of one chunk's draws."""
+        k = values.shape[1]
+        self.first = np.sort(values, axis=1) if self.lo is None else None
+        if self.lo is None:
+            lo, hi = values.min(axis=1), values.max(axis=1)
+            span_ = np.maximum(hi - lo, np.maximum(np.abs(hi), 1.0) * 1e-6)
+            self.lo = lo - HIST_PAD * span_
+            self.width = (span_ * (1 + 2 * HIST_PAD)) / HIST_BINS
+
+        # Chan et al. merge of mean / sum of squared deviations
+        c_mean = values.mean(axis=1)
+        c_m2 = ((values - c_mean[:, None]) ** 2).sum(axis=1)
+        total = self.count + k
+        delta = c_mean - self.mean
+        self.mean = self.mean + delta * k / total
+        self.m2 = self.m2 + c_m2 + delta * delta * self.count * k / total
+        self.count = total
+
+        self.losses += (values < 0).sum(axis=1)
+        self.min = np.minimum(self.min, values.min(axis=1))
+        self.max = np.maximum(self.max, values.max(axis=1))
+
+        idx = np.floor((values - self.lo[:, None]) / self.width[:, None]) + 1
+        idx = np.clip(idx, 0, HIST_BINS + 1).astype(np.int64)
+        flat = (idx + (np.arange(self.n) * (HIST_BINS + 2))[:, None]).ravel()
+        size = self.n * (HIST_BINS + 2)
+        self.hist += np.bincount(flat, minlength=size).reshape(self.n, -1)
+        self.sums += np.bincount(flat, weights=values.ravel(), minlength=size).reshape(self.n, -1)
+
+    def _edges(self, s):
+        inner = self.lo[s] + self.width[s] * np.arange(HIST_BINS + 1)
+        # under/overflow bins run to the tracked extremes
+        return np.concatenate(([min(self.min[s], inner[0])], inner, [max(self.max[s], inner[-1])]))
+
+    def percentiles(self, s, qs):
+        if self.first is not None:
+            return [float(v) for v in np.percentile(self.first[s], qs)]
+        edges = self._edges(s)
+        cum = np.cumsum(self.hist[s])
+        out = []
+        for q in qs:
+            target = q / 100.0 * self.count
+            b = int(np.searchsorted(cum, target, side="left"))
+            b = min(b, HIST_BINS + 1)
+            before = cum[b - 1] if b else 0
+            inside = self.hist[s, b]
+            frac = (target - before) / inside if inside else 0.0
+            value = edges[b] + frac * (edges[b + 1] - edges[b])
+            out.append(float(np.clip(value, self.min[s], self.max[s])))
+        return out
+
+    def tail_mean(self, s, pct):
+        """Mean of the worst `pct` percent of draws (expected shortfall)."""
+        need = max(1.0, pct / 100.0 * self.count)
+        if self.first is not None:
+            return float(self.first[s, :max(1, int(need))].mean())
+        cum = np.cumsum(self.hist[s])
+        b = int(np.searchsorted(cum, need, side="left"))
+        b = min(b, HIST_BINS + 1)
+        before = cum[b - 1] if b else 0
+        total = self.sums[s, :b].sum()
+        if self.hist[s, b]:
+            total += (need - before) * self.sums[s, b] / self.hist[s, b]
+        return float(total / need)
+
+    def report(self, s):
+        pcts = self.percentiles(s, PERCENTILES)
+        var = self.m2[s] / (self.count - 1) if self.count > 1 else 0.0
+        return {
+            "mean": round(float(self.mean[s]), 2),
+            "std": round(float(np.sqrt(max(var, 0.0))), 2),
+            "min": round(float(self.min[s]), 2),
+            "max": round(float(self.max[s]), 2),
+            "percentiles": {f"p{q}": round(v, 2) for q, v in zip(PERCENTILES, pcts)},
+            "prob_loss": round(float(self.losses[s]) / self.count, 4),
+            f"value_at_risk_{TAIL_PCT}": round(-pcts[PERCENTILES.index(TAIL_PCT)], 2),
+            f"expected_shortfall_{TAIL_PCT}": round(self.tail_mean(s, TAIL_PCT), 2),
+        }
+
+
+def _rainfall_quantiles(rainfall_mm, sigma, qs=(5, 50, 95)):
+    if not sigma or rainfall_mm <= 0:
+        return {f"p{q}": round(float(rainfall_mm), 1) for q in qs}
+    dist = NormalDist(np.log(rainfall_mm) - sigma ** 2 / 2, sigma)
+    return {f"p{q}": round(float(np.exp(dist.inv_cdf(q / 100.0))), 1) for q in qs}
+
+
+def simulate(species, rainfall_mm, options, seed=0):
+    """
+    species: [(name, area_m2, crop row)] for the plan's crop species (at least one).
+    Returns the "scenarios" block: per-species and total net income
+    distributions plus how many draws were completed within the time budget.
+    """
+    t0 = time.perf_counter()
+    budget_s = options["time_budget_ms"] / 1000.0
+    rng = np.random.default_rng(seed)
+    names = [name for name, _, _ in species]
+    area_ha = np.array([area / 10_000.0 for _, area, _ in species])
+    base_yield = np.array([crop["typical_yield_kg_per_ha"] or 0.0 for _, _, crop in species])
+    base_price = np.array([crop["market_price_per_kg"] or 0.0 for _, _, crop in species])
+    cost = np.array([crop["input_cost_per_ha"] or 0.0 for _, _, crop in species]) * area_ha
+    windows = [(crop.get("min_rainfall"), crop.get("max_rainfall")) for _, _, crop in species]
+
+    rain_sigma = _lognormal_sigma(options["rainfall_cv"])
+    yield_sigma = _lognormal_sigma(options["yield_cv"])
+    price_sigma = _lognormal_sigma(options["price_cv"])
+    crash_keep = 1.0 - options["price_crash_pct"] / 100.0
+    n_species = len(species)
+
+    summary = _Summary(n_species + 1)
+    done = 0
+    requested = options["draws"]
+    with span("scenarios"):
+        while done < requested:
+            k = min(CHUNK_DRAWS, requested - done)
+            # mean-preserving lognormals: E[x] equals the point estimate's input
+            rain = rainfall_mm * np.exp(rain_sigma * rng.standard_normal(k) - rain_sigma ** 2 / 2)
+            response = np.stack([rainfall_response(rain, lo, hi) for lo, hi in windows])
+            noise = np.exp(yield_sigma * rng.standard_normal((n_species, k)) - yield_sigma ** 2 / 2)
+            price = base_price[:, None] * np.exp(
+                price_sigma * rng.standard_normal((n_species, k)) - price_sigma ** 2 / 2)
+            crash = rng.random(k) < options["price_crash_prob"]
+            price[:, crash] *= crash_keep
+            net = (area_ha * base_yield)[:, None] * response * noise * price - cost[:, None]
+            summary.add(np.vstack([net, net.sum(axis=0, keepdims=True)]))
+            done += k
+            if time.perf_counter() - t0 > budget_s:
+                break
+
+    return {
+        "draws": done,
+        "draws_requested": requested,
+        "truncated": done < requested,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2),
+        "seed": seed,
+        "options": options,
+        "rainfall_mm": _rainfall_quantiles(rainfall_mm, rain_sigma),
+        "by_species": {name: summary.report(s) for s, name in enumerate(names)},
+        "total_net": summary.report(n_species),
+    }
@@ -0,0 +1,82 @@
+# backend/stats_service.py
+"""
+/api/stats: dashboard aggregates over saved plans.
+
+Every endpoint reads only the summary tables that save_plan keeps up to
+date (backend/plan_stats.py), never the plans themselves. Common filters:
+?from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive, UTC save dates) and ?region=
+(the plan input's district/region; "" selects plans without one).
+
+  GET /api/stats           totals: plans, area, projected revenue/cost/net
+  GET /api/stats/species   per species, largest area first (?limit=)
+  GET /api/stats/regions   per region, most plans first (?limit=)
+  GET /api/stats/daily     per-day series of the totals (?species= for one species)
+"""
+import os
+from datetime import date
+
+from flask import Blueprint, current_app, jsonify, request
+
+from backend import plan_stats
+
+stats_bp = Blueprint("stats", __name__)
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "sasya.db")
+
+
+def _db_path():
+    return current_app.config.get("DB_PATH", DB_PATH)
+
+
+def _day(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    return date.fromisoformat(value).isoformat()
+
+
+def _filters(*extra):
+    """Validated query filters (ValueError on a bad date or limit)."""
+    out = {"start": _day("from"), "end": _day("to")}
+    for name in extra:
+        if name == "limit":
+            limit = request.args.get("limit", type=int)
+            if limit is not None and limit < 1:
+                raise ValueError("limit must be a positive integer")
+            out["limit"] = limit
+        else:
+            out[name] = request.args.get(name)
+    return out
+
+
+def _stats_response(fn, *extra, key=None):
+    try:
+        filters = _filters(*extra)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid filter: {e}"}), 400
+    result = fn(_db_path(), **filters)
+    names = {"start": "from", "end": "to"}
+    filters = {names.get(k, k): v for k, v in filters.items() if v is not None and k != "limit"}
+    if key is None:
+        return jsonify({"status": "ok", "filters": filters, **result})
+    return jsonify({"status": "ok", "filters": filters, key: result})
+
+
+@stats_bp.route("/api/stats", methods=["GET"])
+def stats_summary():
+    return _stats_response(plan_stats.summary, "region")
+
+
+@stats_bp.route("/api/stats/species", methods=["GET"])
+def stats_species():
+    return _stats_response(plan_stats.by_species, "region", "limit", key="species")
+
+
+@stats_bp.route("/api/stats/regions", methods=["GET"])
+def stats_regions():
+    return _stats_response(plan_stats.by_region, "limit", key="regions")
+
+
+@stats_bp.route("/api/stats/daily", methods=["GET"])
+def stats_daily():
+    return _stats_response(plan_stats.daily, "region", "species", key="days")
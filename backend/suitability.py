@@ -0,0 +1,121 @@
+# backend/suitability.py
+"""
+Rainfall-suitability index for large crop catalogs.
+
+A centered interval tree over (min_rainfall, max_rainfall): a stabbing query
+for one rainfall value touches O(log n) nodes plus the k matching crops,
+instead of scanning the whole catalog. Matches come back in catalog rank
+order (highest typical yield first), with optional pH/season filtering.
+"""
+import heapq
+from bisect import bisect_right
+
+
+class _Node:
+    __slots__ = ("center", "starts", "by_start", "neg_ends", "by_end", "left", "right")
+
+    def __init__(self, center):
+        self.center = center
+        self.starts = []    # ascending min_rainfall
+        self.by_start = []  # rank positions, same order as starts
+        self.neg_ends = []  # ascending -max_rainfall (so bisect works)
+        self.by_end = []    # rank positions, same order as neg_ends
+        self.left = None
+        self.right = None
+
+
+def _build(intervals):
+    """intervals: list of (lo, hi, pos). Returns the root _Node or None."""
+    if not intervals:
+        return None
+    points = sorted(p for lo, hi, _ in intervals for p in (lo, hi))
+    node = _Node(points[len(points) // 2])
+    here, left, right = [], [], []
+    for iv in intervals:
+        if iv[1] < node.center:
+            left.append(iv)
+        elif iv[0] > node.center:
+            right.append(iv)
+        else:
+            here.append(iv)
+    here.sort(key=lambda iv: iv[0])
+    node.starts = [iv[0] for iv in here]
+    node.by_start = [iv[2] for iv in here]
+    here.sort(key=lambda iv: iv[1], reverse=True)
+    node.neg_ends = [-iv[1] for iv in here]
+    node.by_end = [iv[2] for iv in here]
+    node.left = _build(left)
+    node.right = _build(right)
+    return node
+
+
+def _season_ok(crop, season):
+    crop_season = crop.get("season") or ""
+    return season.lower() in (s.strip().lower() for s in crop_season.split("/"))
+
+
+def _ph_ok(crop, soil_ph):
+    # pH windows are optional columns; crops without them are not filtered
+    lo, hi = crop.get("min_ph"), crop.get("max_ph")
+    return (lo is None or lo <= soil_ph) and (hi is None or soil_ph <= hi)
+
+
+class SuitabilityIndex:
+    """
+    Index over crop dicts that are already in rank order
+    (CatalogSnapshot.crops_by_yield). Crops with a NULL rainfall bound are
+    never returned, matching the old SQL filter.
+    """
+
+    def __init__(self, ranked_crops):
+        self.crops = ranked_crops
+        intervals = [
+            (c["min_rainfall"], c["max_rainfall"], pos)
+            for pos, c in enumerate(ranked_crops)
+            if c.get("min_rainfall") is not None and c.get("max_rainfall") is not None
+            and c["min_rainfall"] <= c["max_rainfall"]
+        ]
+        # splitting at the median endpoint keeps the depth O(log n)
+        self.root = _build(intervals)
+        self.size = len(intervals)
+
+    def _stab(self, rainfall):
+        """Rank positions of every crop whose window contains `rainfall`."""
+        hits = []
+        node = self.root
+        while node is not None:
+            if rainfall < node.center:
+                # every interval here ends past rainfall; keep those starting before it
+                hits.extend(node.by_start[:bisect_right(node.starts, rainfall)])
+                node = node.left
+            elif rainfall > node.center:
+                hits.extend(node.by_end[:bisect_right(node.neg_ends, -rainfall)])
+                node = node.right
+            else:
+                hits.extend(node.by_start)
+                break
+        return hits
+
+    def query(self, rainfall, soil_ph=None, season=None, limit=None):
+        """
+        Suitable crops for `rainfall`, best-ranked first.
+        soil_ph/season narrow the result; limit keeps only the top N.
+        """
+        hits = self._stab(rainfall)
+        if soil_ph is None and season is None:
+            if limit is not None:
+                return [self.crops[p] for p in heapq.nsmallest(limit, hits)]
+            return [self.crops[p] for p in sorted(hits)]
+
+        hits.sort()
+        out = []
+        for pos in hits:
+            crop = self.crops[pos]
+            if soil_ph is not None and not _ph_ok(crop, soil_ph):
+                continue
+            if season is not None and not _season_ok(crop, season):
+                continue
+            out.append(crop)
+            if limit is not None and len(out) >= limit:
+                break
+        return out
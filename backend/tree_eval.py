@@ -0,0 +1,70 @@
+# backend/tree_eval.py
+"""
+NumPy-only evaluator for tree ensembles exported by ml/train_model.py.
+
+The export (.npz) flattens every regression tree into shared node arrays:
+  feature, threshold, left, right, value   one entry per node
+  roots                                    index of each tree's root node
+plus init (the ensemble's constant starting prediction), learning_rate,
+max_depth, input_dtype, feature_names and crop_index. Leaves point at
+themselves, so every sample can take exactly max_depth steps with no
+per-tree branching: evaluation is max_depth gathers over an
+(n_samples, n_trees) array of node ids.
+
+Inputs are compared in the model's input_dtype (float32 for
+GradientBoostingRegressor trees, float64 for HistGradientBoostingRegressor),
+so predictions match sklearn's predict() up to summation order.
+"""
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+class FlatTreeEnsemble:
+    def __init__(self, feature, threshold, left, right, value, roots, init, learning_rate,
+                 max_depth, feature_names, input_dtype="float32"):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.init = float(init)
+        self.learning_rate = float(learning_rate)
+        self.max_depth = int(max_depth)
+        self.feature_names_in_ = np.asarray(feature_names)
+        self.input_dtype = np.dtype(input_dtype)
+        self.n_trees = len(roots)
+        # children[2 * node + went_right], so each step is one flat take()
+        self.children = np.column_stack([left, right]).ravel()
+
+    @classmethod
+    def load(cls, path, crop_index=None):
+        """
+        Load an export; with crop_index, also require the crop order it was
+        trained with (its crop_type codes) to be exactly that list.
+        """
+        with np.load(path, allow_pickle=False) as z:
+            if int(z["format_version"]) != FORMAT_VERSION:
+                raise ValueError(f"unsupported tree export version {int(z['format_version'])}")
+            if crop_index is not None:
+                stored = [str(n) for n in z["crop_index"]] if "crop_index" in z.files else None
+                if stored != list(crop_index):
+                    raise ValueError(f"export was trained with CROP_INDEX {stored}, expected {list(crop_index)}")
+            return cls(
+                z["feature"], z["threshold"], z["left"], z["right"], z["value"], z["roots"],
+                z["init"], z["learning_rate"], z["max_depth"], [str(n) for n in z["feature_names"]],
+                str(z["input_dtype"]) if "input_dtype" in z.files else "float32",
+            )
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=self.input_dtype).astype(np.float64)
+        n, n_features = X.shape
+        flat_x = X.ravel()
+        row_base = (np.arange(n) * n_features)[:, None]
+        node = np.broadcast_to(self.roots, (n, self.n_trees))
+        for _ in range(self.max_depth):
+            x = flat_x.take(row_base + self.feature.take(node))
+            went_right = x > self.threshold.take(node)
+            node = self.children.take(2 * node + went_right)
+        return self.init + self.learning_rate * self.value.take(node).sum(axis=1)
@@ -0,0 +1,169 @@
+# backend/write_queue.py
+"""
+Group-commit writer for plan saves.
+
+Request threads hand saves to one writer thread per database and wait on a
+Future for their plan_id. The writer takes whatever is queued (up to
+MAX_BATCH saves, lingering at most MAX_LATENCY_MS under concurrency) and
+writes the whole batch - plans, labels and bodies - in a single
+transaction, so concurrent saves share one commit instead of queueing on
+SQLite's write lock one by one. Each save runs under its own savepoint: a
+save that fails is rolled back alone and its caller gets the exception.
+
+    SASYA_WRITE_BATCH=64  SASYA_WRITE_LATENCY_MS=0
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from backend.db import get_db
+from backend.metrics import span
+from backend.plan_store import save_plan_in
+
+MAX_BATCH = int(os.environ.get("SASYA_WRITE_BATCH", 64))
+# 0 = never linger: saves that queue up while a batch is being written form
+# the next batch. A few ms helps only with many independent (open-loop) savers.
+MAX_LATENCY_MS = float(os.environ.get("SASYA_WRITE_LATENCY_MS", 0))
+
+_STOP = object()
+
+
+class PlanWriter:
+    def __init__(self, db_path, max_batch=MAX_BATCH, max_latency_ms=MAX_LATENCY_MS):
+        self.db_path = db_path
+        self.max_batch = max(1, max_batch)
+        self.max_latency_s = max(0.0, max_latency_ms) / 1000.0
+        self._queue = queue.Queue()
+        self.batches = self.saves = self.failures = 0
+        self._thread = threading.Thread(target=self._run, name="plan-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, farmer_name, plan):
+        """Queue a save; the Future resolves to (plan_id, storage) once committed."""
+        fut = Future()
+        self._queue.put((farmer_name, plan, fut))
+        return fut
+
+    def save(self, farmer_name, plan, timeout=None):
+        return self.submit(farmer_name, plan).result(timeout)
+
+    def _take_batch(self, first):
+        """
+        `first` plus whatever is already queued. Only when other saves are
+        arriving concurrently does the writer linger (up to max_latency) to
+        fill the batch; a lone save is written immediately.
+        """
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency_s
+        while len(batch) < self.max_batch and batch[-1] is not _STOP:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if len(batch) == 1 or remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch(self._queue.get())
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            if batch:
+                try:
+                    with span("plan_write_batch"):
+                        self._write(batch)
+                except Exception as e:
+                    # e.g. the database could not be opened; keep the thread alive
+                    for _, _, fut in batch:
+                        if not fut.done():
+                            fut.set_exception(e)
+            if stop:
+                return
+
+    def _write(self, batch):
+        results = []
+        conn = get_db(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for farmer_name, plan, fut in batch:
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT save")
+                try:
+                    results.append((fut, save_plan_in(conn, farmer_name, plan)))
+                    conn.execute("RELEASE save")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO save")
+                    conn.execute("RELEASE save")
+                    self.failures += 1
+                    fut.set_exception(e)
+            conn.commit()
+        except Exception as e:
+            # the transaction failed: nothing in this batch was saved
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            conn.close()
+        self.batches += 1
+        self.saves += len(results)
+        for fut, result in results:
+            fut.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "saves": self.saves,
+            "failures": self.failures,
+            "avg_batch": round(self.saves / self.batches, 2) if self.batches else None,
+            "queued": self._queue.qsize(),
+        }
+
+    def close(self, timeout=10):
+        """Flush queued saves and stop the writer thread."""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_path):
+    key = os.path.abspath(db_path)
+    writer = _writers.get(key)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(key)
+            if writer is None:
+                writer = _writers[key] = PlanWriter(key)
+    return writer
+
+
+def writers():
+    """Writers started so far (for stats)."""
+    with _writers_lock:
+        return list(_writers.values())
+
+
+def close_all_writers():
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+atexit.register(close_all_writers)
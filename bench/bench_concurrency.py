@@ -0,0 +1,178 @@
+# bench/bench_concurrency.py
+"""
+Fast-endpoint latency while heavy requests are in flight.
+
+--heavy clients post big-farm /api/generate_plan requests back to back
+(every one a cache miss) while --fast clients poll /health and /api/crops.
+Reports the fast endpoints' latency with and without the heavy load, and
+how many heavy plans completed, for:
+
+  threads          thread per request, plans built in the request thread
+                   (what the threaded dev server / a gthread worker did)
+  threads+offload  the same, with big plans built in the heavy process pool
+  asgi             backend.asgi.AsgiApp on an asyncio loop (separate slow
+                   pool + offload)
+
+    python -m bench.bench_concurrency --heavy 4 --fast 4 --seconds 5
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+FAST_PATHS = ("/health", "/api/crops")
+THINK_S = 0.01  # pause between a fast client's requests
+
+
+def heavy_bodies(start_m2):
+    # distinct grid shapes, so every heavy request misses the plan cache
+    for i in itertools.count():
+        yield {"name": "bench", "rainfall_mm": 500, "area_m2": start_m2 + (i % 400) * 1000}
+
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] * 1000 if values else float("nan")
+
+
+# ----------------- Thread-per-request -----------------
+def run_threads(app, n_heavy, n_fast, seconds, start_m2):
+    stop = threading.Event()
+    fast_lat, heavy_done = [], [0]
+    bodies = heavy_bodies(start_m2)
+    lock = threading.Lock()
+
+    def heavy():
+        client = app.test_client()
+        while not stop.is_set():
+            with lock:
+                body = next(bodies)
+            assert client.post("/api/generate_plan", json=body).status_code == 200
+            with lock:
+                heavy_done[0] += 1
+
+    def fast():
+        client = app.test_client()
+        for path in itertools.cycle(FAST_PATHS):
+            if stop.is_set():
+                return
+            t0 = time.perf_counter()
+            client.get(path).get_data()
+            fast_lat.append(time.perf_counter() - t0)
+            time.sleep(THINK_S)
+
+    threads = [threading.Thread(target=heavy) for _ in range(n_heavy)]
+    threads += [threading.Thread(target=fast) for _ in range(n_fast)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return fast_lat, heavy_done[0]
+
+
+# ----------------- ASGI -----------------
+async def asgi_call(app, method, path, body=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json")] if body is not None else [],
+        "http_version": "1.1", "scheme": "http", "server": ("bench", 80), "client": ("127.0.0.1", 1),
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": data, "more_body": False}
+        await asyncio.Event().wait()
+
+    status = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+def run_asgi(asgi_app, n_heavy, n_fast, seconds, start_m2):
+    fast_lat, heavy_done = [], [0]
+    bodies = heavy_bodies(start_m2)
+
+    async def main():
+        deadline = time.perf_counter() + seconds
+
+        async def heavy():
+            while time.perf_counter() < deadline:
+                assert await asgi_call(asgi_app, "POST", "/api/generate_plan", next(bodies)) == 200
+                heavy_done[0] += 1
+
+        async def fast():
+            for path in itertools.cycle(FAST_PATHS):
+                if time.perf_counter() >= deadline:
+                    return
+                t0 = time.perf_counter()
+                await asgi_call(asgi_app, "GET", path)
+                fast_lat.append(time.perf_counter() - t0)
+                await asyncio.sleep(THINK_S)
+
+        await asyncio.gather(*[heavy() for _ in range(n_heavy)], *[fast() for _ in range(n_fast)])
+
+    asyncio.run(main())
+    return fast_lat, heavy_done[0]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="fast-endpoint latency under heavy load")
+    ap.add_argument("--heavy", type=int, default=4, help="concurrent big-farm plan clients")
+    ap.add_argument("--fast", type=int, default=4, help="concurrent /health + /api/crops clients")
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--area", type=float, default=60_000, help="smallest heavy farm, m2")
+    ap.add_argument("--modes", default="threads,threads+offload,asgi")
+    args = ap.parse_args()
+
+    from backend import offload
+    from backend.app import create_app
+    from backend.asgi import AsgiApp
+    from backend.migrations import migrate
+
+    tmp = tempfile.mkdtemp(prefix="sasya-conc-")
+    db_path = os.path.join(tmp, "sasya.db")
+    shutil.copy(os.path.join(ROOT, "data", "sasya.db"), db_path)
+    migrate(db_path)
+    app = create_app(db_path)
+    min_cells = offload.MIN_CELLS or 2500
+
+    print(f"heavy clients: {args.heavy}, fast clients: {args.fast}, {args.seconds:.0f}s per run, cpus: {os.cpu_count()}")
+    print(f"{'mode':>16} {'load':>6} {'fast p50':>9} {'p95':>8} {'p99':>8} {'fast req':>9} {'plans':>6}")
+    try:
+        for n, mode in enumerate(args.modes.split(",")):
+            offload.MIN_CELLS = 0 if mode == "threads" else min_cells
+            for n_heavy in (0, args.heavy):
+                start_m2 = args.area + n * 1_000_000 + n_heavy * 500  # fresh cache keys per run
+                if mode == "asgi":
+                    asgi_app = AsgiApp(app)
+                    lat, done = run_asgi(asgi_app, n_heavy, args.fast, args.seconds, start_m2)
+                    asgi_app.close()
+                else:
+                    lat, done = run_threads(app, n_heavy, args.fast, args.seconds, start_m2)
+                load = "heavy" if n_heavy else "idle"
+                print(f"{mode:>16} {load:>6} {pct(lat, 50):>7.2f}ms {pct(lat, 95):>6.1f}ms {pct(lat, 99):>6.1f}ms "
+                      f"{len(lat):>9} {done:>6}")
+    finally:
+        offload.shutdown()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# bench/bench_crop_model.py
+"""
+Flat NumPy crop ranker (backend/tree_eval.py) vs the sklearn pickle.
+
+Parity is checked first, on random inputs covering and exceeding the
+training ranges: for a small GradientBoostingRegressor and a small
+HistGradientBoostingRegressor fitted here and exported with
+ml/train_model.export_flat(), and for the shipped .pkl/.npz pair (which
+must come from the same training run). Then it reports cold import+load
+time (fresh interpreter) and per-request predict latency for one farm
+(8 crop rows) and a larger batch.
+
+    python -m bench.bench_crop_model
+    python -m bench.bench_crop_model --pkl /tmp/crop_ranker.pkl --npz /tmp/crop_ranker.npz
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from backend.crop_model import CROP_INDEX, FLAT_MODEL_PATH, MODEL_PATH
+from backend.tree_eval import FlatTreeEnsemble
+
+PARITY_TOL = 1e-9
+
+COLD_LOAD = {
+    "sklearn": "import joblib; m = joblib.load({path!r})",
+    "flat": "from backend.tree_eval import FlatTreeEnsemble; m = FlatTreeEnsemble.load({path!r})",
+}
+
+
+def random_inputs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.uniform(0, 1200, n),       # rainfall (trained on 150-900)
+        rng.uniform(4.0, 9.5, n),      # soil_ph
+        rng.uniform(100, 50000, n),    # area
+        rng.integers(0, 3, n),         # investment
+        rng.integers(0, 8, n),         # crop_type
+    ]).astype(np.float64)
+
+
+def assert_parity(name, model, flat, X):
+    diff = np.abs(model.predict(X) - flat.predict(X)).max()
+    print(f"parity: {name:<36} {len(X)} samples, max |diff| = {diff:.3g}")
+    assert diff < PARITY_TOL, f"{name}: flat export does not match predict()"
+
+
+def check_fitted_parity(samples):
+    """Fit small GBR/HGB models, export them and compare with predict()."""
+    from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+
+    from ml.train_model import export_flat, make_synthetic
+
+    df = make_synthetic(1500)
+    X_train, y = df[["rainfall", "soil_ph", "area", "investment", "crop_type"]].to_numpy(), df["score"]
+    X = random_inputs(samples, seed=2)
+    models = [
+        GradientBoostingRegressor(n_estimators=30, max_depth=3, random_state=0),
+        HistGradientBoostingRegressor(max_iter=30, max_depth=5, random_state=0),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        for model in models:
+            model.fit(X_train, y)
+            path = os.path.join(tmp, "model.npz")
+            export_flat(model, path)
+            assert_parity(f"fitted {type(model).__name__}", model, FlatTreeEnsemble.load(path, CROP_INDEX), X)
+
+
+def cold_load_ms(kind, path, repeat=3):
+    code = "import time; t=time.perf_counter(); " + COLD_LOAD[kind].format(path=path) + \
+        "; print((time.perf_counter()-t)*1000)"
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-W", "ignore", "-c", code], capture_output=True, text=True, check=True)
+        ms = float(out.stdout.strip().splitlines()[-1])
+        best = ms if best is None else min(best, ms)
+    return best
+
+
+def per_call_us(model, X, calls):
+    model.predict(X)
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        model.predict(X)
+    return (time.perf_counter() - t0) / calls * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description="flat crop ranker parity and latency")
+    ap.add_argument("--pkl", default=MODEL_PATH)
+    ap.add_argument("--npz", default=FLAT_MODEL_PATH)
+    ap.add_argument("--samples", type=int, default=100000)
+    ap.add_argument("--calls", type=int, default=2000)
+    args = ap.parse_args()
+
+    import joblib
+
+    check_fitted_parity(min(args.samples, 20000))
+    flat = FlatTreeEnsemble.load(args.npz, CROP_INDEX)
+    models = {"flat": flat, "sklearn": joblib.load(args.pkl)}
+    X = random_inputs(args.samples)
+    assert_parity("shipped crop_ranker.pkl / .npz", models["sklearn"], flat, X)
+
+    paths = {"flat": args.npz, "sklearn": args.pkl}
+    farm = random_inputs(8, seed=1)
+    print(f"{'model':>8} {'cold load ms':>13} {'1 farm us':>10} {'1k rows us':>11}")
+    for kind, model in models.items():
+        print(
+            f"{kind:>8} {cold_load_ms(kind, paths[kind]):>13.1f} "
+            f"{per_call_us(model, farm, args.calls):>10.1f} "
+            f"{per_call_us(model, X[:1000], max(1, args.calls // 20)):>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
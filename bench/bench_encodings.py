@@ -0,0 +1,77 @@
+# bench/bench_encodings.py
+"""
+Benchmark: generate_plan response encodings, size and encode time.
+
+For square fields of each --areas size the same plan is encoded as
+  jsonify      the default "cells" layout through Flask's jsonify()
+  columnar     jsonify() of the ?layout=columnar plan
+  binary       backend/plan_codec.py (typed code arrays + species dictionary)
+each sent as-is and through the Content-Encoding codecs backend/compression.py
+offers (gzip at levels 1 and 6; br when the brotli module is installed).
+Times cover serialization and compression of an already-built plan; the
+binary body is checked to decode to the columnar plan.
+
+    python -m bench.bench_encodings
+    python -m bench.bench_encodings --areas 0.5,5,50,200
+"""
+import argparse
+import json
+import time
+
+from flask import Flask, jsonify
+
+from backend import compression, plan_codec
+from backend.catalog import CatalogSnapshot
+from backend.planner import build_plan, build_plan_grid
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, best * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--areas", default="0.5,5,50,200", help="hectares")
+    args = ap.parse_args()
+
+    catalog = CatalogSnapshot(1, [
+        {"id": 1, "name": "Sorghum", "min_rainfall": 300, "max_rainfall": 800, "season": "Kharif",
+         "typical_yield_kg_per_ha": 1200.0, "input_cost_per_ha": 12000.0, "market_price_per_kg": 9.0},
+        {"id": 2, "name": "Greengram", "min_rainfall": 300, "max_rainfall": 700, "season": "Kharif",
+         "typical_yield_kg_per_ha": 500.0, "input_cost_per_ha": 7000.0, "market_price_per_kg": 30.0},
+    ], [{"id": 1, "name": "Neem", "drought_tolerance": "high", "canopy_m": 8.0, "spacing_m": 8.0}])
+    app = Flask(__name__)
+    codecs = [("gzip", 1), ("gzip", 6)] + ([("br", 6)] if compression.brotli is not None else [])
+
+    header = f"{'ha':>6} {'cells':>8}  {'encoding':<10} {'bytes':>11} {'ms':>8}"
+    header += "".join(f" {f'{c}-{lvl} bytes':>14} {'ms':>7}" for c, lvl in codecs)
+    print(header)
+    for area_ha in (float(a) for a in args.areas.split(",")):
+        payload = {"rainfall_mm": 500, "area_m2": area_ha * 10_000, "name": "Bench"}
+        cells_plan = build_plan(payload, catalog)
+        columnar_plan = build_plan(payload, catalog, "columnar")
+        plan, grid = build_plan_grid(payload, catalog)
+        with app.app_context():
+            rows = [
+                ("jsonify", timed(lambda: jsonify(cells_plan).get_data())),
+                ("columnar", timed(lambda: jsonify(columnar_plan).get_data())),
+                ("binary", timed(lambda: plan_codec.plan_body(plan_codec.plan_parts(plan, grid), payload))),
+            ]
+        decoded = plan_codec.to_json_data(plan_codec.decode(rows[2][1][0]))
+        assert decoded == json.loads(json.dumps(columnar_plan)), "binary plan does not decode to the columnar plan"
+
+        for name, (body, ms) in rows:
+            line = f"{area_ha:>6g} {grid.cell_count:>8}  {name:<10} {len(body):>11,} {ms:>8.1f}"
+            for coding, level in codecs:
+                packed, c_ms = timed(lambda: compression.compress(body, coding, level))
+                line += f" {len(packed):>14,} {c_ms:>7.1f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
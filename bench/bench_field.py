@@ -0,0 +1,96 @@
+# bench/bench_field.py
+"""
+Benchmark: boundary-polygon layouts (backend/field_geometry.py).
+
+Irregular survey-like fields (a wobbly outline sampled at --vertices points)
+of each --areas size, timed through parsing, the scanline rasterization,
+tree placement along the perimeter, and the whole build_plan() in the
+"none" and "columnar" layout formats. The scanline mask is checked against
+a per-edge even-odd test over every cell centre where that is affordable.
+
+    python -m bench.bench_field
+    python -m bench.bench_field --areas 1,10,100,500 --vertices 100,1000,10000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from backend.catalog import CatalogSnapshot
+from backend.field_geometry import parse_boundary, perimeter_points, rasterize, snap_to_cells
+from backend.layout_engine import CELL_SIZE_M
+from backend.planner import build_plan
+
+BRUTE_MAX_WORK = 2e8  # edges x cells
+
+
+def make_boundary(area_ha, n_vertices, seed=5):
+    """Outline of roughly `area_ha` hectares: a circle with a few low-frequency wobbles."""
+    rng = np.random.default_rng(seed)
+    theta = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    radius = np.ones_like(theta)
+    for k in range(2, 7):
+        radius += rng.uniform(0.02, 0.12) * np.sin(k * theta + rng.uniform(0, 2 * np.pi))
+    radius *= np.sqrt(area_ha * 10_000 / (0.5 * np.sum(radius ** 2) * (2 * np.pi / n_vertices)))
+    return np.column_stack([radius * np.cos(theta), radius * np.sin(theta)]).tolist()
+
+
+def brute_mask(field, cell_size_m):
+    rows, cols = field.grid_shape(cell_size_m)
+    yc = (np.arange(rows)[:, None] + 0.5) * cell_size_m
+    xc = (np.arange(cols)[None, :] + 0.5) * cell_size_m
+    inside = np.zeros((rows, cols), dtype=bool)
+    for ring in field.rings:
+        for (x0, y0), (x1, y1) in zip(ring, np.roll(ring, -1, axis=0)):
+            if y0 == y1:
+                continue
+            spans = (min(y0, y1) <= yc) & (yc < max(y0, y1))
+            inside ^= spans & (xc < x0 + (yc - y0) * (x1 - x0) / (y1 - y0))
+    return inside
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, best * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--areas", default="1,10,100,500", help="hectares")
+    ap.add_argument("--vertices", default="100,1000,10000")
+    args = ap.parse_args()
+
+    catalog = CatalogSnapshot(1, [
+        {"id": 1, "name": "Sorghum", "min_rainfall": 300, "max_rainfall": 800, "season": "Kharif",
+         "typical_yield_kg_per_ha": 1200.0, "input_cost_per_ha": 12000.0, "market_price_per_kg": 9.0},
+        {"id": 2, "name": "Greengram", "min_rainfall": 300, "max_rainfall": 700, "season": "Kharif",
+         "typical_yield_kg_per_ha": 500.0, "input_cost_per_ha": 7000.0, "market_price_per_kg": 30.0},
+    ], [{"id": 1, "name": "Neem", "drought_tolerance": "high", "canopy_m": 8.0, "spacing_m": 8.0}])
+
+    print(f"{'ha':>5} {'verts':>6} {'cells':>8} {'planted':>7} {'parse':>7} {'raster':>7} {'trees':>7} "
+          f"{'plan/none':>10} {'plan/col':>9} {'brute':>8}  same   (ms)")
+    for area_ha in (float(a) for a in args.areas.split(",")):
+        for n in (int(v) for v in args.vertices.split(",")):
+            boundary = make_boundary(area_ha, n)
+            field, parse_ms = timed(lambda: parse_boundary(boundary))
+            mask, raster_ms = timed(lambda: rasterize(field, CELL_SIZE_M))
+            (tree_r, _), trees_ms = timed(
+                lambda: snap_to_cells(perimeter_points(field, 8.0), mask, CELL_SIZE_M))
+            payload = {"rainfall_mm": 500, "boundary": boundary}
+            _, none_ms = timed(lambda: build_plan(payload, catalog, "none"))
+            _, col_ms = timed(lambda: build_plan(payload, catalog, "columnar"))
+
+            brute, same = "-", "-"
+            if n * mask.size <= BRUTE_MAX_WORK:
+                expected, brute_ms = timed(lambda: brute_mask(field, CELL_SIZE_M), repeat=1)
+                brute, same = f"{brute_ms:8.0f}", "yes" if (expected == mask).all() else "NO"
+            print(f"{area_ha:>5.0f} {n:>6} {int(mask.sum()):>8} {len(tree_r):>7} {parse_ms:>7.2f} {raster_ms:>7.2f} "
+                  f"{trees_ms:>7.2f} {none_ms:>10.1f} {col_ms:>9.1f} {brute:>8}  {same}")
+
+
+if __name__ == "__main__":
+    main()
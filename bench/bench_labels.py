@@ -0,0 +1,129 @@
+# bench/bench_labels.py
+"""
+Label-fetch latency vs number of saved plans.
+
+Builds a scratch database per size (through the real migrations), fills it
+with N plans of `--cells` labels each, then times get_labels_for_plan() for
+random plan ids. With idx_labels_plan_id the latency stays flat; pass
+--no-index to see the old full-table scan.
+
+Before timing, a generated layout is checked to encode as a run-length
+grid both as built and as a browser would post it back (JSON.stringify
+writes 4.0 as 4), to decode back to exactly its input, and to be refused
+once a cell carries a key the grid cannot hold.
+
+    python -m bench.bench_labels
+    python -m bench.bench_labels --sizes 1000,10000,100000 --cells 25 --no-index
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from backend.catalog import CatalogSnapshot
+from backend.db import get_db, get_labels_for_plan, save_labels_for_plan
+from backend.label_codec import decode_grid, encode_cells
+from backend.migrations import migrate
+from backend.planner import build_plan
+
+
+def js_style(obj):
+    """obj as JSON.parse(JSON.stringify(obj)) leaves it: whole floats become ints."""
+    if isinstance(obj, float) and obj.is_integer():
+        return int(obj)
+    if isinstance(obj, dict):
+        return {k: js_style(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [js_style(v) for v in obj]
+    return obj
+
+
+def check_browser_cells(db_path):
+    catalog = CatalogSnapshot(1, [
+        {"id": 1, "name": "Sorghum", "min_rainfall": 300, "max_rainfall": 800, "season": "Kharif",
+         "typical_yield_kg_per_ha": 1200.0, "input_cost_per_ha": 12000.0, "market_price_per_kg": 9.0},
+    ], [{"id": 1, "name": "Neem", "drought_tolerance": "high", "canopy_m": 8.0, "spacing_m": 8.0}])
+    cells = build_plan({"rainfall_mm": 500, "area_m2": 8000}, catalog)["layout"]["cells"]
+    posted = js_style(json.loads(json.dumps(cells)))
+    assert any(type(cell["x_m"]) is int for cell in posted)
+    assert encode_cells(posted) == encode_cells(cells) is not None, "browser-posted cells miss the grid encoding"
+    assert list(decode_grid(*encode_cells(posted)).iter_cells()) == posted, "grid does not decode to its input"
+    noted = [dict(cell) for cell in posted]
+    noted[0]["note"] = "north corner"
+    assert encode_cells(noted) is None, "a cell's extra key would be dropped by the grid encoding"
+
+    migrate(db_path)
+    save_labels_for_plan(db_path, 1, posted)
+    conn = get_db(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0] == 0
+    finally:
+        conn.close()
+    assert get_labels_for_plan(db_path, 1) == cells
+
+
+def fill(db_path, n_plans, cells_per_plan):
+    conn = get_db(db_path)
+    try:
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executemany(
+            "INSERT INTO plans (id, farmer_name, plan_json) VALUES (?, ?, '{}')",
+            ((i, f"farmer {i}") for i in range(1, n_plans + 1)),
+        )
+        conn.executemany(
+            "INSERT INTO labels (plan_id, cell_id, r, c, type, species, x_m, y_m, area_m2) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 16.0)",
+            (
+                (p, f"r0_c{c}", 0, c, "crop", "Sorghum", c * 4.0, 0.0)
+                for p in range(1, n_plans + 1)
+                for c in range(cells_per_plan)
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="label-fetch latency vs saved plans")
+    ap.add_argument("--sizes", default="1000,10000,100000,1000000")
+    ap.add_argument("--cells", type=int, default=9, help="labels per plan")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--no-index", action="store_true", help="drop idx_labels_plan_id")
+    args = ap.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        check_browser_cells(os.path.join(tmp, "check.db"))
+    print(f"{'plans':>9} {'labels':>10} {'fill s':>8} {'fetch p50 us':>13} {'fetch p99 us':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in [int(s) for s in args.sizes.split(",")]:
+            db_path = os.path.join(tmp, f"labels_{n}.db")
+            migrate(db_path)
+            if args.no_index:
+                conn = get_db(db_path)
+                conn.execute("DROP INDEX IF EXISTS idx_labels_plan_id")
+                conn.close()
+
+            t0 = time.perf_counter()
+            fill(db_path, n, args.cells)
+            fill_s = time.perf_counter() - t0
+
+            get_labels_for_plan(db_path, 1)  # warm the connection/statement cache
+            times = []
+            for _ in range(args.queries):
+                plan_id = rng.randint(1, n)
+                t0 = time.perf_counter()
+                rows = get_labels_for_plan(db_path, plan_id)
+                times.append(time.perf_counter() - t0)
+                assert len(rows) == args.cells
+            times.sort()
+            p50 = times[len(times) // 2] * 1e6
+            p99 = times[min(len(times) - 1, int(len(times) * 0.99))] * 1e6
+            print(f"{n:>9} {n * args.cells:>10} {fill_s:>8.1f} {p50:>13.1f} {p99:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# bench/bench_optimizer.py
+"""
+Benchmark: backend.optimizer branch and bound vs brute force over every
+(primary, intercrop, tree) triple, on synthetic catalogs. Checks that both
+pick the same combination and reports how many pairs the search scored.
+
+    python -m bench.bench_optimizer
+    python -m bench.bench_optimizer --sizes 100,1000,10000 --trees 40 --brute-max 400
+"""
+import argparse
+import random
+import time
+
+from backend.catalog import CatalogSnapshot
+from backend.layout_engine import CELL_SIZE_M, grid_shape
+from backend import optimizer
+from backend.optimizer import Scorer, optimize_species
+
+RAINFALLS = (250, 450, 650, 850)
+AREA_M2 = 8000
+
+
+def make_catalog(n_crops, n_trees, seed=11):
+    rng = random.Random(seed)
+    crops = []
+    for i in range(n_crops):
+        lo = rng.randint(150, 900)
+        crops.append({
+            "id": i + 1,
+            "name": f"Variety {i}",
+            "min_rainfall": lo,
+            "max_rainfall": lo + rng.randint(50, 500),
+            "season": rng.choice(["Kharif", "Rabi", "Zaid", "Kharif/Rabi"]),
+            "typical_yield_kg_per_ha": rng.uniform(300, 2500),
+            "input_cost_per_ha": rng.uniform(5000, 20000),
+            "market_price_per_kg": rng.uniform(8, 60),
+        })
+    trees = [{
+        "id": i + 1,
+        "name": f"Tree {i}",
+        "drought_tolerance": rng.choice(["high", "medium", "low"]),
+        "canopy_m": rng.uniform(3, 12),
+        "spacing_m": rng.choice([2.5, 4, 6, 8, 10, 12]),
+        "uses": "boundary",
+    } for i in range(n_trees)]
+    return CatalogSnapshot(1, crops, trees)
+
+
+def brute_force(catalog, rainfall, rows, cols):
+    crops = catalog.suitable_crops(rainfall) or catalog.crops_by_yield
+    scorer = Scorer(crops, catalog.trees, catalog.crops_by_name, rainfall, rows, cols, 6.5)
+    best_key, best = None, None
+    for p in range(len(crops)):
+        for i in range(len(crops)):
+            if i == p and len(crops) > 1:
+                continue
+            for t, tree in enumerate(catalog.trees):
+                key = (scorer.total(p, i, t), -p, -i, -tree["id"])
+                if best_key is None or key > best_key:
+                    best_key, best = key, (crops[p]["id"], crops[i]["id"], tree["id"])
+    return best, best_key[0], len(crops) * (len(crops) - 1) * len(catalog.trees)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sizes", default="100,1000,10000")
+    ap.add_argument("--trees", type=int, default=20)
+    ap.add_argument("--brute-max", type=int, default=400, help="skip brute force above this many candidates")
+    args = ap.parse_args()
+
+    rows, cols = grid_shape(AREA_M2, CELL_SIZE_M)
+    print(f"{'crops':>7} {'rain':>5} {'cands':>6} {'b&b ms':>8} {'memo us':>8} {'pairs':>8} {'brute ms':>9} {'triples':>10}  same")
+    for n in (int(s) for s in args.sizes.split(",")):
+        catalog = make_catalog(n, args.trees)
+        for rainfall in RAINFALLS:
+            optimizer._search.cache_clear()
+            t0 = time.perf_counter()
+            best = optimize_species(catalog, rainfall, rows, cols, 6.5)
+            bb_ms = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter()
+            optimize_species(catalog, rainfall, rows, cols, 6.5)
+            memo_us = (time.perf_counter() - t0) * 1e6
+
+            crops = catalog.suitable_crops(rainfall) or catalog.crops_by_yield
+            scorer = Scorer(crops, catalog.trees, catalog.crops_by_name, rainfall, rows, cols, 6.5)
+            explored = scorer.best_pair()[2]
+
+            if best.candidates > args.brute_max:
+                print(f"{n:>7} {rainfall:>5} {best.candidates:>6} {bb_ms:>8.2f} {memo_us:>8.1f} {explored:>8} {'-':>9} {'-':>10}  -")
+                continue
+            t0 = time.perf_counter()
+            ids, score, triples = brute_force(catalog, rainfall, rows, cols)
+            bf_ms = (time.perf_counter() - t0) * 1000
+            same = ids == (best.primary["id"], best.intercrop["id"], best.tree["id"]) and score == best.score
+            print(f"{n:>7} {rainfall:>5} {best.candidates:>6} {bb_ms:>8.2f} {memo_us:>8.1f} {explored:>8} {bf_ms:>9.1f} "
+                  f"{triples:>10}  {'yes' if same else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# bench/bench_pdf.py
+"""
+Throughput of N concurrent PDF exports.
+
+  render   FPDF rendering alone in N threads, no HTTP (the old in-request cost)
+  sync     POST /api/pdf_plan from N threads (queued render, request waits)
+  queue    POST /api/pdf_jobs from N threads, long-poll, download
+  cached   the same N exports again (served from the render cache)
+
+Plans differ by farmer name, and each of sync/queue uses its own set, so
+both render N distinct documents.
+
+    python -m bench.bench_pdf --n 64 --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def make_plans(n, tag=""):
+    from backend.app import DB_PATH
+    from backend.catalog import get_catalog
+    from backend.planner import build_plan
+
+    catalog = get_catalog(DB_PATH).snapshot()
+    base = build_plan({"rainfall_mm": 500, "area_m2": 8000}, catalog, "none")
+    return [{**base, "input": {"name": f"Farmer {tag}{i}", "area_m2": 8000 + i}} for i in range(n)]
+
+
+def run_inline(plans, threads):
+    from backend.pdf_service import _render_doc, render_input
+
+    def one(plan):
+        doc, _ = render_input(plan)
+        return len(_render_doc(doc))
+
+    with ThreadPoolExecutor(threads) as ex:
+        return list(ex.map(one, plans))
+
+
+def run_sync(app, plans, threads):
+    def one(plan):
+        return len(app.test_client().post("/api/pdf_plan", json=plan).get_data())
+
+    with ThreadPoolExecutor(threads) as ex:
+        return list(ex.map(one, plans))
+
+
+def run_queue(app, plans, threads):
+    def one(plan):
+        client = app.test_client()
+        job = client.post("/api/pdf_jobs", json=plan).get_json()
+        while job["state"] in ("queued", "running"):
+            job = client.get(job["poll_url"] + "?wait=5").get_json()
+        assert job["state"] == "done", job
+        return len(client.get(job["download_url"]).get_data())
+
+    with ThreadPoolExecutor(threads) as ex:
+        return list(ex.map(one, plans))
+
+
+def timed(label, fn, n):
+    t0 = time.perf_counter()
+    sizes = fn()
+    secs = time.perf_counter() - t0
+    assert len(sizes) == n and all(sizes)
+    print(f"{label:>8} {n:>5} {secs:>8.2f} {n / secs:>12.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="concurrent PDF export throughput")
+    ap.add_argument("--n", type=int, default=64, help="concurrent exports")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="PDF render processes")
+    args = ap.parse_args()
+
+    os.environ["SASYA_PDF_WORKERS"] = str(args.workers)
+    from backend.app import app
+
+    plans = make_plans(args.n)
+    print(f"render workers: {args.workers}, request threads: {args.n}")
+    print(f"{'mode':>8} {'n':>5} {'seconds':>8} {'exports/sec':>12}")
+    sync_plans = make_plans(args.n, "s")
+    timed("render", lambda: run_inline(plans, args.n), args.n)
+    timed("sync", lambda: run_sync(app, sync_plans, args.n), args.n)
+    timed("queue", lambda: run_queue(app, plans, args.n), args.n)
+    timed("cached", lambda: run_queue(app, plans, args.n), args.n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# bench/bench_saves.py
+"""
+Plan saves/sec vs concurrency: one transaction per save (plan_store.save_plan)
+against the group-commit writer (backend/write_queue.py).
+
+Each run uses a fresh scratch database and N threads saving distinct
+generate_plan responses (default 8000 m2, ~500 cells) as fast as they can.
+
+    python -m bench.bench_saves
+    python -m bench.bench_saves --threads 1,8,32 --saves 2000 --batch 64 --latency-ms 2
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.catalog import get_catalog
+from backend.db import init_db, seed_data
+from backend.planner import build_plan
+from backend.plan_store import save_plan
+from backend.write_queue import PlanWriter
+
+
+def make_plans(db_path, n, area_m2):
+    catalog = get_catalog(db_path).snapshot()
+    base = build_plan({"rainfall_mm": 500, "area_m2": area_m2}, catalog)
+    # distinct inputs so every body is new (no dedup shortcut)
+    return [{**base, "input": {"name": f"farmer {i}", "area_m2": area_m2}} for i in range(n)]
+
+
+def run(save, plans, threads):
+    """(saves/sec, failed saves); failures are e.g. 'database is locked'."""
+    def one(plan):
+        try:
+            return save(plan["input"]["name"], plan)[0]
+        except Exception:
+            return None
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(threads) as ex:
+        ids = list(ex.map(one, plans))
+    secs = time.perf_counter() - t0
+    ok = [i for i in ids if i is not None]
+    assert len(set(ok)) == len(ok)
+    return len(ok) / secs, len(ids) - len(ok)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="plan saves/sec vs concurrency")
+    ap.add_argument("--threads", default="1,4,16,64")
+    ap.add_argument("--saves", type=int, default=1000)
+    ap.add_argument("--area", type=float, default=8000)
+    ap.add_argument("--batch", type=int, default=64)
+    ap.add_argument("--latency-ms", type=float, default=0)
+    args = ap.parse_args()
+
+    print(f"{'threads':>7} {'direct/s':>9} {'failed':>7} {'grouped/s':>10} {'failed':>7} {'avg batch':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for threads in [int(t) for t in args.threads.split(",")]:
+            rates = []
+            for mode in ("direct", "grouped"):
+                db_path = os.path.join(tmp, f"saves_{threads}_{mode}.db")
+                init_db(db_path)
+                seed_data(db_path)
+                plans = make_plans(db_path, args.saves, args.area)
+                if mode == "direct":
+                    rates.append(run(lambda name, plan: save_plan(db_path, name, plan), plans, threads))
+                else:
+                    writer = PlanWriter(db_path, args.batch, args.latency_ms)
+                    rates.append(run(writer.save, plans, threads))
+                    stats = writer.stats()
+                    writer.close()
+            (direct, direct_failed), (grouped, grouped_failed) = rates
+            print(f"{threads:>7} {direct:>9.0f} {direct_failed:>7} {grouped:>10.0f} {grouped_failed:>7} "
+                  f"{stats['avg_batch']:>10}")
+
+
+if __name__ == "__main__":
+    main()
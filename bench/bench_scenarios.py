@@ -0,0 +1,84 @@
+# bench/bench_scenarios.py
+"""
+Benchmark: backend.scenarios chunked simulation vs holding every draw.
+
+  chunked   simulate(): CHUNK_DRAWS draws at a time folded into histograms
+  in-memory the same model with all draws in one array and np.percentile
+
+Reports wall time, peak traced memory (NumPy allocations are traced) and the
+largest percentile difference between the two, for a two-crop plan.
+
+    python -m bench.bench_scenarios
+    python -m bench.bench_scenarios --draws 10000,100000,1000000
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from backend import scenarios
+from backend.scenarios import PERCENTILES, parse_options, rainfall_response, simulate
+
+CROPS = [
+    ("Groundnut", 4000.0, {"typical_yield_kg_per_ha": 2000.0, "market_price_per_kg": 18.0,
+                           "input_cost_per_ha": 15000.0, "min_rainfall": 400, "max_rainfall": 900}),
+    ("Greengram", 3000.0, {"typical_yield_kg_per_ha": 500.0, "market_price_per_kg": 30.0,
+                           "input_cost_per_ha": 7000.0, "min_rainfall": 300, "max_rainfall": 700}),
+]
+RAINFALL_MM = 500
+
+
+def in_memory(options, seed):
+    """Same draws as simulate() (chunk by chunk from one generator), all kept."""
+    rng = np.random.default_rng(seed)
+    n_species = len(CROPS)
+    area_ha = np.array([a / 10_000.0 for _, a, _ in CROPS])
+    base_yield = np.array([c["typical_yield_kg_per_ha"] for _, _, c in CROPS])
+    base_price = np.array([c["market_price_per_kg"] for _, _, c in CROPS])
+    cost = np.array([c["input_cost_per_ha"] for _, _, c in CROPS]) * area_ha
+    sig = {k: scenarios._lognormal_sigma(options[k]) for k in ("rainfall_cv", "yield_cv", "price_cv")}
+    nets, done = [], 0
+    while done < options["draws"]:
+        k = min(scenarios.CHUNK_DRAWS, options["draws"] - done)
+        rain = RAINFALL_MM * np.exp(sig["rainfall_cv"] * rng.standard_normal(k) - sig["rainfall_cv"] ** 2 / 2)
+        response = np.stack([rainfall_response(rain, c.get("min_rainfall"), c.get("max_rainfall"))
+                             for _, _, c in CROPS])
+        noise = np.exp(sig["yield_cv"] * rng.standard_normal((n_species, k)) - sig["yield_cv"] ** 2 / 2)
+        price = base_price[:, None] * np.exp(
+            sig["price_cv"] * rng.standard_normal((n_species, k)) - sig["price_cv"] ** 2 / 2)
+        price[:, rng.random(k) < options["price_crash_prob"]] *= 1.0 - options["price_crash_pct"] / 100.0
+        nets.append((area_ha * base_yield)[:, None] * response * noise * price - cost[:, None])
+        done += k
+    net = np.hstack(nets)
+    return np.percentile(net.sum(axis=0), PERCENTILES)
+
+
+def measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    elapsed = (time.perf_counter() - t0) * 1000
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, elapsed, peak / 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--draws", default="1000,10000,100000,1000000")
+    args = ap.parse_args()
+
+    simulate(CROPS, RAINFALL_MM, parse_options({"draws": 1000}), seed=0)  # warm-up
+    print(f"{'draws':>9} {'chunked ms':>11} {'peak MB':>8} {'in-mem ms':>10} {'peak MB':>8} {'max pct diff':>13}")
+    for draws in (int(d) for d in args.draws.split(",")):
+        options = parse_options({"draws": draws, "time_budget_ms": scenarios.MAX_TIME_BUDGET_MS})
+        result, c_ms, c_mb = measure(lambda: simulate(CROPS, RAINFALL_MM, options, seed=1))
+        exact, m_ms, m_mb = measure(lambda: in_memory(options, seed=1))
+        ours = list(result["total_net"]["percentiles"].values())
+        diff = max(abs(a - b) for a, b in zip(ours, exact))
+        print(f"{draws:>9} {c_ms:>11.1f} {c_mb:>8.1f} {m_ms:>10.1f} {m_mb:>8.1f} {diff:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# bench/bench_startup.py
+"""
+Cold start of the backend: a fresh interpreter per run, timed from process
+launch to the first /health and /api/generate_plan responses, with the
+create_app() phase breakdown (app.extensions["sasya_startup_ms"]).
+
+  existing   migrated copy of data/sasya.db (the usual worker restart)
+  fresh      empty database path (migrate + seed on startup)
+  skip       SASYA_DB_BOOTSTRAP=skip, as after `flask --app backend.app init-db`
+
+backend/ is byte-compiled first, as in a deployed tree (otherwise every
+edited module is recompiled on each start when PYTHONDONTWRITEBYTECODE is set).
+
+    python -m bench.bench_startup --runs 10
+    python -m bench.bench_startup --runs 10 --target-ms 600   # exit 1 if the median is slower
+"""
+import argparse
+import compileall
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DB_PATH = os.path.join(ROOT, "data", "sasya.db")
+
+CHILD = """
+import json, os, time
+t0 = time.perf_counter()
+from backend.app import create_app
+t1 = time.perf_counter()
+app = create_app({db_path!r})
+t2 = time.perf_counter()
+client = app.test_client()
+assert client.get("/health").status_code == 200
+t3 = time.perf_counter()
+ready_ms = round((time.time() - float(os.environ["BENCH_LAUNCHED_AT"])) * 1000, 2)
+assert client.post("/api/generate_plan", json={{"rainfall_mm": 500, "area_m2": 4000}}).status_code == 200
+t4 = time.perf_counter()
+ms = lambda a, b: round((b - a) * 1000, 2)
+print(json.dumps({{"ready_ms": ready_ms, "import_ms": ms(t0, t1), "create_app_ms": ms(t1, t2), "first_health_ms": ms(t2, t3),
+                  "first_plan_ms": ms(t3, t4), "phases": app.extensions["sasya_startup_ms"]}}))
+"""
+
+
+def migrated_template(tmp):
+    """data/sasya.db as init-db leaves it at deploy time."""
+    from backend.db import init_db, seed_data
+
+    path = os.path.join(tmp, "template.db")
+    shutil.copy(DB_PATH, path)
+    init_db(path)
+    seed_data(path)
+    return path
+
+
+def one_run(mode, tmp, template):
+    db_path = os.path.join(tmp, "sasya.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    if mode != "fresh":
+        shutil.copy(template, db_path)
+    env = dict(os.environ, SASYA_DB_BOOTSTRAP="skip" if mode == "skip" else "auto")
+    env["BENCH_LAUNCHED_AT"] = repr(time.time())
+    out = subprocess.run([sys.executable, "-c", CHILD.format(db_path=db_path)], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description="backend cold-start time")
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--modes", default="existing,fresh,skip")
+    ap.add_argument("--target-ms", type=float, help="fail if median launch-to-first-/health exceeds this")
+    args = ap.parse_args()
+
+    compileall.compile_dir(os.path.join(ROOT, "backend"), quiet=1)
+    tmp = tempfile.mkdtemp(prefix="sasya-startup-")
+    failed = False
+    try:
+        template = migrated_template(tmp)
+        for mode in args.modes.split(","):
+            runs = [one_run(mode, tmp, template) for _ in range(args.runs)]
+            med = lambda key: statistics.median(r[key] for r in runs)  # noqa: E731
+            ready = med("ready_ms")  # interpreter start + import + create_app + first response
+            print(f"\n[{mode}] median of {args.runs} runs")
+            print(f"  launch to first /health  {ready:8.1f} ms")
+            print(f"  import backend.app       {med('import_ms'):8.1f} ms")
+            print(f"  create_app()             {med('create_app_ms'):8.1f} ms")
+            print(f"  first /health            {med('first_health_ms'):8.1f} ms")
+            print(f"  first generate_plan      {med('first_plan_ms'):8.1f} ms")
+            for phase in runs[0]["phases"]:
+                if phase not in ("import", "total"):
+                    print(f"    {phase:<22} {statistics.median(r['phases'][phase] for r in runs):8.1f} ms")
+            if args.target_ms is not None and mode == "existing" and ready > args.target_ms:
+                print(f"  ABOVE TARGET ({args.target_ms:.0f} ms)")
+                failed = True
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
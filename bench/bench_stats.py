@@ -0,0 +1,189 @@
+# bench/bench_stats.py
+"""
+Benchmark: /api/stats aggregates (backend/plan_stats.py).
+
+  save       save_plan_in() for --plans plans with and without the summary
+             table upserts (the incremental cost every save pays)
+  parse-all  "area and net per species" by decoding every saved plan body,
+             the only option without the summary tables
+  stats      the same answer from plan_stats.by_species()
+  rebuild    plan_stats.rebuild() over the saved plans
+  scale      dashboard queries against summary tables filled as --scale-plans
+             plans over --days days x --regions regions would leave them
+             (whole months come from the monthly rows)
+
+    python -m bench.bench_stats
+    python -m bench.bench_stats --plans 20000 --scale-plans 5000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from backend import plan_stats, plan_store
+from backend.catalog import CatalogSnapshot
+from backend.db import get_db
+from backend.migrations import migrate
+from backend.planner import build_plan
+
+SPECIES = ["Sorghum", "Greengram", "Groundnut", "Pigeon Pea", "Ragi", "Cowpea", "Horsegram", "Foxtail Millet"]
+TREES = ["Neem", "Gliricidia", "Pongamia"]
+
+
+def make_catalog():
+    crops = [
+        {"id": i, "name": name, "min_rainfall": 200 + 40 * i, "max_rainfall": 900 + 50 * i, "season": "Kharif",
+         "typical_yield_kg_per_ha": 500.0 + 150 * i, "input_cost_per_ha": 7000.0 + 800 * i,
+         "market_price_per_kg": 12.0 + 3 * i}
+        for i, name in enumerate(SPECIES, 1)
+    ]
+    trees = [{"id": i, "name": name, "drought_tolerance": "high", "canopy_m": 6.0, "spacing_m": 8.0}
+             for i, name in enumerate(TREES, 1)]
+    return CatalogSnapshot(1, crops, trees)
+
+
+def save_plans(db_path, plans, with_stats):
+    record = plan_stats.record
+    if not with_stats:
+        plan_stats.record = lambda conn, plan_id, plan: None
+    try:
+        conn = get_db(db_path)
+        t0 = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        for plan in plans:
+            plan_store.save_plan_in(conn, plan["input"]["name"], plan)
+        conn.commit()
+        conn.close()
+        return time.perf_counter() - t0
+    finally:
+        plan_stats.record = record
+
+
+def parse_all(db_path):
+    conn = get_db(db_path)
+    try:
+        out = {}
+        for codec, body in conn.execute(
+            "SELECT b.codec, b.body FROM plans p JOIN plan_bodies b ON b.hash = p.body_hash"
+        ):
+            for name, row in plan_store._decode_body(codec, body)["economics"]["by_species"].items():
+                acc = out.setdefault(name, [0.0, 0.0])
+                acc[0] += row["area_m2"]
+                acc[1] += row["net"]
+        return out
+    finally:
+        conn.close()
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, best * 1000
+
+
+def fill_scale(db_path, n_plans, n_days, n_regions, seed=3):
+    """Summary rows as n_plans plans spread over n_days x n_regions would leave them."""
+    rng = random.Random(seed)
+    first = date(2024, 1, 1)
+    per_cell = max(1, n_plans // (n_days * n_regions))
+    species_rows, totals_rows = [], []
+    for d in range(n_days):
+        day = (first + timedelta(days=d)).isoformat()
+        for r in range(n_regions):
+            region = f"District {r:03d}"
+            total_area = net = 0.0
+            for name in rng.sample(SPECIES, 4) + [rng.choice(TREES)]:
+                plans = rng.randint(1, per_cell)
+                area = plans * rng.uniform(4000, 20000)
+                species_net = 0.0 if name in TREES else area * rng.uniform(-0.5, 3.0)
+                total_area += area
+                net += species_net
+                species_rows.append(("d", day, region, name, plans, int(area // 16), area, 0.0, 0.0, species_net))
+            totals_rows.append(("d", day, region, per_cell, total_area, 0.0, 0.0, net))
+    conn = get_db(db_path)
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute("DELETE FROM plan_stats")
+    conn.execute("DELETE FROM plan_stats_totals")
+    conn.executemany("INSERT INTO plan_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", species_rows)
+    conn.executemany("INSERT INTO plan_stats_totals VALUES (?, ?, ?, ?, ?, ?, ?, ?)", totals_rows)
+    conn.execute("""
+      INSERT INTO plan_stats SELECT 'm', substr(day, 1, 8) || '01', region, species, SUM(plans), SUM(cells),
+        SUM(area_m2), SUM(revenue), SUM(cost), SUM(net) FROM plan_stats WHERE grain = 'd' GROUP BY 2, 3, 4
+    """)
+    conn.execute("""
+      INSERT INTO plan_stats_totals SELECT 'm', substr(day, 1, 8) || '01', region, SUM(plans), SUM(area_m2),
+        SUM(revenue), SUM(cost), SUM(net) FROM plan_stats_totals WHERE grain = 'd' GROUP BY 2, 3
+    """)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return len(species_rows), len(totals_rows), first + timedelta(days=n_days - 1)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--plans", type=int, default=5000)
+    ap.add_argument("--scale-plans", type=int, default=2_000_000)
+    ap.add_argument("--days", type=int, default=730)
+    ap.add_argument("--regions", type=int, default=30)
+    args = ap.parse_args()
+
+    catalog = make_catalog()
+    rng = random.Random(1)
+    plans = [
+        build_plan({
+            "name": f"Farmer {i}",
+            "district": f"District {rng.randrange(args.regions):03d}",
+            "rainfall_mm": rng.randrange(300, 1200, 50),
+            "area_m2": rng.randrange(2000, 40000, 500),
+        }, catalog, "none")
+        for i in range(args.plans)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bare, db_path = os.path.join(tmp, "bare.db"), os.path.join(tmp, "stats.db")
+        migrate(bare)
+        migrate(db_path)
+        bare_s = save_plans(bare, plans, with_stats=False)
+        stats_s = save_plans(db_path, plans, with_stats=True)
+        print(f"save       {args.plans} plans: {bare_s * 1e6 / args.plans:.0f} us/plan without stats, "
+              f"{stats_s * 1e6 / args.plans:.0f} us/plan with stats")
+
+        expected, parse_ms = timed(lambda: parse_all(db_path), repeat=1)
+        got, stats_ms = timed(lambda: plan_stats.by_species(db_path))
+        same = all(abs(expected[r["species"]][1] - r["net"]) < 0.01 * max(1.0, abs(r["net"])) for r in got
+                   if r["species"] in expected)
+        print(f"parse-all  {parse_ms:9.1f} ms    stats {stats_ms:7.2f} ms    same net per species: {same}")
+
+        result, rebuild_ms = timed(lambda: plan_stats.rebuild(db_path), repeat=1)
+        print(f"rebuild    {rebuild_ms:9.1f} ms for {result['plans']} plans "
+              f"({result['species_rows']} + {result['total_rows']} rows)")
+
+        n_species, n_totals, last = fill_scale(db_path, args.scale_plans, args.days, args.regions)
+        month = (last - timedelta(days=29)).isoformat()
+        quarter = (last - timedelta(days=100)).isoformat()
+        print(f"scale      {args.scale_plans:,} plans -> {n_species:,} daily species rows, "
+              f"{n_totals:,} daily total rows (plus the monthly ones)")
+        queries = [
+            ("summary, all days", lambda: plan_stats.summary(db_path)),
+            ("summary, last 30 days", lambda: plan_stats.summary(db_path, start=month)),
+            ("species, all days", lambda: plan_stats.by_species(db_path)),
+            ("species, last 30 days", lambda: plan_stats.by_species(db_path, start=month)),
+            ("species, last 100 days", lambda: plan_stats.by_species(db_path, start=quarter)),
+            ("species, one region", lambda: plan_stats.by_species(db_path, region="District 007")),
+            ("regions, all days", lambda: plan_stats.by_region(db_path)),
+            ("daily, one species", lambda: plan_stats.daily(db_path, species="Ragi")),
+            ("daily, one region, 30 days", lambda: plan_stats.daily(db_path, start=month, region="District 007")),
+        ]
+        for name, fn in queries:
+            _, ms = timed(fn)
+            print(f"  {name:<28} {ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
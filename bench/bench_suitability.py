@@ -0,0 +1,91 @@
+# bench/bench_suitability.py
+"""
+Micro-benchmark: rainfall-suitability lookup, linear scan vs SuitabilityIndex.
+
+Run from the repo root:
+    python -m bench.bench_suitability
+    python -m bench.bench_suitability --sizes 10,1000,100000 --queries 500
+"""
+import argparse
+import random
+import time
+
+from backend.suitability import SuitabilityIndex
+
+
+def make_catalog(n, seed=7):
+    """Synthetic district-level variety catalog, ranked by yield."""
+    rng = random.Random(seed)
+    crops = []
+    for i in range(n):
+        lo = rng.randint(150, 900)
+        width = rng.randint(20, 250)
+        crops.append({
+            "id": i + 1,
+            "name": f"Variety {i}",
+            "min_rainfall": lo,
+            "max_rainfall": lo + width,
+            "season": rng.choice(["Kharif", "Rabi", "Kharif/Rabi"]),
+            "typical_yield_kg_per_ha": rng.uniform(300, 2500),
+        })
+    crops.sort(key=lambda c: -c["typical_yield_kg_per_ha"])
+    return crops
+
+
+def linear_scan(crops, rainfall, limit):
+    out = []
+    for c in crops:
+        if c["min_rainfall"] <= rainfall <= c["max_rainfall"]:
+            out.append(c)
+            if len(out) >= limit:
+                break
+    return out
+
+
+def linear_all(crops, rainfall):
+    return [c for c in crops if c["min_rainfall"] <= rainfall <= c["max_rainfall"]]
+
+
+def timeit(fn, queries):
+    t0 = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - t0) / len(queries) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sizes", default="10,100,1000,10000,100000")
+    ap.add_argument("--queries", type=int, default=1000)
+    args = ap.parse_args()
+
+    rng = random.Random(1)
+    print(f"{'crops':>8} {'build ms':>9} {'scan all us':>12} {'index all us':>13} "
+          f"{'scan top2 us':>13} {'index top2 us':>14} {'avg hits':>9}")
+    for n in [int(s) for s in args.sizes.split(",")]:
+        crops = make_catalog(n)
+        queries = [rng.uniform(100, 1200) for _ in range(args.queries)]
+
+        t0 = time.perf_counter()
+        index = SuitabilityIndex(crops)
+        build_ms = (time.perf_counter() - t0) * 1e3
+
+        # sanity: both paths agree
+        for q in queries[:50]:
+            assert index.query(q) == linear_all(crops, q)
+
+        # the "all" columns include materialising k hits; the "top2" columns
+        # are what generate_plan actually asks for
+        scan_all = timeit(lambda q: linear_all(crops, q), queries)
+        index_all = timeit(lambda q: index.query(q), queries)
+        # worst case for the early-exit scan: a rainfall nothing matches
+        misses = [rng.uniform(1200, 1300) for _ in range(args.queries)]
+        scan_top = timeit(lambda q: linear_scan(crops, q, 2), queries + misses)
+        index_top = timeit(lambda q: index.query(q, limit=2), queries + misses)
+        hits = sum(len(index.query(q)) for q in queries) / len(queries)
+        print(f"{n:>8} {build_ms:>9.2f} {scan_all:>12.1f} {index_all:>13.1f} "
+              f"{scan_top:>13.1f} {index_top:>14.1f} {hits:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
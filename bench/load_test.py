@@ -0,0 +1,362 @@
+# bench/load_test.py
+"""
+Load test for the backend endpoints.
+
+Replays realistic request mixes against the Flask app, in-process through
+the test client (default) or over HTTP against a running server, and
+reports p50/p95/p99 latency, throughput and peak RSS per endpoint.
+
+    python -m bench.load_test                          # in-process
+    python -m bench.load_test --start-server           # spawn a local server
+    python -m bench.load_test --url http://127.0.0.1:5000 --pid 12345
+    python -m bench.load_test --save bench/baselines/local.json
+    python -m bench.load_test --compare bench/baselines/local.json --tolerance 0.25
+
+In-process and --start-server runs write to a scratch copy of
+data/sasya.db. --compare exits with status 1 when an endpoint's p95 grows,
+or its throughput drops, by more than --tolerance relative to the baseline.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DB_PATH = os.path.join(ROOT, "data", "sasya.db")
+SCENARIOS = ("crops", "generate_plan", "generate_plan_large", "ai_agent", "save_plan", "labels", "pdf_plan")
+
+
+# ----------------- Request mixes -----------------
+def farm_input(rng, large=False):
+    """A farmer record drawn from the distributions seen in the field."""
+    if large:
+        area = rng.uniform(10_000, 500_000)                        # 1-50 ha
+    else:
+        area = min(max(rng.lognormvariate(8.9, 0.6), 500), 40_000)  # median ~0.7 ha
+    return {
+        "name": f"Farmer {rng.randint(1, 10**6)}",
+        "rainfall_mm": round(min(max(rng.gauss(520, 160), 150), 1100)),
+        "area_m2": round(area),
+        "soil_ph": round(min(max(rng.gauss(6.8, 0.6), 4.5), 9.0), 1),
+        "investment_level": rng.choices(["low", "medium", "high"], [0.6, 0.3, 0.1])[0],
+    }
+
+
+class Mix:
+    """Builds (method, path, json body) for each scenario; needs sample plans for the write paths."""
+
+    def __init__(self, seed, plans, plan_ids):
+        self.rng = random.Random(seed)
+        self.plans = plans
+        self.plan_ids = plan_ids
+
+    def request(self, scenario):
+        rng = self.rng
+        if scenario == "crops":
+            return "GET", "/api/crops", None
+        if scenario == "generate_plan":
+            return "POST", "/api/generate_plan", farm_input(rng)
+        if scenario == "generate_plan_large":
+            return "POST", "/api/generate_plan", farm_input(rng, large=True)
+        if scenario == "ai_agent":
+            return "POST", "/api/ai_agent", farm_input(rng)
+        if scenario == "save_plan":
+            plan = rng.choice(self.plans)
+            return "POST", "/api/save_plan", {"farmer_name": plan["input"]["name"], "plan": plan}
+        if scenario == "labels":
+            return "GET", f"/api/labels/{rng.choice(self.plan_ids)}?limit=500", None
+        if scenario == "pdf_plan":
+            return "POST", "/api/pdf_plan", rng.choice(self.plans)
+        raise ValueError(scenario)
+
+
+# ----------------- Transports -----------------
+def scratch_db():
+    """(tempdir, path) of a migrated copy of data/sasya.db for the run to write to."""
+    from backend.migrations import migrate
+
+    tmp = tempfile.mkdtemp(prefix="sasya-load-")
+    db_path = os.path.join(tmp, "sasya.db")
+    shutil.copy(DB_PATH, db_path)
+    migrate(db_path)
+    return tmp, db_path
+
+
+class InProcess:
+    name = "test_client"
+
+    def __init__(self):
+        # keep the benchmark's writes out of the real database
+        self.tmp, db_path = scratch_db()
+        from backend.app import create_app
+
+        self.app = create_app(db_path)
+        self.pid = os.getpid()
+        self._local = threading.local()
+
+    def request(self, method, path, body):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        resp = client.open(path, method=method, json=body)
+        data = resp.get_data()
+        return resp.status_code, data
+
+    def close(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+class Http:
+    name = "http"
+
+    def __init__(self, url, pid=None):
+        parts = urllib.parse.urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.pid = pid
+        self._local = threading.local()
+
+    def request(self, method, path, body):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        try:
+            conn.request(method, path, payload, headers)
+            resp = conn.getresponse()
+            return resp.status, resp.read()
+        except (http.client.HTTPException, OSError):
+            self._local.conn = None
+            conn.close()
+            raise
+
+    def close(self):
+        pass
+
+
+def start_server(port, db_path):
+    """Run the app on `db_path` under a threaded werkzeug server in a child process."""
+    code = (
+        "from backend.app import create_app\n"
+        f"create_app({db_path!r}).run(host='127.0.0.1', port={port}, threaded=True, use_reloader=False)"
+    )
+    proc = subprocess.Popen([sys.executable, "-c", code], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    probe = Http(f"http://127.0.0.1:{port}")
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if probe.request("GET", "/health", None)[0] == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+# ----------------- Measurement -----------------
+def rss_mb(pid):
+    """Current RSS of `pid` in MB (Linux /proc), or None."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class RssSampler:
+    """Samples a process's RSS every `interval` s; .peak is the max seen."""
+
+    def __init__(self, pid, interval=0.05):
+        self.pid, self.interval = pid, interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            mb = rss_mb(self.pid)
+            if mb is not None:
+                self.peak = mb if self.peak is None else max(self.peak, mb)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self.pid is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # nearest-rank
+    idx = min(len(sorted_values) - 1, max(0, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+def run_scenario(transport, mix, scenario, n, concurrency):
+    requests = [mix.request(scenario) for _ in range(n)]
+    lat = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(req):
+        nonlocal errors
+        t0 = time.perf_counter()
+        try:
+            status, _ = transport.request(*req)
+            ok = status < 400
+        except Exception:
+            ok = False
+        dt = time.perf_counter() - t0
+        with lock:
+            lat.append(dt)
+            errors += not ok
+
+    with RssSampler(transport.pid) as rss:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as ex:
+            list(ex.map(one, requests))
+        wall = time.perf_counter() - t0
+
+    lat.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None  # noqa: E731
+    return {
+        "requests": n,
+        "errors": errors,
+        "p50_ms": ms(percentile(lat, 50)),
+        "p95_ms": ms(percentile(lat, 95)),
+        "p99_ms": ms(percentile(lat, 99)),
+        "mean_ms": ms(sum(lat) / len(lat)),
+        "throughput_rps": round(n / wall, 2),
+        "peak_rss_mb": round(rss.peak, 1) if rss.peak is not None else None,
+    }
+
+
+def setup_samples(transport, seed, count=20):
+    """Generate and save a few plans to drive save_plan, labels and pdf_plan."""
+    rng = random.Random(seed + 1)
+    plans, plan_ids = [], []
+    for _ in range(count):
+        status, data = transport.request("POST", "/api/generate_plan", farm_input(rng))
+        if status != 200:
+            raise RuntimeError(f"generate_plan failed during setup ({status})")
+        plan = json.loads(data)
+        plans.append(plan)
+        status, data = transport.request("POST", "/api/save_plan", {"plan": plan})
+        if status == 200:
+            plan_ids.append(json.loads(data)["plan_id"])
+    return plans, plan_ids or [1]
+
+
+# ----------------- Baselines -----------------
+def compare(results, baseline, tolerance):
+    """List of regression messages (p95 up or throughput down by > tolerance)."""
+    problems = []
+    for name, cur in results["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        if base.get("p95_ms") and cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append(f"{name}: p95 {cur['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if base.get("throughput_rps") and cur["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            problems.append(f"{name}: {cur['throughput_rps']} req/s vs baseline {base['throughput_rps']} req/s")
+        if cur["errors"] > base.get("errors", 0):
+            problems.append(f"{name}: {cur['errors']} errors vs baseline {base.get('errors', 0)}")
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="latency/throughput load test for the backend endpoints")
+    ap.add_argument("--url", help="test a running server instead of the in-process app")
+    ap.add_argument("--pid", type=int, help="server PID for RSS sampling with --url")
+    ap.add_argument("--start-server", action="store_true", help="spawn a local threaded server and test it")
+    ap.add_argument("--port", type=int, default=5055)
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--save", help="write results as a JSON baseline")
+    ap.add_argument("--compare", help="baseline JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    args = ap.parse_args(argv)
+
+    server = scratch = None
+    if args.start_server:
+        scratch, db_path = scratch_db()
+        server = start_server(args.port, db_path)
+        transport = Http(f"http://127.0.0.1:{args.port}", server.pid)
+    elif args.url:
+        transport = Http(args.url, args.pid)
+    else:
+        transport = InProcess()
+
+    try:
+        plans, plan_ids = setup_samples(transport, args.seed)
+        mix = Mix(args.seed, plans, plan_ids)
+        results = {
+            "meta": {
+                "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "transport": transport.name,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "seed": args.seed,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "endpoints": {},
+        }
+        print(f"{'scenario':>20} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'errors':>7} {'rss MB':>8}")
+        for scenario in args.scenarios.split(","):
+            r = run_scenario(transport, mix, scenario, args.requests, args.concurrency)
+            results["endpoints"][scenario] = r
+            print(f"{scenario:>20} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} "
+                  f"{r['throughput_rps']:>9} {r['errors']:>7} {str(r['peak_rss_mb']):>8}")
+    finally:
+        transport.close()
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if scratch is not None:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        if problems:
+            print("REGRESSIONS:")
+            for p in problems:
+                print("  " + p)
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
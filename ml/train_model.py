@@ -5,6 +5,7 @@ from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.model_selection import train_test_split
 import joblib
 import os
+import sys
 
 # MUST match DB crop order used in backend seed:
 CROP_INDEX = ["Pearl Millet","Sorghum","Pigeon Pea","Greengram","Sesame","Groundnut","Horsegram","Cowpea"]
@@ -29,6 +30,76 @@ def make_synthetic(n=4000, random_state=1):
     })
     return df
 
+# flat NumPy export read by backend/tree_eval.py (no sklearn needed to serve)
+EXPORT_FORMAT_VERSION = 1
+
+def _flat_trees(model):
+    """
+    (trees, init, learning_rate, input_dtype) for a fitted GradientBoosting
+    or HistGradientBoosting regressor; each tree is a tuple of node arrays
+    (is_leaf, feature, threshold, left, right, value, depth).
+    """
+    if hasattr(model, "_predictors"):
+        # HistGradientBoostingRegressor: leaf values already include the learning rate
+        trees = []
+        for (predictor,) in model._predictors:
+            nodes = predictor.nodes
+            if nodes["is_categorical"].any():
+                raise ValueError("categorical splits cannot be exported")
+            trees.append((
+                nodes["is_leaf"].astype(bool), nodes["feature_idx"], nodes["num_threshold"],
+                nodes["left"], nodes["right"], nodes["value"], int(nodes["depth"].max()),
+            ))
+        return trees, float(np.ravel(model._baseline_prediction)[0]), 1.0, "float64"
+
+    trees = []
+    for est in model.estimators_:
+        t = est[0].tree_
+        trees.append((
+            t.children_left == -1, t.feature, t.threshold,
+            t.children_left, t.children_right, t.value[:, 0, 0], t.max_depth,
+        ))
+    if model.init_ == "zero":
+        init = 0.0
+    else:
+        init = float(model.init_.predict(np.zeros((1, model.n_features_in_)))[0])
+    # sklearn trees compare inputs as float32
+    return trees, init, model.learning_rate, "float32"
+
+def export_flat(model, path):
+    """Flatten a fitted gradient boosting regressor into a NumPy-only .npz."""
+    trees, init, learning_rate, input_dtype = _flat_trees(model)
+    offsets = np.cumsum([0] + [len(t[0]) for t in trees])
+    feature, threshold, left, right, value = [], [], [], [], []
+    for off, (leaf, feat, thr, lft, rgt, val, _) in zip(offsets, trees):
+        idx = np.arange(len(leaf)) + off
+        # leaves point at themselves so evaluation can always take max_depth steps
+        feature.append(np.where(leaf, 0, feat))
+        threshold.append(np.where(leaf, 0.0, thr))
+        left.append(np.where(leaf, idx, lft + off))
+        right.append(np.where(leaf, idx, rgt + off))
+        value.append(val)
+    names = getattr(model, "feature_names_in_", None)
+    if names is None:
+        names = [f"x{i}" for i in range(model.n_features_in_)]
+    np.savez_compressed(
+        path,
+        format_version=EXPORT_FORMAT_VERSION,
+        feature=np.concatenate(feature).astype(np.int32),
+        threshold=np.concatenate(threshold).astype(np.float64),
+        left=np.concatenate(left).astype(np.int32),
+        right=np.concatenate(right).astype(np.int32),
+        value=np.concatenate(value).astype(np.float64),
+        roots=offsets[:-1].astype(np.int32),
+        init=init,
+        learning_rate=learning_rate,
+        max_depth=max(t[6] for t in trees),
+        input_dtype=input_dtype,
+        feature_names=np.array([str(n) for n in names]),
+        crop_index=np.array(CROP_INDEX),
+    )
+    print(f"Exported {len(trees)} trees ({offsets[-1]} nodes) to {path}")
+
 def train_and_save():
     df = make_synthetic(4000)
     X = df[['rainfall','soil_ph','area','investment','crop_type']]
@@ -42,6 +113,11 @@ def train_and_save():
     os.makedirs('ml/models', exist_ok=True)
     joblib.dump(model, 'ml/models/crop_ranker.pkl')
     print("Saved model to ml/models/crop_ranker.pkl")
+    export_flat(model, 'ml/models/crop_ranker.npz')
 
 if __name__ == "__main__":
-    train_and_save()
+    if "--export-only" in sys.argv:
+        # re-export an existing pickle without retraining
+        export_flat(joblib.load('ml/models/crop_ranker.pkl'), 'ml/models/crop_ranker.npz')
+    else:
+        train_and_save()
@@ -0,0 +1,279 @@
+# ml/train_pipeline.py
+"""
+Scalable training pipeline for the crop ranker.
+
+    python ml/train_pipeline.py --synthetic-rows 5000000
+    python ml/train_pipeline.py --data trials.csv --synthetic-rows 1000000 --jobs 8
+
+Training data (real trial CSVs and/or synthetic augmentation) is read in
+chunks and packed straight into float32 arrays, so pandas frames never grow
+beyond one chunk. Hyper-parameters are chosen by k-fold cross-validation on
+a subsample, with candidate/fold fits spread over --jobs processes, and the
+winner is refit on all rows with HistGradientBoostingRegressor (multi-threaded).
+
+Outputs in ml/models/:
+  crop_ranker.pkl    joblib model
+  crop_ranker.npz    NumPy-only export (backend/tree_eval.py)
+  crop_ranker.json   metadata: version, features, CROP_INDEX, library
+                     versions, file hashes, CV results, timings, peak memory
+The server checks the metadata before loading (backend/crop_model.py).
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import joblib
+import sklearn
+from joblib import Parallel, delayed
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.model_selection import KFold
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from train_model import CROP_INDEX, export_flat, make_synthetic  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FEATURES = ["rainfall", "soil_ph", "area", "investment", "crop_type"]
+TARGET = "score"
+INVESTMENT_CODES = {"low": 0, "medium": 1, "med": 1, "high": 2}
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+METADATA_FORMAT = 1
+CHUNK_ROWS = 250_000
+
+PARAM_GRID = {
+    "learning_rate": [0.05, 0.1],
+    "max_leaf_nodes": [15, 31],
+    "max_iter": [200, 400],
+    "l2_regularization": [0.0, 1.0],
+}
+
+
+# ----------------- Data -----------------
+def _pack(df):
+    """Chunk DataFrame -> (X float32 [n, 5], y float32 [n])."""
+    if "crop_type" not in df and "crop" in df:
+        df = df.assign(crop_type=df["crop"].map({name: i for i, name in enumerate(CROP_INDEX)}))
+    if df["investment"].dtype == object:
+        df = df.assign(investment=df["investment"].str.strip().str.lower().map(INVESTMENT_CODES))
+    df = df.dropna(subset=FEATURES + [TARGET])
+    return df[FEATURES].to_numpy(np.float32), df[TARGET].to_numpy(np.float32)
+
+
+def iter_csv_chunks(path, chunk_rows=CHUNK_ROWS):
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        yield _pack(chunk)
+
+
+def iter_synthetic_chunks(n_rows, chunk_rows=CHUNK_ROWS, seed=1):
+    done, i = 0, 0
+    while done < n_rows:
+        n = min(chunk_rows, n_rows - done)
+        yield _pack(make_synthetic(n, random_state=seed + i))
+        done += n
+        i += 1
+
+
+class ArrayBuffer:
+    """Grow-by-doubling float32 buffers, so the peak stays ~2x the packed data."""
+
+    def __init__(self, n_features, capacity=CHUNK_ROWS):
+        self.X = np.empty((capacity, n_features), dtype=np.float32)
+        self.y = np.empty(capacity, dtype=np.float32)
+        self.n = 0
+
+    def extend(self, X, y):
+        need = self.n + len(y)
+        if need > len(self.y):
+            cap = max(need, 2 * len(self.y))
+            self.X = np.resize(self.X, (cap, self.X.shape[1]))
+            self.y = np.resize(self.y, cap)
+        self.X[self.n:need] = X
+        self.y[self.n:need] = y
+        self.n = need
+
+    def arrays(self):
+        return self.X[:self.n], self.y[:self.n]
+
+
+def load_data(csv_paths, synthetic_rows, chunk_rows, max_rows=None):
+    buf = ArrayBuffer(len(FEATURES))
+    sources = [iter_csv_chunks(p, chunk_rows) for p in csv_paths]
+    if synthetic_rows:
+        sources.append(iter_synthetic_chunks(synthetic_rows, chunk_rows))
+    for X, y in itertools.chain.from_iterable(sources):
+        if max_rows is not None and buf.n + len(y) > max_rows:
+            X, y = X[:max_rows - buf.n], y[:max_rows - buf.n]
+        buf.extend(X, y)
+        if max_rows is not None and buf.n >= max_rows:
+            break
+    return buf.arrays()
+
+
+# ----------------- Search -----------------
+def param_candidates(grid=PARAM_GRID):
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def _fit_score(params, X, y, train_idx, test_idx, seed):
+    model = HistGradientBoostingRegressor(random_state=seed, early_stopping=False, **params)
+    t0 = time.perf_counter()
+    model.fit(X[train_idx], y[train_idx])
+    return model.score(X[test_idx], y[test_idx]), time.perf_counter() - t0
+
+
+def cv_search(X, y, candidates, folds, jobs, seed):
+    """Mean/std R2 per candidate; every (candidate, fold) fit is one job."""
+    splits = list(KFold(folds, shuffle=True, random_state=seed).split(X))
+    tasks = [(ci, train, test) for ci in range(len(candidates)) for train, test in splits]
+    out = Parallel(n_jobs=jobs)(
+        delayed(_fit_score)(candidates[ci], X, y, train, test, seed) for ci, train, test in tasks
+    )
+    results = []
+    for ci, params in enumerate(candidates):
+        scores = [out[i][0] for i, t in enumerate(tasks) if t[0] == ci]
+        fit_s = [out[i][1] for i, t in enumerate(tasks) if t[0] == ci]
+        results.append({
+            "params": params,
+            "mean_r2": float(np.mean(scores)),
+            "std_r2": float(np.std(scores)),
+            "mean_fit_s": round(float(np.mean(fit_s)), 3),
+        })
+    results.sort(key=lambda r: r["mean_r2"], reverse=True)
+    return results
+
+
+# ----------------- Bookkeeping -----------------
+def peak_rss_mb():
+    """(this process, finished child processes) peak RSS in MB, if available."""
+    if resource is None:
+        return None, None
+    unit = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 1e6
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 1e6
+    return round(own, 1), round(kids, 1)
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def next_version(meta_path):
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return int(json.load(f).get("model_version", 0)) + 1
+    except (OSError, ValueError):
+        return 1
+
+
+def save_model(model, out_dir, metadata):
+    """
+    Write pkl, npz and json, each via rename. The json goes last and carries
+    the file hashes, so the server rejects a model/metadata mismatch.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    pkl = os.path.join(out_dir, "crop_ranker.pkl")
+    npz = os.path.join(out_dir, "crop_ranker.npz")
+    meta = os.path.join(out_dir, "crop_ranker.json")
+    metadata["model_version"] = next_version(meta)
+
+    joblib.dump(model, pkl + ".tmp")
+    export_flat(model, npz + ".tmp.npz")
+    os.replace(pkl + ".tmp", pkl)
+    os.replace(npz + ".tmp.npz", npz)
+    metadata["files"] = {
+        "crop_ranker.pkl": sha256_file(pkl),
+        "crop_ranker.npz": sha256_file(npz),
+    }
+    with open(meta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(meta + ".tmp", meta)
+    return metadata
+
+
+# ----------------- Main -----------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Train the crop ranker on chunked data with a parallel CV search.")
+    ap.add_argument("--data", action="append", default=[], help="trial CSV (repeatable); columns "
+                    "rainfall, soil_ph, area, investment, crop_type or crop, score")
+    ap.add_argument("--synthetic-rows", type=int, default=1_000_000, help="synthetic augmentation rows")
+    ap.add_argument("--max-rows", type=int, default=None, help="cap on total training rows")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    ap.add_argument("--search-rows", type=int, default=200_000, help="subsample used for the CV search")
+    ap.add_argument("--folds", type=int, default=3)
+    ap.add_argument("--jobs", type=int, default=-1, help="parallel CV fits (-1 = all cores)")
+    ap.add_argument("--no-search", action="store_true", help="skip the search and use the first candidate")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default=MODEL_DIR)
+    args = ap.parse_args(argv)
+
+    timings = {}
+    t_all = time.perf_counter()
+
+    t0 = time.perf_counter()
+    X, y = load_data(args.data, args.synthetic_rows, args.chunk_rows, args.max_rows)
+    timings["load_s"] = round(time.perf_counter() - t0, 2)
+    if len(y) == 0:
+        ap.error("no training rows")
+    print(f"Loaded {len(y):,} rows ({X.nbytes / 1e6:.0f} MB packed) in {timings['load_s']}s")
+
+    candidates = param_candidates()
+    results = []
+    if args.no_search:
+        best = candidates[0]
+    else:
+        rng = np.random.default_rng(args.seed)
+        sub = rng.choice(len(y), size=min(args.search_rows, len(y)), replace=False)
+        t0 = time.perf_counter()
+        results = cv_search(X[sub], y[sub], candidates, args.folds, args.jobs, args.seed)
+        timings["search_s"] = round(time.perf_counter() - t0, 2)
+        best = results[0]["params"]
+        print(f"CV search: {len(candidates)} candidates x {args.folds} folds in {timings['search_s']}s; "
+              f"best {best} R2={results[0]['mean_r2']:.4f}")
+
+    t0 = time.perf_counter()
+    model = HistGradientBoostingRegressor(random_state=args.seed, early_stopping=False, **best)
+    model.fit(pd.DataFrame(X, columns=FEATURES, copy=False), y)
+    timings["fit_s"] = round(time.perf_counter() - t0, 2)
+    print(f"Final fit on {len(y):,} rows in {timings['fit_s']}s")
+    timings["total_s"] = round(time.perf_counter() - t_all, 2)
+
+    own_mb, children_mb = peak_rss_mb()
+    metadata = {
+        "metadata_format": METADATA_FORMAT,
+        "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "estimator": type(model).__name__,
+        "params": best,
+        "features": FEATURES,
+        "crop_index": CROP_INDEX,
+        "sklearn_version": sklearn.__version__,
+        "numpy_version": np.__version__,
+        "rows": int(len(y)),
+        "sources": {"csv": args.data, "synthetic_rows": args.synthetic_rows},
+        "cv": {"folds": args.folds, "search_rows": None if args.no_search else int(min(args.search_rows, len(y))),
+               "results": results},
+        "timings": timings,
+        "peak_rss_mb": {"main": own_mb, "workers": children_mb},
+    }
+    metadata = save_model(model, args.out, metadata)
+    print(f"Saved crop ranker v{metadata['model_version']} to {args.out} "
+          f"(peak RSS {own_mb} MB main, {children_mb} MB workers)")
+
+
+if __name__ == "__main__":
+    main()